@@ -0,0 +1,195 @@
+"""
+Batch Analysis for PostDisaster System
+Classifies many satellite tiles in one request and streams results as NDJSON
+"""
+
+import asyncio
+import json
+import os
+import pathlib
+import zipfile
+
+from fastapi import HTTPException
+
+from cities import city_map
+from executor import get_limiter, import_off_loop, run_blocking
+from uploads import BATCH_MAX_UPLOAD_BYTES, MAX_UPLOAD_BYTES, UploadTooLarge, upload_source
+
+# Batch settings
+BATCH_MAX_IMAGES = int(os.getenv("BATCH_MAX_IMAGES", "500"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))  # model calls in flight per batch
+# Crew runs in flight per batch, further capped by the analyze_city concurrency limit so
+# a batch with many cities queues its runs instead of being turned away with 503s
+BATCH_CREW_CONCURRENCY = int(os.getenv("BATCH_CREW_CONCURRENCY", "2"))
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".bmp", ".tif", ".tiff", ".gif"}
+
+
+class BoundedMember:
+    """
+    Zip member opened for reading that refuses to decompress past `limit` bytes
+
+    The sizes in a zip directory are written by the uploader and can be
+    forged, so the limit is enforced on the bytes actually read.
+    """
+
+    def __init__(self, handle, name, limit=MAX_UPLOAD_BYTES):
+        self.handle = handle
+        self.name = name
+        self.limit = limit
+
+    def read(self, size=-1):
+        # Never ask for more than one byte past the limit
+        remaining = self.limit + 1 - self.handle.tell()
+        data = self.handle.read(remaining if size is None or size < 0 else min(size, remaining))
+        if self.handle.tell() > self.limit:
+            raise UploadTooLarge(f"{self.name} is larger than {self.limit // (1024 * 1024)} MB")
+        return data
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self.handle.seek(offset, whence)
+
+    def tell(self):
+        return self.handle.tell()
+
+    def seekable(self):
+        return True
+
+    def close(self):
+        self.handle.close()
+
+
+def collect_batch_items(files):
+    """
+    Turn uploaded images and zip archives into (file, filename, size) items
+
+    Zip members are opened lazily: each is decompressed as it is analysed,
+    so the archive is never expanded in memory as a whole. Members that are
+    not images by extension are skipped. Reads the zip directory, so call
+    it off the event loop.
+
+    Archives are limited by BATCH_MAX_UPLOAD_BYTES, single images (and each
+    image in an archive) by MAX_UPLOAD_BYTES. A member whose directory entry
+    claims more is refused here; one that only turns out larger while it is
+    decompressed fails on its own during the analysis (see BoundedMember).
+    """
+    items = []
+    for file in files:
+        is_zip = file.content_type in ("application/zip", "application/x-zip-compressed") or (
+            file.filename or ""
+        ).lower().endswith(".zip")
+        source, size = upload_source(file, max_bytes=BATCH_MAX_UPLOAD_BYTES if is_zip else MAX_UPLOAD_BYTES)
+
+        if is_zip:
+            try:
+                archive = zipfile.ZipFile(source)
+            except zipfile.BadZipFile:
+                raise HTTPException(status_code=400, detail=f"{file.filename} is not a valid zip archive")
+            for member in archive.infolist():
+                if member.is_dir() or pathlib.Path(member.filename).suffix.lower() not in IMAGE_EXTENSIONS:
+                    continue
+                if member.file_size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail=f"{member.filename} in {file.filename} is too large")
+                items.append((BoundedMember(archive.open(member), member.filename), member.filename, member.file_size))
+                _check_batch_size(items)
+        elif file.content_type and file.content_type.startswith("image/"):
+            items.append((source, file.filename, size))
+            _check_batch_size(items)
+        else:
+            raise HTTPException(status_code=400, detail=f"{file.filename} must be an image or a zip of images")
+
+    if not items:
+        raise HTTPException(status_code=400, detail="No images found in the upload")
+    return items
+
+
+def _check_batch_size(items):
+    if len(items) > BATCH_MAX_IMAGES:
+        raise HTTPException(status_code=413, detail=f"Too many images, the limit is {BATCH_MAX_IMAGES} per batch")
+
+
+def _line(payload):
+    return json.dumps(payload) + "\n"
+
+
+async def stream_batch_analysis(items, run_crew=True):
+    """
+    Classify items and yield NDJSON lines as results become available
+
+    Images are packed BATCH_IMAGES_PER_CALL per model call with at most
+    BATCH_CONCURRENCY calls in flight. One "image" line is emitted per
+    image as its pack completes. When run_crew is set, the first image
+    detected for a city queues that city's crew run (once per city, at most
+    BATCH_CREW_CONCURRENCY running at a time); each
+    finished run is emitted as a "city" line with the images grouped under
+    it. A final "summary" line closes the stream.
+    """
+    # The agent stack is imported on a thread, not on the event loop
+    pipeline = await import_off_loop("postdisaster_system")
+    satellite = await import_off_loop("satellite")
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    crew_semaphore = asyncio.Semaphore(max(1, min(BATCH_CREW_CONCURRENCY, get_limiter("analyze_city").max_concurrent)))
+    packs = [items[i:i + satellite.BATCH_IMAGES_PER_CALL] for i in range(0, len(items), satellite.BATCH_IMAGES_PER_CALL)]
+
+    async def classify(pack):
+        async with semaphore:
+            try:
+                return pack, await run_blocking("analyze_batch", satellite.analyze_city_images, pack), None
+            except Exception as e:
+                return pack, [None] * len(pack), getattr(e, "detail", str(e))
+
+    async def analyze(city_id):
+        async with crew_semaphore:
+            try:
+                return city_id, await run_blocking("analyze_city", pipeline.run_disaster_analysis_cached, city_id), None
+            except Exception as e:
+                return city_id, None, getattr(e, "detail", str(e))
+
+    groups = {}
+    undetected = []
+    crew_runs = []
+    for next_pack in asyncio.as_completed([classify(pack) for pack in packs]):
+        pack, city_numbers, error = await next_pack
+        for (_, filename, _), city_number in zip(pack, city_numbers):
+            line = {
+                "type": "image",
+                "filename": filename,
+                "success": bool(city_number),
+                "city_id": city_number,
+                "city_name": city_map.get(city_number),
+            }
+            if error:
+                line["error"] = error
+            yield _line(line)
+
+            if not city_number:
+                undetected.append(filename)
+                continue
+            if city_number not in groups:
+                groups[city_number] = []
+                if run_crew:
+                    crew_runs.append(asyncio.ensure_future(analyze(city_number)))
+            groups[city_number].append(filename)
+
+    for next_run in asyncio.as_completed(crew_runs):
+        city_id, crew_results, error = await next_run
+        line = {
+            "type": "city",
+            "city_id": city_id,
+            "city_name": city_map[city_id],
+            "images": groups[city_id],
+            "success": error is None,
+            "disaster_analysis": crew_results,
+        }
+        if error:
+            line["error"] = error
+        yield _line(line)
+
+    yield _line({
+        "type": "summary",
+        "images": len(items),
+        "detected": len(items) - len(undetected),
+        "undetected": undetected,
+        "cities": {city_map[city_id]: len(filenames) for city_id, filenames in groups.items()},
+    })
@@ -0,0 +1,4 @@
+"""
+Benchmarks for PostDisaster System
+Run from the backend directory, e.g. `python -m benchmarks.event_loop`
+"""
@@ -0,0 +1,77 @@
+"""
+Helpers shared by the benchmarks: latency percentiles and synthetic satellite images
+"""
+
+import io
+import math
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+
+def percentile(ordered, q):
+    """Nearest-rank percentile of a sorted list"""
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def latency_summary(latencies_ms, digits=1):
+    """Count, p50, p95, p99 and max of latencies in ms"""
+    ordered = sorted(latencies_ms)
+    return {
+        "count": len(ordered),
+        "p50_ms": round(percentile(ordered, 0.50), digits),
+        "p95_ms": round(percentile(ordered, 0.95), digits),
+        "p99_ms": round(percentile(ordered, 0.99), digits),
+        "max_ms": round(ordered[-1], digits),
+    }
+
+
+def latency_line(latencies, unit="ms", width=7):
+    """p50 and p99 on one line, e.g. "p50    12.3 ms  p99    40.1 ms" """
+    ordered = sorted(latencies)
+    return f"p50 {percentile(ordered, 0.50):{width}.1f} {unit}  p99 {percentile(ordered, 0.99):{width}.1f} {unit}"
+
+
+def terrain(rng, size, grain, low=0, high=255):
+    """Smooth random ground: a grain x grain grid of random colours upscaled to size x size"""
+    coarse = rng.integers(low, high, (grain, grain, 3), dtype=np.uint8)
+    return Image.fromarray(coarse).resize((size, size), Image.BICUBIC)
+
+
+def red_cross(image, rng, arm, width, fill=(220, 0, 0)):
+    """Draw the red cross marker at a random spot in the middle half of the image"""
+    x, y = (int(value) for value in rng.integers(image.width // 4, 3 * image.width // 4, 2))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([x - arm, y - width, x + arm, y + width], fill=fill)
+    draw.rectangle([x - width, y - arm, x + width, y + arm], fill=fill)
+    return image
+
+
+def encoded(image, image_format="PNG", **params):
+    """Bytes of the image saved in the given format"""
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **params)
+    return buffer.getvalue()
+
+
+def synthetic_tile(seed, size=512):
+    """Smooth random terrain with a red cross marker"""
+    rng = np.random.default_rng(seed)
+    return red_cross(terrain(rng, size, 8), rng, 30, 8)
+
+
+def synthetic_image(seed, size):
+    """A satellite-like PNG: textured ground, a street grid and a red cross marker"""
+    rng = np.random.default_rng(seed)
+    image = terrain(rng, size, size // 8, 40, 200)
+    draw = ImageDraw.Draw(image)
+    for offset in range(0, size, size // 8):
+        draw.line([(offset, 0), (offset, size)], fill=(90, 90, 90), width=3)
+        draw.line([(0, offset), (size, offset)], fill=(90, 90, 90), width=3)
+    arm = size // 20
+    return encoded(red_cross(image, rng, arm, arm // 3, fill=(220, 20, 20)))
+
+
+def synthetic_upload(seed, size, grain=16, quality=75):
+    """A JPEG upload of smooth random terrain; a finer grain makes it larger and slower to decode"""
+    return encoded(terrain(np.random.default_rng(seed), size, grain), "JPEG", quality=quality)
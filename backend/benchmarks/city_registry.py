@@ -0,0 +1,166 @@
+"""
+City registry benchmark at scale
+
+Generates a synthetic catalogue (cities.json plus one document shard per
+city, in the Cities.docx section format) and measures:
+
+- loading the catalogue and building the name index
+- name lookups (exact, normalized, mentioned in a sentence, misspelled)
+  against the previous linear substring scan over city_map
+- building the sharded embedding index and parsing the city records
+- retrieval from the selected city's shard against scoring the whole corpus
+
+Usage (from backend/):
+    python -m benchmarks.city_registry --cities 10000
+"""
+
+import argparse
+import json
+import pathlib
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks._common import latency_line
+from city_data import CityDataset
+from city_registry import CityRegistry
+from embedding_index import HashingEmbedder, ShardedEmbeddingIndex
+
+_PREFIXES = ["Ash", "Bay", "Cedar", "Elm", "Fair", "Glen", "Green", "Harbor", "High", "Iron", "Lake", "Maple",
+             "Mill", "North", "Oak", "Pine", "Red", "River", "Rock", "Silver", "Spring", "Stone", "Sun", "West"]
+_SUFFIXES = ["brook", "dale", "field", "ford", "haven", "hurst", "land", "mont", "port", "ridge", "shire",
+             "side", "stead", "ton", "vale", "view", "ville", "wick", "wood", "worth"]
+_QUALIFIERS = ["", "", "East ", "Fort ", "Mount ", "New ", "Old ", "Port ", "Saint ", "South ", "Upper "]
+_DISASTERS = ["earthquake", "flood", "hurricane", "tsunami", "wildfire"]
+
+
+def city_names(count, rng):
+    names = set()
+    while len(names) < count:
+        middle = rng.choice(_SUFFIXES) + (rng.choice(_SUFFIXES) if rng.random() < 0.5 else "")
+        names.add(f"{rng.choice(_QUALIFIERS)}{rng.choice(_PREFIXES)}{middle} City")
+    return sorted(names)
+
+
+def shard_text(name, rng):
+    short = name[: -len(" City")]
+    disaster = rng.choice(_DISASTERS)
+    trapped = [f"{rng.choice(_PREFIXES)} Tower {n} in {short}: {rng.randint(10, 400)} people are currently trapped "
+               "and require immediate rescue" for n in range(1, 3)]
+    damaged = [f"{rng.choice(_PREFIXES)} Bridge {n} in {short}: Complete structural collapse has occurred"
+               for n in range(1, 3)]
+    return "\n".join([
+        f"{name} Disaster Information",
+        f"{short} has been severely impacted by a {disaster} disaster. The city has a total population of "
+        f"{rng.randint(10, 2000) * 1000:,} residents. Current casualty reports indicate "
+        f"{rng.randint(100, 6000):,} people have been injured in {short} due to the {disaster}.",
+        f"{short} Trapped Residents Locations", *trapped,
+        f"{short} Infrastructure Damage Assessment", *damaged,
+        f"{short} Emergency Resource Requirements {short} urgently needs the following resources: "
+        "Food, Water, Medical supplies and Shelter.",
+    ])
+
+
+def generate_catalogue(data_dir, count, seed=0):
+    rng = random.Random(seed)
+    (data_dir / "shards").mkdir(parents=True)
+    names = city_names(count, rng)
+    for city_id, name in enumerate(names, start=1):
+        (data_dir / "shards" / f"{city_id}.txt").write_text(shard_text(name, rng), encoding="utf-8")
+    (data_dir / "cities.json").write_text(json.dumps([{"name": name} for name in names]), encoding="utf-8")
+    return names
+
+
+def misspell(name, rng):
+    letters = list(name)
+    i = rng.randrange(1, len(name.split()[0]) - 1)
+    letters[i], letters[i + 1] = letters[i + 1], letters[i]
+    return "".join(letters)
+
+
+def linear_scan(city_map, text):
+    """The lookup used before the registry: first city name contained in the text"""
+    for number, name in city_map.items():
+        if name.lower() in text.lower():
+            return number
+    return None
+
+
+def timed_lookups(lookup, queries):
+    """(per-query microseconds, fraction resolved to the expected city)"""
+    latencies, correct = [], 0
+    for text, expected in queries:
+        start = time.perf_counter()
+        found = lookup(text)
+        latencies.append((time.perf_counter() - start) * 1e6)
+        correct += found == expected
+    return latencies, correct / len(queries)
+
+
+def timed_ms(fn):
+    start = time.perf_counter()
+    value = fn()
+    return value, (time.perf_counter() - start) * 1000
+
+
+def main(args):
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = pathlib.Path(tmp) / "cities"
+        _, ms = timed_ms(lambda: generate_catalogue(data_dir, args.cities, args.seed))
+        print(f"Generated {args.cities} cities with shards in {ms:.0f} ms")
+
+        registry, ms = timed_ms(lambda: CityRegistry.load(data_dir))
+        print(f"Catalogue load + name index: {ms:.0f} ms")
+
+        sample = rng.sample(sorted(registry.city_map.items()), min(args.queries, args.cities))
+        kinds = {
+            "exact": [(name, city_id) for city_id, name in sample],
+            "normalized": [(name.lower().removesuffix(" city"), city_id) for city_id, name in sample],
+            "contained": [(f"The city in this image is {name}.", city_id) for city_id, name in sample],
+            "misspelled": [(misspell(name, rng), city_id) for city_id, name in sample],
+        }
+        print(f"\nName lookup ({len(sample)} queries each)")
+        for kind, queries in kinds.items():
+            latencies, accuracy = timed_lookups(registry.lookup, queries)
+            print(f"  registry     {kind:11} {latency_line(latencies, 'us', 9)}  correct {accuracy:6.1%}")
+            latencies, accuracy = timed_lookups(lambda text: linear_scan(registry.city_map, text), queries[:args.scan_queries])
+            print(f"  linear scan  {kind:11} {latency_line(latencies, 'us', 9)}  correct {accuracy:6.1%}")
+
+        index_dir = pathlib.Path(tmp) / "index"
+        index, ms = timed_ms(lambda: ShardedEmbeddingIndex.load_or_build(registry, HashingEmbedder(), index_dir))
+        print(f"\nShard index build: {ms:.0f} ms ({len(index.chunks)} chunks)")
+        index, ms = timed_ms(lambda: ShardedEmbeddingIndex.load_or_build(registry, HashingEmbedder(), index_dir))
+        print(f"Shard index load:  {ms:.0f} ms")
+        dataset, ms = timed_ms(lambda: CityDataset.load_or_build(registry, index_dir))
+        print(f"City records parse: {ms:.0f} ms ({len(dataset.records)} records)")
+        _, ms = timed_ms(lambda: CityDataset.load_or_build(registry, index_dir))
+        print(f"City records load:  {ms:.0f} ms")
+
+        query = "How many people are trapped and where?"
+        shard_latencies, corpus_latencies = [], []
+        for city_id, _ in sample[:args.retrievals]:
+            start = time.perf_counter()
+            index.search(city_id, query)
+            shard_latencies.append((time.perf_counter() - start) * 1e6)
+
+            # Previous behaviour: score every chunk of the corpus
+            start = time.perf_counter()
+            scores = index.vectors @ index.embedder.embed_query(query)
+            [index.chunks[i] for i in np.argsort(-scores)[:4]]
+            corpus_latencies.append((time.perf_counter() - start) * 1e6)
+        print(f"\nRetrieval ({len(shard_latencies)} queries)")
+        print(f"  city shard    {latency_line(shard_latencies, 'us', 9)}")
+        print(f"  whole corpus  {latency_line(corpus_latencies, 'us', 9)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=2000, help="name lookups per kind")
+    parser.add_argument("--scan-queries", type=int, default=200, help="lookups per kind for the slow linear scan")
+    parser.add_argument("--retrievals", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
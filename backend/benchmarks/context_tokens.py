@@ -0,0 +1,71 @@
+"""
+Prompt token benchmark for context compaction
+
+Runs an uncached disaster analysis for every city with context compaction
+off (every analyst gets all collected facts) and on (each analyst gets only
+its AGENT_CONTEXT_FIELDS), and reports prompt and completion tokens per
+agent and per run. Token usage comes from the LLM call events; the stub
+provider estimates it from the prompt length (about 4 characters per
+token), a real provider reports its own counts.
+
+Usage (from backend/):
+    python -m benchmarks.context_tokens
+    python -m benchmarks.context_tokens --city-data rag
+    python -m benchmarks.context_tokens --provider gemini --runs 1
+"""
+
+import argparse
+import os
+
+
+def measure(postdisaster_system, telemetry, city_ids):
+    """Average tokens per run: ({agent: prompt tokens}, prompt total, completion total)"""
+    per_agent = {}
+    completion = 0
+    for city_id in city_ids:
+        trace = telemetry.start_trace()
+        postdisaster_system.run_disaster_analysis(city_id)
+        for agent, counts in trace.breakdown()["tokens"].items():
+            per_agent[agent] = per_agent.get(agent, 0) + counts["prompt"]
+            completion += counts["completion"]
+    runs = len(city_ids)
+    return {agent: tokens // runs for agent, tokens in per_agent.items()}, sum(per_agent.values()) // runs, completion // runs
+
+
+def main(args):
+    # Provider settings are read at import time, so set them before importing the pipeline
+    os.environ["LLM_PROVIDER"] = args.provider
+    os.environ.setdefault("STUB_TEXT_LATENCY", "fixed:1")
+
+    import postdisaster_system
+    import telemetry
+    from cities import city_map
+    from resources import get_registry
+
+    get_registry().startup()
+    postdisaster_system.CREW_CITY_DATA = args.city_data
+    city_ids = list(city_map)[:args.cities] * args.runs
+
+    results = {}
+    for compaction in (False, True):
+        postdisaster_system.CREW_CONTEXT_COMPACTION = compaction
+        results[compaction] = measure(postdisaster_system, telemetry, city_ids)
+
+    print(f"\nPrompt tokens per run ({args.provider}, city data from {args.city_data}, {len(city_ids)} runs each)")
+    before, after = results[False][0], results[True][0]
+    for agent in sorted(set(before) | set(after)):
+        print(f"  {agent:26} {before.get(agent, 0):6} -> {after.get(agent, 0):6}")
+    total_before, total_after = results[False][1], results[True][1]
+    print(f"  {'Total':26} {total_before:6} -> {total_after:6}  "
+          f"({100 * (total_before - total_after) / total_before:.0f}% fewer)")
+    print(f"  Completion tokens per run: {results[False][2]} -> {results[True][2]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--provider", default="stub", help="LLM_PROVIDER to measure")
+    parser.add_argument("--city-data", choices=["dataset", "rag"], default="dataset",
+                        help="where the analysts' facts come from (see CREW_CITY_DATA)")
+    parser.add_argument("--cities", type=int, default=5, help="cities analysed per run")
+    parser.add_argument("--runs", type=int, default=1, help="repetitions per city")
+    main(parser.parse_args())
@@ -0,0 +1,71 @@
+"""
+Event-loop responsiveness benchmark
+
+Measures /cities/ latency while crew runs are in flight on /analyze-city/.
+The crew is replaced by a stub that blocks its thread for --crew-seconds,
+like a crew waiting on LLM calls, so no network access is needed.
+
+Usage (from backend/):
+    python -m benchmarks.event_loop --crews 4 --crew-seconds 2
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+import main_api
+import postdisaster_system
+from benchmarks._common import latency_summary
+
+
+def stub_crew(seconds):
+    def run_disaster_analysis_cached(selected_city_id):
+        time.sleep(seconds)
+        return {"Needs Analyst Agent": f"stub report for city {selected_city_id}"}
+    return run_disaster_analysis_cached
+
+
+async def probe_cities(client, duration):
+    """Hit /cities/ back to back for `duration` seconds, returning latencies in ms"""
+    latencies = []
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        response = await client.get("/cities/")
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+async def main(args):
+    # The endpoint imports the function on first use, so patch it at the source
+    postdisaster_system.run_disaster_analysis_cached = stub_crew(args.crew_seconds)
+    transport = httpx.ASGITransport(app=main_api.app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        idle = await probe_cities(client, args.crew_seconds / 2)
+
+        crews = [asyncio.create_task(client.get(f"/analyze-city/{1 + i % 5}")) for i in range(args.crews)]
+        await asyncio.sleep(0.05)  # let the crews get admitted
+        loaded = await probe_cities(client, args.crew_seconds / 2)
+        statuses = [response.status_code for response in await asyncio.gather(*crews)]
+
+    idle_stats = latency_summary(idle, digits=3)
+    loaded_stats = latency_summary(loaded, digits=3)
+    print(f"Crew runs in flight: {args.crews} x {args.crew_seconds}s (statuses: {statuses})")
+    print(f"/cities/ idle:   {idle_stats}")
+    print(f"/cities/ loaded: {loaded_stats}")
+
+    if loaded_stats["p95_ms"] > args.max_p95_ms:
+        raise SystemExit(f"FAIL: loaded p95 {loaded_stats['p95_ms']}ms exceeds {args.max_p95_ms}ms")
+    print("OK: /cities/ stays responsive while crews run")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--crews", type=int, default=4, help="concurrent /analyze-city/ requests")
+    parser.add_argument("--crew-seconds", type=float, default=2.0, help="stubbed crew duration")
+    parser.add_argument("--max-p95-ms", type=float, default=50.0, help="fail above this loaded p95")
+    asyncio.run(main(parser.parse_args()))
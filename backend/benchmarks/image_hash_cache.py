@@ -0,0 +1,106 @@
+"""
+Perceptual-hash detection cache benchmark
+
+Replays a synthetic upload trace through detect_city_with_red_cross with a
+stubbed vision model. The trace re-uploads tiles exactly, re-encoded as
+JPEG, slightly resized or brightened, like field teams do. Reports the
+cache hit rate and the model latency saved.
+
+Usage (from backend/):
+    python -m benchmarks.image_hash_cache --tiles 20 --uploads 200 --model-ms 800
+"""
+
+import argparse
+import io
+import random
+import tempfile
+import time
+
+from PIL import Image, ImageEnhance
+
+import image_hash
+import satellite
+from benchmarks._common import synthetic_tile
+
+
+class StubVisionModel:
+    """Stands in for the Gemini model: sleeps, then answers with `next_city`"""
+
+    def __init__(self, latency_ms):
+        self.latency = latency_ms / 1000
+        self.calls = 0
+        self.next_city = 1
+
+    def generate_content(self, parts):
+        self.calls += 1
+        time.sleep(self.latency)
+        city_number = self.next_city
+
+        class Response:
+            text = satellite.city_map[city_number]
+        return Response()
+
+
+def variant(tile, rng):
+    """A near-duplicate re-upload of a tile"""
+    kind = rng.choice(["exact", "jpeg", "resize", "brighten"])
+    if kind == "jpeg":
+        buffer = io.BytesIO()
+        tile.save(buffer, "JPEG", quality=70)
+        return Image.open(io.BytesIO(buffer.getvalue())).convert("RGB")
+    if kind == "resize":
+        return tile.resize((tile.width * 3 // 4, tile.height * 3 // 4))
+    if kind == "brighten":
+        return ImageEnhance.Brightness(tile).enhance(1.05)
+    return tile
+
+
+def main(args):
+    rng = random.Random(args.seed)
+    tiles = [synthetic_tile(seed) for seed in range(args.tiles)]
+    model = StubVisionModel(args.model_ms)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index = image_hash.ImageHashIndex(
+            path=f"{tmp_dir}/hashes.sqlite3", algorithm=args.algorithm, max_distance=args.max_distance,
+        )
+        image_hash._index = index
+
+        wrong = 0
+        latencies = []
+        for i in range(args.uploads):
+            tile_id = rng.randrange(args.tiles)
+            upload = variant(tiles[tile_id], rng)
+            path = f"{tmp_dir}/upload{i}.png"
+            upload.save(path)
+            model.next_city = _expected_city(tile_id)
+
+            start = time.perf_counter()
+            city_number, _ = satellite.detect_city_with_red_cross(path, model=model)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if city_number != _expected_city(tile_id):
+                wrong += 1
+
+    stats = index.stats()
+    uncached_ms = args.uploads * args.model_ms
+    total_ms = sum(latencies)
+    print(f"Uploads: {args.uploads} over {args.tiles} distinct tiles, {args.algorithm} max distance {args.max_distance}")
+    print(f"Model calls: {model.calls}  cache hits: {stats['hits']}  hit rate: {stats['hit_ratio']:.1%}")
+    print(f"Wrong detections from cache: {wrong}")
+    print(f"Mean latency: {total_ms / args.uploads:.1f} ms (without cache ~{args.model_ms:.0f} ms)")
+    print(f"Latency saved: {(uncached_ms - total_ms) / 1000:.1f} s of {uncached_ms / 1000:.1f} s")
+
+
+def _expected_city(tile_id):
+    return tile_id % len(satellite.city_map) + 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tiles", type=int, default=20, help="distinct tiles in the trace")
+    parser.add_argument("--uploads", type=int, default=200, help="uploads to replay")
+    parser.add_argument("--model-ms", type=float, default=800, help="stubbed vision model latency")
+    parser.add_argument("--max-distance", type=int, default=image_hash.IMAGE_HASH_MAX_DISTANCE)
+    parser.add_argument("--algorithm", choices=sorted(image_hash.HASH_FUNCTIONS), default="phash")
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
@@ -0,0 +1,94 @@
+"""
+API import-time benchmark
+
+Imports a module in fresh interpreters with `-X importtime` and reports its
+cumulative import time, the slowest top-level imports, and whether any
+module of the agent stack was loaded. Exits non-zero when the median import
+time exceeds --max-ms or a heavy module is imported, so it can guard against
+regressions of the fast startup path.
+
+Usage (from backend/):
+    python -m benchmarks.import_time --runs 5 --max-ms 1000
+    python -m benchmarks.import_time --module postdisaster_system --max-ms 0   # cost of the agent stack
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+# Modules that must stay out of the API's import path
+HEAVY_MODULES = ["crewai", "crewai_tools", "langchain", "langchain_openai", "litellm", "pyttsx3", "google.generativeai"]
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def import_profile(module):
+    """
+    Import `module` in a fresh interpreter
+
+    Returns:
+        tuple: (cumulative ms of the module, {direct import: cumulative ms}, set of imported names)
+    """
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=backend_dir, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    # Children are printed (one level deeper) before the module that imported them
+    total_ms = None
+    direct = {}
+    children = {}
+    imported = set()
+    for line in result.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if not match:
+            continue
+        cumulative_us, indent, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        imported.add(name)
+        if indent == 3:
+            children[name] = cumulative_us / 1000
+        elif indent == 1:
+            if name == module:
+                total_ms = cumulative_us / 1000
+                direct = children
+            children = {}
+    return total_ms, direct, imported
+
+
+def main(args):
+    totals = []
+    for _ in range(args.runs):
+        total_ms, direct, imported = import_profile(args.module)
+        totals.append(total_ms)
+
+    median_ms = statistics.median(totals)
+    heavy = sorted(name for name in imported if name.split(".")[0] in HEAVY_MODULES or name in HEAVY_MODULES)
+
+    print(f"import {args.module}: median {median_ms:.1f} ms over {args.runs} runs (min {min(totals):.1f} ms)")
+    print(f"Slowest imports made by {args.module} (last run):")
+    for name, ms in sorted(direct.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {ms:8.1f} ms  {name}")
+    print(f"Agent stack modules imported: {', '.join(heavy) if heavy else 'none'}")
+
+    if args.max_ms <= 0:
+        return
+    if heavy:
+        raise SystemExit(f"FAIL: {args.module} imports {', '.join(heavy[:5])}")
+    if median_ms > args.max_ms:
+        raise SystemExit(f"FAIL: median import time {median_ms:.1f}ms exceeds {args.max_ms}ms")
+    print(f"OK: {args.module} imports in under {args.max_ms:.0f} ms without the agent stack")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main_api", help="module to import")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to average over")
+    parser.add_argument("--top", type=int, default=10, help="slowest direct imports to list")
+    parser.add_argument("--max-ms", type=float, default=1000.0, help="fail above this median (0 to only report)")
+    main(parser.parse_args())
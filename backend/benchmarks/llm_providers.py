@@ -0,0 +1,86 @@
+"""
+Provider benchmark for the whole pipeline
+
+Runs satellite detections and complete crew analyses against one LLM
+provider and reports throughput and latency percentiles. With the default
+stub provider it needs no network or API key and, for a given seed, gives
+the same results on every run, so it can run in CI. Point --provider at a
+real provider (with its API key set) to compare it on the same workload.
+
+Usage (from backend/):
+    python -m benchmarks.llm_providers --analyses 20 --concurrency 4
+    python -m benchmarks.llm_providers --text-latency fixed:300 --vision-latency uniform:500:900
+    python -m benchmarks.llm_providers --provider gemini --analyses 5
+"""
+
+import argparse
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks._common import latency_summary, synthetic_upload
+
+
+def timed_calls(fn, inputs, concurrency):
+    """Run fn over inputs on `concurrency` threads; returns (wall seconds, per-call ms)"""
+    def timed(item):
+        start = time.perf_counter()
+        fn(item)
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(timed, inputs))
+    return time.perf_counter() - start, latencies
+
+
+def main(args):
+    # Provider settings are read at import time, so set them before importing the pipeline
+    os.environ["LLM_PROVIDER"] = args.provider
+    os.environ["IMAGE_HASH_CACHE"] = "0"
+    os.environ["STUB_SEED"] = str(args.seed)
+    if args.text_latency:
+        os.environ["STUB_TEXT_LATENCY"] = args.text_latency
+    if args.vision_latency:
+        os.environ["STUB_VISION_LATENCY"] = args.vision_latency
+
+    import postdisaster_system
+    import satellite
+    from resources import get_registry
+
+    registry = get_registry()
+    print(f"Provider: {args.provider}  startup {registry.timings.get('total')} ms")
+
+    uploads = [synthetic_upload(seed, 1024) for seed in range(args.detections)]
+    wall, latencies = timed_calls(
+        lambda data: satellite.detect_city_with_red_cross(io.BytesIO(data), filename="upload.jpg", size=len(data)),
+        uploads, args.concurrency,
+    )
+    print(f"Vision detections: {len(uploads) / wall:6.2f} /s  {latency_summary(latencies)}")
+
+    city_ids = [1 + i % 5 for i in range(args.analyses)]
+    reports = []
+    wall, latencies = timed_calls(
+        lambda city_id: reports.append(postdisaster_system.run_disaster_analysis(city_id)),
+        city_ids, args.concurrency,
+    )
+    complete = sum(len(r) == len(postdisaster_system.AGENT_OUTPUT_NAMES) for r in reports)
+    print(f"Crew analyses:     {len(city_ids) / wall:6.2f} /s  {latency_summary(latencies)}  complete {complete}/{len(city_ids)}")
+
+    for name, model in (("text", registry.llm), ("vision", registry.vision_model)):
+        stats = getattr(model, "stats", None)
+        if stats is not None:
+            print(f"Stub {name} model calls: {stats.summary()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--provider", default="stub", help="LLM_PROVIDER to benchmark")
+    parser.add_argument("--detections", type=int, default=20, help="satellite detections to run")
+    parser.add_argument("--analyses", type=int, default=10, help="complete crew analyses to run (uncached)")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--text-latency", help="stub text latency spec, e.g. lognormal:800:0.4")
+    parser.add_argument("--vision-latency", help="stub vision latency spec, e.g. fixed:1200")
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
@@ -0,0 +1,144 @@
+"""
+Model call fault-injection benchmark
+
+Drives the model call policy (model_calls.ModelCaller) with the stub
+models' injected faults (see llm_providers.FaultInjector), no API key or
+network needed:
+
+- transient errors: share of calls that succeed without and with retries
+- outage: the circuit breaker opens, later calls fail fast, and a probe
+  closes it again once the model recovers
+- slow tail: call latency without and with hedged requests
+- pipeline: city analyses through the agent LLM with transient errors,
+  then during an outage (a clear error, no empty analysis), and an image
+  of no supported city (rejected instead of analysing Seabrook City)
+
+Usage (from backend/):
+    python -m benchmarks.model_faults
+    python -m benchmarks.model_faults --error-rate 0.3 --calls 500
+"""
+
+import argparse
+import io
+import os
+import time
+
+from benchmarks._common import latency_line
+
+
+def run_calls(caller, model, calls):
+    """(successes, latencies in ms, errors by type) for `calls` vision calls"""
+    successes, latencies, errors = 0, [], {}
+    for _ in range(calls):
+        start = time.perf_counter()
+        try:
+            caller.call(model.generate_content, ["Which city?", {"mime_type": "image/png", "data": b"x"}])
+            successes += 1
+        except Exception as e:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+        latencies.append((time.perf_counter() - start) * 1000)
+    return successes, latencies, errors
+
+
+def policy(args):
+    from llm_providers import StubVisionModel
+    from model_calls import CircuitBreaker, ModelCaller, ModelUnavailableError
+
+    latency = f"fixed:{args.model_ms}"
+    print(f"\nTransient errors ({args.error_rate:.0%} of calls fail, {args.calls} calls)")
+    for attempts in (1, 3):
+        model = StubVisionModel(latency=latency, responses={}, faults=f"error:{args.error_rate}")
+        caller = ModelCaller("vision model", attempts=attempts, base_delay=0.01, max_delay=0.05,
+                             breaker=CircuitBreaker("vision model", failure_threshold=10 ** 6))
+        successes, latencies, errors = run_calls(caller, model, args.calls)
+        print(f"  {attempts} attempt(s): {successes / args.calls:6.1%} succeed  {latency_line(latencies)}  errors {errors}")
+
+    print("\nOutage (every call fails, breaker opens after 5 failures, 0.5 s reset)")
+    model = StubVisionModel(latency=latency, responses={}, faults="error:1")
+    caller = ModelCaller("vision model", attempts=3, base_delay=0.01, max_delay=0.05,
+                         breaker=CircuitBreaker("vision model", failure_threshold=5, reset_seconds=0.5))
+    successes, latencies, errors = run_calls(caller, model, 20)
+    print(f"  20 calls: {errors}, {model.faults.injected_errors} reached the model")
+    start = time.perf_counter()
+    try:
+        caller.call(model.generate_content, ["Which city?"])
+    except ModelUnavailableError as e:
+        print(f"  open circuit fails fast in {(time.perf_counter() - start) * 1e6:.0f} us: {e}")
+    model.faults.error_rate = 0
+    time.sleep(0.5)
+    run_calls(caller, model, 1)
+    print(f"  after recovery and the reset time: {caller.breaker.stats()['state']}")
+
+    print(f"\nSlow tail ({args.slow_rate:.0%} of calls take +{args.slow_ms} ms, {args.calls} calls)")
+    for hedge in (False, True):
+        model = StubVisionModel(latency=latency, responses={}, faults=f"slow:{args.slow_rate}:{args.slow_ms}")
+        caller = ModelCaller("vision model", hedge=hedge)
+        successes, latencies, errors = run_calls(caller, model, args.calls)
+        print(f"  hedging {'on ' if hedge else 'off'}: {latency_line(latencies)}  "
+              f"{caller.hedged} hedged, {caller.hedge_wins} won by the hedge, {len(model.stats._latencies)} model calls")
+
+
+def pipeline(args):
+    from PIL import Image
+
+    from cities import city_map
+    from model_calls import ModelCallError, get_model_caller
+    from postdisaster_system import AGENT_OUTPUT_NAMES, analyze_city_from_image_and_run_crew, run_disaster_analysis
+    from resources import get_registry
+    from satellite import CityNotDetectedError
+
+    registry = get_registry()
+    registry.startup()
+    caller = get_model_caller("text")
+    print(f"\nCity analyses with {args.error_rate:.0%} agent LLM errors ({len(city_map)} cities, "
+          f"{len(AGENT_OUTPUT_NAMES)} reports each)")
+    for attempts in (1, 3):
+        caller.attempts = attempts
+        reports = sum(len(run_disaster_analysis(city_id)) for city_id in city_map)
+        print(f"  {attempts} attempt(s): {reports}/{len(city_map) * len(AGENT_OUTPUT_NAMES)} reports")
+
+    registry.llm.faults.error_rate = 1
+    start = time.perf_counter()
+    try:
+        run_disaster_analysis(1)
+        print("  outage: analysis returned without an error")
+    except ModelCallError as e:
+        print(f"  outage: {type(e).__name__} after {time.perf_counter() - start:.2f} s: {e}")
+    start = time.perf_counter()
+    try:
+        run_disaster_analysis(2)
+    except ModelCallError as e:
+        print(f"  next request: {type(e).__name__} after {(time.perf_counter() - start) * 1000:.1f} ms (status {e.status_code})")
+
+    # The stub vision model answers with a city that is not in the catalogue
+    registry.vision_model.responses["vision"] = "Atlantis"
+    image = io.BytesIO()
+    Image.new("RGB", (64, 64)).save(image, "PNG")
+    image.seek(0)
+    try:
+        analyze_city_from_image_and_run_crew(image, filename="unlabelled.png", size=len(image.getvalue()))
+        print("  unrecognised image: analysed anyway")
+    except CityNotDetectedError as e:
+        print(f"  unrecognised image: {e} (status {e.status_code})")
+
+
+def main(args):
+    # Provider settings are read at import time, so set them before importing any of the pipeline
+    os.environ["LLM_PROVIDER"] = "stub"
+    os.environ["STUB_TEXT_LATENCY"] = f"fixed:{args.model_ms}"
+    os.environ["STUB_VISION_LATENCY"] = f"fixed:{args.model_ms}"
+    os.environ["STUB_FAULTS"] = f"error:{args.error_rate}"
+    os.environ["MODEL_RETRY_BASE_DELAY"] = "0.01"
+
+    policy(args)
+    pipeline(args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=300, help="model calls per policy scenario")
+    parser.add_argument("--model-ms", type=int, default=20, help="stub model latency per call")
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    parser.add_argument("--slow-rate", type=float, default=0.02, help="share of slow calls (hedging at p95 targets a tail under 5%%)")
+    parser.add_argument("--slow-ms", type=int, default=500)
+    main(parser.parse_args())
@@ -0,0 +1,300 @@
+"""
+End-to-end pipeline benchmark
+
+Drives the pipeline with the stub model providers and synthetic satellite
+images, so no API key or network is needed:
+
+- satellite: analyze_city_image on a new synthetic image per call
+- crew: run_disaster_analysis for each city in turn (no result cache)
+- api:analyze-image, api:analyze-city, api:complete-analysis: the FastAPI
+  endpoints, called in process through the app (middleware, executor
+  limits and all)
+
+Each scenario runs --requests calls at every --concurrency level and
+reports throughput, p50/p95/p99 latency, errors, peak RSS and the time per
+pipeline stage (from the stage histogram behind /metrics). Results are
+written as JSON, by default to benchmarks/results/pipeline-<commit>.json;
+--compare prints the change against an earlier results file and exits
+with status 1 when a scenario got slower by more than --threshold.
+
+Usage (from backend/):
+    python -m benchmarks.pipeline
+    python -m benchmarks.pipeline --scenarios satellite crew --concurrency 1 8 --requests 32
+    python -m benchmarks.pipeline --compare benchmarks/results/pipeline-ecee99c.json
+"""
+
+import argparse
+import datetime
+import io
+import json
+import os
+import pathlib
+import platform
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks._common import percentile, synthetic_image
+
+SCENARIOS = ["satellite", "crew", "api:analyze-image", "api:analyze-city", "api:complete-analysis"]
+RESULTS_DIR = pathlib.Path(__file__).parent / "results"
+
+
+def rss_mb():
+    """Resident memory of this process in MB, or None where /proc is not available"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def max_rss_mb():
+    """Peak resident memory over the whole run in MB (None on Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if platform.system() == "Darwin" else peak / 1024
+
+
+class RssSampler:
+    """Samples RSS in the background to find the peak during one level"""
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.peak = rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            current = rss_mb()
+            if current is not None:
+                self.peak = max(self.peak or 0, current)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def stage_totals():
+    """(seconds, count) per stage from the stage histogram"""
+    from telemetry import STAGE_SECONDS
+
+    totals = {}
+    for name, key, value in STAGE_SECONDS.samples():
+        if name.endswith("_sum") or name.endswith("_count"):
+            seconds, count = totals.get(key[0], (0.0, 0))
+            totals[key[0]] = (seconds + value, count) if name.endswith("_sum") else (seconds, count + value)
+    return totals
+
+
+def stage_breakdown(before, after, requests):
+    """Per stage: how often it ran during a level and the time it took per call and per request"""
+    stages = {}
+    for stage, (seconds, count) in sorted(after.items()):
+        seconds -= before.get(stage, (0.0, 0))[0]
+        count -= before.get(stage, (0.0, 0))[1]
+        if count:
+            stages[stage] = {
+                "calls": count,
+                "mean_ms": round(seconds / count * 1000, 2),
+                "per_request_ms": round(seconds / requests * 1000, 2),
+            }
+    return stages
+
+
+def run_level(call, concurrency, requests):
+    """
+    Run call(n) for n in range(requests) on `concurrency` threads
+
+    Args:
+        call: Function of the request number; raises (or returns an error
+            name) when the request failed
+
+    Returns:
+        dict: Throughput, latency percentiles, errors, peak RSS and stage breakdown
+    """
+    def timed(n):
+        start = time.perf_counter()
+        try:
+            error = call(n)
+        except Exception as e:
+            error = type(e).__name__
+        return (time.perf_counter() - start) * 1000, error
+
+    before = stage_totals()
+    with RssSampler() as sampler, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        outcomes = list(pool.map(timed, range(requests)))
+        wall = time.perf_counter() - start
+
+    latencies = sorted(ms for ms, _ in outcomes)
+    errors = {}
+    for _, error in outcomes:
+        if error:
+            errors[error] = errors.get(error, 0) + 1
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(requests / wall, 2),
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 2),
+            "p50": round(percentile(latencies, 0.50), 2),
+            "p95": round(percentile(latencies, 0.95), 2),
+            "p99": round(percentile(latencies, 0.99), 2),
+            "max": round(latencies[-1], 2),
+        },
+        "peak_rss_mb": round(sampler.peak, 1) if sampler.peak is not None else None,
+        "stages": stage_breakdown(before, stage_totals(), requests),
+    }
+
+
+def scenario_calls(client):
+    """Function of (request number, image bytes) per scenario"""
+    from cities import city_map
+    from postdisaster_system import run_disaster_analysis
+    from satellite import analyze_city_image
+
+    city_ids = list(city_map)
+
+    def api_error(response):
+        return None if response.status_code < 400 else f"HTTP {response.status_code}"
+
+    def upload(path, n, image):
+        return client.post(path, files={"file": (f"synthetic-{n}.png", image, "image/png")})
+
+    return {
+        "satellite": lambda n, image: None if analyze_city_image(io.BytesIO(image), f"synthetic-{n}.png", len(image))
+        else "NotDetected",
+        "crew": lambda n, image: None if run_disaster_analysis(city_ids[n % len(city_ids)]) else "NoReports",
+        "api:analyze-image": lambda n, image: api_error(upload("/analyze-image/", n, image)),
+        "api:analyze-city": lambda n, image: api_error(client.get(f"/analyze-city/{city_ids[n % len(city_ids)]}")),
+        "api:complete-analysis": lambda n, image: api_error(upload("/complete-analysis/", n, image)),
+    }
+
+
+def git_commit():
+    """Short hash of the checked-out commit, with "-dirty" for uncommitted changes (None outside git)"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip()
+        return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, threshold):
+    """Print the change per scenario and level against an earlier run; returns the number of regressions"""
+    baseline = json.loads(pathlib.Path(baseline_path).read_text(encoding="utf-8"))
+    previous = {(row["scenario"], row["concurrency"]): row for row in baseline["results"]}
+    print(f"\nCompared with {baseline_path} (commit {baseline.get('commit')}):")
+    regressions = compared = 0
+    for row in results["results"]:
+        old = previous.get((row["scenario"], row["concurrency"]))
+        if old is None:
+            continue
+        compared += 1
+        throughput = row["throughput_rps"] / old["throughput_rps"] - 1
+        p95 = row["latency_ms"]["p95"] / old["latency_ms"]["p95"] - 1
+        slower = throughput < -threshold or p95 > threshold
+        regressions += slower
+        print(f"  {row['scenario']:<22} x{row['concurrency']:<3} throughput {throughput:+7.1%}  p95 {p95:+7.1%}"
+              f"{'  REGRESSION' if slower else ''}")
+    if not compared:
+        print("  no scenario and concurrency level in common")
+    return regressions
+
+
+def main(args):
+    tmp = tempfile.TemporaryDirectory()
+    # Settings are read at import time, so set them before importing the pipeline
+    os.environ.update({
+        "LLM_PROVIDER": "stub",
+        "VISION_PROVIDER": "stub",
+        "EMBEDDER_PROVIDER": "hashing",
+        "STUB_TEXT_LATENCY": f"fixed:{args.llm_ms}",
+        "STUB_VISION_LATENCY": f"fixed:{args.vision_ms}",
+        "WARMUP_MODE": "blocking",
+        "IMAGE_HASH_CACHE": "0",
+        "TTS_BULLETINS": "0",
+        "RESULT_CACHE_BACKEND": "memory",
+        "JOBS_DB": f"{tmp.name}/jobs.sqlite3",
+        "IMAGE_HASH_DB": f"{tmp.name}/hashes.sqlite3",
+        "EMBEDDING_INDEX_DIR": f"{tmp.name}/index",
+    })
+    if not args.result_cache:
+        # Every analysis runs the crew (concurrent requests for one city still share a run)
+        os.environ["RESULT_CACHE_BACKEND"] = "none"
+
+    from fastapi.testclient import TestClient
+
+    import main_api
+
+    results = {
+        "benchmark": "pipeline",
+        "commit": git_commit(),
+        "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "results": [],
+    }
+
+    seed = 0
+    with TestClient(main_api.app) as client:
+        calls = scenario_calls(client)
+        for scenario in args.scenarios:
+            call = calls[scenario]
+            # One untimed call so first-use costs (crew build, lazy imports) are not counted
+            call(-1, synthetic_image(seed, args.image_size))
+            seed += 1
+            print(f"\n{scenario}")
+            for concurrency in args.concurrency:
+                # A new image per request, so nothing is answered from a previous upload
+                images = [synthetic_image(seed + n, args.image_size) for n in range(args.requests)]
+                seed += args.requests
+                row = {"scenario": scenario, **run_level(lambda n: call(n, images[n]), concurrency, args.requests)}
+                results["results"].append(row)
+                latency = row["latency_ms"]
+                print(f"  x{concurrency:<3} {row['throughput_rps']:7.2f} req/s  p50 {latency['p50']:8.1f} ms  "
+                      f"p95 {latency['p95']:8.1f} ms  p99 {latency['p99']:8.1f} ms  "
+                      f"peak RSS {row['peak_rss_mb']} MB  errors {row['errors'] or 'none'}")
+                slowest = sorted(row["stages"].items(), key=lambda item: -item[1]["per_request_ms"])[:4]
+                print("       " + "  ".join(f"{stage} {stats['per_request_ms']:.1f} ms" for stage, stats in slowest))
+
+    results["max_rss_mb"] = round(max_rss_mb(), 1) if max_rss_mb() is not None else None
+    output = pathlib.Path(args.output or RESULTS_DIR / f"pipeline-{results['commit'] or 'local'}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"\nResults written to {output}")
+    tmp.cleanup()
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=16, help="requests per scenario and concurrency level")
+    parser.add_argument("--vision-ms", type=int, default=200, help="stub vision model latency per call")
+    parser.add_argument("--llm-ms", type=int, default=100, help="stub agent LLM latency per call")
+    parser.add_argument("--image-size", type=int, default=1024, help="synthetic image width and height in pixels")
+    parser.add_argument("--result-cache", action="store_true", help="keep the analysis result cache on")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/pipeline-<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1, help="slowdown reported as a regression (0.1: 10%%)")
+    main(parser.parse_args())
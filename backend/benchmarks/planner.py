@@ -0,0 +1,68 @@
+"""
+Bulk planner benchmark
+
+Computes resource and dispatch figures for a grid of what-if casualty
+scenarios over every city, once through the agent tools (`resourcing` and
+`helping`, one call per city and scenario) and once through the vectorized
+planner. Checks that both give the same numbers and reports the speedup.
+
+Usage (from backend/):
+    python -m benchmarks.planner --scenarios 2000
+"""
+
+import argparse
+import re
+import time
+
+import numpy as np
+
+from city_data import get_city_dataset
+from planner import plan
+from postdisaster_system import helping, resourcing
+
+
+def tool_path(populations, hurt):
+    """Figures the way an agent gets them: one tool call per value"""
+    food = []
+    units = []
+    for scenario in hurt:
+        food.append([[int(n) for n in re.findall(r"\d+", resourcing.run(int(p)))[:3]] for p in populations])
+        units.append([[int(n) for n in re.findall(r"\d+", helping.run(int(h)))] for h in scenario])
+    return np.array(food), np.array(units)
+
+
+def main(args):
+    records = get_city_dataset().records
+    populations = np.array([record.population for record in records])
+    baseline = np.array([record.hurt for record in records])
+    rng = np.random.default_rng(args.seed)
+    # Casualty estimates from 0.5x to 3x the reported figures
+    hurt = np.floor(baseline * rng.uniform(0.5, 3.0, (args.scenarios, len(records)))).astype(np.int64)
+    cells = hurt.size
+
+    start = time.perf_counter()
+    food, units = tool_path(populations, hurt)
+    tool_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        figures = plan(populations, hurt)
+    planner_ms = (time.perf_counter() - start) * 1000 / args.repeat
+
+    expected_food = np.stack([figures[name] for name in ("apples", "bananas", "oranges")], axis=-1)
+    expected_units = np.stack([figures[name] for name in ("helicopters", "police", "special_forces")], axis=-1)
+    consistent = np.array_equal(food, expected_food) and np.array_equal(units, expected_units)
+
+    print(f"Grid: {args.scenarios} scenarios x {len(records)} cities = {cells} cells")
+    print(f"Tool path:    {tool_ms:9.2f} ms  ({tool_ms * 1000 / cells:.2f} us per city)")
+    print(f"Planner:      {planner_ms:9.3f} ms  ({planner_ms * 1000 / cells:.4f} us per city)")
+    print(f"Speedup:      {tool_ms / planner_ms:9.0f}x")
+    print(f"Same figures: {consistent}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", type=int, default=2000, help="what-if casualty scenarios")
+    parser.add_argument("--repeat", type=int, default=20, help="planner repetitions to average")
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
@@ -0,0 +1,98 @@
+"""
+Regional sweep benchmark
+
+Generates a synthetic catalogue of --cities cities, then analyses all of
+them with the stub LLM provider behind the global rate limiter
+(LLM_RATE_LIMIT_RPM), twice:
+
+- serially, one city after another (the previous way to cover a region)
+- as a sweep, all cities scheduled concurrently and prioritised by casualties
+
+and reports wall time for each against the quota bound (LLM calls divided
+by the allowed rate), plus how closely the order in which cities finished
+follows their casualty ranking. The result cache is cleared between runs.
+
+Usage (from backend/):
+    python -m benchmarks.sweep --cities 12 --rpm 900
+"""
+
+import argparse
+import os
+import pathlib
+import tempfile
+import time
+
+
+def rank_correlation(order):
+    """Spearman correlation between finishing order and priority rank (1.0: finished in priority order)"""
+    n = len(order)
+    if n < 2:
+        return 1.0
+    distance = sum((finished - rank) ** 2 for finished, rank in enumerate(order))
+    return 1 - 6 * distance / (n * (n * n - 1))
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = pathlib.Path(tmp) / "cities"
+
+        # Settings are read at import time, so set them before importing the pipeline
+        os.environ.update({
+            "CITY_DATA_DIR": str(data_dir),
+            "EMBEDDING_INDEX_DIR": f"{tmp}/index",
+            "EMBEDDER_PROVIDER": "hashing",
+            "LLM_PROVIDER": "stub",
+            "STUB_TEXT_LATENCY": f"fixed:{args.model_ms}",
+            "LLM_RATE_LIMIT_RPM": str(args.rpm),
+            "LLM_RATE_LIMIT_BURST": str(args.burst),
+            "RESULT_CACHE_BACKEND": "memory",
+            "CREW_POOL_MAX_CITIES": str(args.cities),
+            "CREW_PREWARM_CITIES": "0",
+        })
+
+        from benchmarks.city_registry import generate_catalogue
+        generate_catalogue(data_dir, args.cities, args.seed)
+
+        from cities import city_map
+        from postdisaster_system import run_disaster_analysis_cached
+        from rate_limit import get_llm_rate_limiter
+        from resources import get_registry
+        from result_cache import get_result_cache
+        from sweep import run_sweep
+
+        get_registry().startup()
+        limiter = get_llm_rate_limiter()
+        city_ids = list(city_map)
+
+        get_result_cache().clear()
+        granted = limiter.granted
+        start = time.perf_counter()
+        for city_id in city_ids:
+            run_disaster_analysis_cached(city_id)
+        serial_seconds = time.perf_counter() - start
+        calls = limiter.granted - granted
+
+        get_result_cache().clear()
+        finished = []
+        report = run_sweep(city_ids, on_event=lambda event, data: finished.append(data["city_id"]) if event == "city" else None)
+        sweep_seconds = report["wall_ms"] / 1000
+
+        priority = {city["city_id"]: city["priority"] - 1 for city in report["cities"]}
+        quota_seconds = max(0, calls - args.burst) / (args.rpm / 60)
+        print(f"\n{len(city_ids)} cities, {calls} LLM calls per pass, {args.rpm:g} requests/min "
+              f"(burst {args.burst}), {args.model_ms} ms per stub call")
+        print(f"  serial   {serial_seconds:7.1f} s")
+        print(f"  sweep    {sweep_seconds:7.1f} s  ({serial_seconds / sweep_seconds:.1f}x faster, "
+              f"{report['complete']} complete, {report['partial']} partial, {report['failed']} failed)")
+        print(f"  quota bound {quota_seconds:5.1f} s")
+        print(f"  finishing order vs casualty rank: Spearman {rank_correlation([priority[c] for c in finished]):.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=12)
+    parser.add_argument("--rpm", type=float, default=900, help="LLM requests per minute for the rate limiter")
+    parser.add_argument("--burst", type=int, default=5)
+    parser.add_argument("--model-ms", type=int, default=800, help="stub LLM latency per call")
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
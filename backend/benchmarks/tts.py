@@ -0,0 +1,91 @@
+"""
+Audio bulletin benchmark
+
+Renders a set of agent-report bulletins with the local speech engine on
+the background process pool and reports:
+
+- the time the request path spends queueing them (rendering happens later)
+- render time per bulletin and total wall time, for 1 and --workers processes
+- serving repeated bulletins from the cache
+
+Usage (from backend/):
+    python -m benchmarks.tts
+    python -m benchmarks.tts --engine espeak --bulletins 40 --workers 4
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+
+from benchmarks._common import percentile
+from llm_providers import STUB_TEMPLATES
+from tts import TTS_ENGINE, AudioCache, AudioRenderer, engine_available, voice_settings
+
+FIGURES = {"population": 1200000, "hurt": 4500, "helicopters": 45, "police": 90, "special_forces": 22,
+           "apples": 2400000, "bananas": 1600000, "oranges": 800000}
+
+
+def bulletins(count):
+    """Agent-report-like texts of varied length, like a batch of city analyses"""
+    reports = {}
+    for n in range(count):
+        agent, template = list(STUB_TEMPLATES.items())[1 + n % (len(STUB_TEMPLATES) - 1)]
+        details = " Priority zones are listed in order of urgency." * (n % 4)
+        reports[f"{agent} #{n}"] = template.format(city=f"District {n}", **FIGURES) + details
+    return reports
+
+
+def wait_rendered(renderer, keys):
+    while any(renderer.pending(key) for key in keys):
+        time.sleep(0.005)
+
+
+def main(args):
+    settings = {**voice_settings(), "engine": args.engine}
+    reports = bulletins(args.bulletins)
+    print(f"{len(reports)} bulletins, engine {args.engine}")
+
+    for workers in sorted({1, args.workers}):
+        with tempfile.TemporaryDirectory() as tmp:
+            renderer = AudioRenderer(AudioCache(tmp), workers=workers, settings=settings)
+            # Start the worker processes first so their start-up is not counted as rendering
+            renderer.bulletins("Warm-up", {"Agent": "Ready."})
+            wait_rendered(renderer, list(renderer._inflight))
+            renderer.render_seconds, renderer.renders = 0.0, 0
+
+            start = time.perf_counter()
+            queued = renderer.bulletins("Region", reports)
+            queue_ms = (time.perf_counter() - start) * 1000
+            keys = [bulletin["audio_id"] for bulletin in queued]
+            wait_rendered(renderer, keys)
+            wall = time.perf_counter() - start
+
+            render_ms = sorted(renderer.cache.info(key)["render_ms"] for key in keys)
+            durations = [renderer.cache.info(key)["duration_s"] or 0 for key in keys]
+            print(f"\n{workers} worker(s)")
+            print(f"  queued on the request path in {queue_ms:.1f} ms ({queue_ms / len(keys):.2f} ms per bulletin)")
+            print(f"  render per bulletin: p50 {percentile(render_ms, 0.50):.0f} ms  "
+                  f"p95 {percentile(render_ms, 0.95):.0f} ms  for {statistics.mean(durations):.1f} s of audio")
+            print(f"  all rendered in {wall:.2f} s ({len(keys) / wall:.1f} bulletins/s)")
+
+            start = time.perf_counter()
+            again = renderer.bulletins("Region", reports)
+            cached_ms = (time.perf_counter() - start) * 1000
+            read_start = time.perf_counter()
+            for bulletin in again:
+                renderer.cache.audio_path(bulletin["audio_id"]).read_bytes()
+            read_ms = (time.perf_counter() - read_start) * 1000
+            ready = sum(bulletin["status"] == "ready" for bulletin in again)
+            print(f"  repeated: {ready}/{len(again)} from cache, looked up in {cached_ms / len(again):.2f} ms "
+                  f"and read in {read_ms / len(again):.2f} ms per bulletin")
+            renderer.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engine", default=TTS_ENGINE if engine_available() else "stub",
+                        help="pyttsx3, espeak or stub (default: TTS_ENGINE if installed, else stub)")
+    parser.add_argument("--bulletins", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=2)
+    main(parser.parse_args())
@@ -0,0 +1,130 @@
+"""
+Multi-worker throughput benchmark
+
+Starts serve.py with 1, 2, 4... workers and drives /analyze-image/ with
+concurrent uploads of a large JPEG. Each request does real CPU-bound work
+(decode, downscale, re-encode in image_preprocess) followed by a call to
+the stub vision provider that takes --model-ms, so no API key or network is
+needed. Reports requests per second per worker count and the speedup over
+a single worker.
+
+Usage (from backend/):
+    python -m benchmarks.worker_scaling --workers 1 2 4 --clients 16 --duration 10
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks._common import synthetic_upload
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers, port, args, tmp_dir):
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(
+        os.environ,
+        VISION_PROVIDER="stub",
+        STUB_VISION_LATENCY=f"fixed:{args.model_ms}",
+        WARMUP_MODE="lazy",
+        IMAGE_HASH_CACHE="0",
+        JOBS_DB=f"{tmp_dir}/jobs.sqlite3",
+        RESULT_CACHE_DB=f"{tmp_dir}/results.sqlite3",
+        IMAGE_HASH_DB=f"{tmp_dir}/hashes.sqlite3",
+    )
+    return subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--port", str(port),
+         "--host", "127.0.0.1", "--log-level", "warning"],
+        cwd=backend_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_ready(client, timeout=60):
+    end = time.perf_counter() + timeout
+    while time.perf_counter() < end:
+        try:
+            if (await client.get("/ready/")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise SystemExit("Server did not become ready")
+
+
+async def drive(client, image, clients, duration):
+    """Upload back to back from `clients` tasks for `duration` seconds"""
+    latencies = []
+    errors = 0
+    end = time.perf_counter() + duration
+
+    async def upload_loop(n):
+        nonlocal errors
+        while time.perf_counter() < end:
+            start = time.perf_counter()
+            response = await client.post("/analyze-image/", files={"file": (f"tile{n}.jpg", image, "image/jpeg")})
+            if response.status_code == 200:
+                latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                errors += 1
+
+    await asyncio.gather(*(upload_loop(n) for n in range(clients)))
+    return latencies, errors
+
+
+async def measure(workers, image, args):
+    port = free_port()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        server = start_server(workers, port, args, tmp_dir)
+        try:
+            limits = httpx.Limits(max_connections=args.clients)
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None, limits=limits) as client:
+                await wait_ready(client)
+                await drive(client, image, args.clients, 1.0)  # warm every worker's imports
+                latencies, errors = await drive(client, image, args.clients, args.duration)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+    return {
+        "workers": workers,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / args.duration,
+        "p50_ms": statistics.median(latencies) if latencies else None,
+    }
+
+
+async def main(args):
+    # A large upload with enough detail to make decoding cost something
+    image = synthetic_upload(0, args.image_size, grain=args.image_size // 16, quality=95)
+    print(f"Upload: {args.image_size}x{args.image_size} JPEG ({len(image) / 1e6:.1f} MB), "
+          f"stub model {args.model_ms:.0f} ms, {args.clients} clients, {os.cpu_count()} CPUs")
+
+    results = []
+    for workers in args.workers:
+        results.append(await measure(workers, image, args))
+        result = results[-1]
+        print(f"  {workers} worker(s): {result['rps']:6.1f} req/s  p50 {result['p50_ms']:7.1f} ms  "
+              f"errors {result['errors']}  speedup {result['rps'] / results[0]['rps']:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="worker counts to compare")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent uploads")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds measured per worker count")
+    parser.add_argument("--model-ms", type=float, default=200.0, help="stubbed vision model latency")
+    parser.add_argument("--image-size", type=int, default=3000, help="side of the uploaded JPEG in pixels")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,9 @@
+"""
+City Catalogue for PostDisaster System
+The supported cities, kept free of heavy imports so light endpoints can use them
+"""
+
+from city_registry import get_city_registry
+
+# City id -> name: the five built-in cities, or the catalogue in CITY_DATA_DIR
+city_map = get_city_registry().city_map
@@ -0,0 +1,252 @@
+"""
+Structured City Data for PostDisaster System
+Typed per-city records parsed once from the city document shards, with deterministic dispatch/resource figures
+"""
+
+import json
+import os
+import pathlib
+import re
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import List
+
+from city_registry import get_city_registry, normalize_name
+from embedding_index import CITIES_DOCX, INDEX_DIR
+
+# Bump when parsing or the cache layout changes so old cache files are ignored
+CITY_DATA_FORMAT_VERSION = 2
+
+# Response formulas shared by the agent tools, the figures and the bulk planner
+FOOD_PER_PERSON = {"apples": 3, "bananas": 2, "oranges": 1}
+HURT_PER_UNIT = {"helicopters": 100, "police": 50, "special_forces": 200}
+
+SECTION_RE = re.compile(r"^(?P<name>.+?) City Disaster Information$")
+_DISASTER_RE = re.compile(r"by an? (?:major )?(?P<disaster>[a-z]+) disaster", re.IGNORECASE)
+_POPULATION_RE = re.compile(r"total population of (?P<count>[\d,]+)")
+_HURT_RE = re.compile(r"(?P<count>[\d,]+) people have been injured")
+_TRAPPED_RE = re.compile(r"^(?P<place>.+?) in (?P<city>[^:]+): (?P<count>[\d,]+) people")
+_DAMAGE_RE = re.compile(r"^(?P<place>.+?) in (?P<city>[^:]+): (?P<damage>.+?)\.?$")
+_NEEDS_RE = re.compile(r"needs the following resources: (?P<needs>.+?)(?: for [a-z ]+ victims)?\.?$")
+
+
+@dataclass
+class TrappedSite:
+    place: str
+    people: int
+
+
+@dataclass
+class DamagedSite:
+    place: str
+    damage: str
+
+
+@dataclass
+class CityRecord:
+    """Facts about one city, as stated in the disaster document"""
+
+    name: str
+    disaster: str = ""
+    population: int = 0
+    hurt: int = 0
+    trapped: List[TrappedSite] = field(default_factory=list)
+    damaged_infrastructure: List[DamagedSite] = field(default_factory=list)
+    needs: List[str] = field(default_factory=list)
+
+    @property
+    def stuck(self):
+        return sum(site.people for site in self.trapped)
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        data["trapped"] = [TrappedSite(**site) for site in data["trapped"]]
+        data["damaged_infrastructure"] = [DamagedSite(**site) for site in data["damaged_infrastructure"]]
+        return cls(**data)
+
+
+def dispatch_figures(hurt):
+    """Helicopters, police and special forces dispatched for `hurt` injured people"""
+    return {unit: hurt // per_unit for unit, per_unit in HURT_PER_UNIT.items()}
+
+
+def resource_figures(population):
+    """Food needed for `population` people"""
+    return {food: population * amount for food, amount in FOOD_PER_PERSON.items()}
+
+
+def _count(match):
+    return int(match.group("count").replace(",", ""))
+
+
+def _split_list(text):
+    return [item.strip() for item in re.split(r",\s*(?:and\s+)?|\s+and\s+", text) if item.strip()]
+
+
+def parse_city_records(paragraphs):
+    """
+    Parse the document's per-city sections into CityRecords
+
+    Each section starts with "<Name> City Disaster Information" and is
+    followed by a summary paragraph (disaster, population, injured), the
+    trapped-residents list, the infrastructure damage list and the resource
+    requirements. Paragraphs outside a city section are ignored.
+
+    Args:
+        paragraphs (list): Paragraph texts in document order
+
+    Returns:
+        list: CityRecord per city, in document order
+    """
+    records = []
+    record = None
+    section = None
+
+    for text in paragraphs:
+        header = SECTION_RE.match(text)
+        if header:
+            record = CityRecord(name=f"{header.group('name')} City")
+            records.append(record)
+            section = "summary"
+            continue
+        if record is None:
+            continue
+
+        short_name = record.name[: -len(" City")]
+        if text.endswith("Trapped Residents Locations"):
+            section = "trapped"
+        elif text.endswith("Infrastructure Damage Assessment"):
+            section = "damage"
+        elif _NEEDS_RE.search(text):
+            record.needs = _split_list(_NEEDS_RE.search(text).group("needs"))
+            section = None
+        elif section == "summary":
+            disaster = _DISASTER_RE.search(text)
+            population = _POPULATION_RE.search(text)
+            hurt = _HURT_RE.search(text)
+            record.disaster = disaster.group("disaster").lower() if disaster else record.disaster
+            record.population = _count(population) if population else record.population
+            record.hurt = _count(hurt) if hurt else record.hurt
+        elif section == "trapped" and _TRAPPED_RE.match(text):
+            match = _TRAPPED_RE.match(text)
+            record.trapped.append(TrappedSite(match.group("place"), _count(match)))
+        elif section == "damage" and _DAMAGE_RE.match(text):
+            match = _DAMAGE_RE.match(text)
+            record.damaged_infrastructure.append(DamagedSite(match.group("place"), match.group("damage")))
+        elif not text.startswith(short_name):
+            # A heading that belongs to no city (e.g. the closing guidelines)
+            record = None
+            section = None
+
+    return records
+
+
+class CityDataset:
+    """Per-city records indexed by city name"""
+
+    def __init__(self, key, records, source=None):
+        self.key = key
+        self.records = records
+        self.source = source
+        self._by_name = {normalize_name(record.name): record for record in records}
+
+    @classmethod
+    def load_or_build(cls, registry=None, cache_dir=INDEX_DIR):
+        """
+        Load the parsed records of the registry's city shards, parsing them
+        only if no cache file exists for their current contents
+
+        Args:
+            registry (CityRegistry): Cities and their shards (defaults to get_city_registry())
+            cache_dir: Directory holding cache files (shared with the embedding index)
+
+        Returns:
+            CityDataset: Parsed records
+        """
+        registry = registry or get_city_registry()
+        cache_dir = pathlib.Path(cache_dir)
+        key = f"cities-v{CITY_DATA_FORMAT_VERSION}-{registry.content_key()[:16]}"
+        cache_path = cache_dir / f"{key}.json"
+
+        if not cache_path.exists():
+            print(f"Parsing city records for {len(registry.city_map)} cities...")
+            records = parse_city_records(
+                [text for city_id in registry.city_map for text in registry.shard_paragraphs(city_id)]
+            )
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_dir / f"{key}.{os.getpid()}.tmp.json"
+            tmp_path.write_text(json.dumps([asdict(record) for record in records], separators=(",", ":")), encoding="utf-8")
+            os.replace(tmp_path, cache_path)
+
+        records = [CityRecord.from_dict(data) for data in json.loads(cache_path.read_text(encoding="utf-8"))]
+        return cls(key, records, source=str(registry.data_dir or CITIES_DOCX))
+
+    def get(self, city_name):
+        """Record for a city name (e.g. "Baytown City" or "baytown"), or None"""
+        return self._by_name.get(normalize_name(city_name))
+
+    def figures(self, city_name):
+        """
+        Deterministic dispatch and resource figures for a city, without the LLM
+
+        Returns:
+            dict: Population, hurt and stuck counts plus the same numbers the
+            `helping` and `resourcing` tools produce, or None for an unknown city
+        """
+        record = self.get(city_name)
+        if record is None:
+            return None
+        return {
+            "city_name": record.name,
+            "disaster": record.disaster,
+            "population": record.population,
+            "hurt": record.hurt,
+            "stuck": record.stuck,
+            "dispatch": dispatch_figures(record.hurt),
+            "resources": resource_figures(record.population),
+        }
+
+    def brief(self, city_name):
+        """
+        JSON summary of a city's facts and computed figures, used as the
+        analysts' context in place of the data collector agent's output
+
+        Returns:
+            str: Compact JSON, or None if the document has no record for the city
+        """
+        record = self.get(city_name)
+        if record is None:
+            return None
+        facts = asdict(record)
+        facts["stuck"] = record.stuck
+        facts["dispatch"] = dispatch_figures(record.hurt)
+        facts["resources_needed"] = resource_figures(record.population)
+        return json.dumps(facts, separators=(",", ":"))
+
+
+_datasets = {}
+_datasets_lock = threading.Lock()
+
+
+def get_city_dataset():
+    """
+    Process-wide dataset for the city registry, reloaded only when its source changes
+
+    The modification time and size of the catalogue (cities.json, or
+    Cities.docx for the built-in cities) are checked on every call; the
+    shards are only re-parsed when they differ.
+    """
+    registry = get_city_registry()
+    path = pathlib.Path(registry.data_dir) / "cities.json" if registry.data_dir else CITIES_DOCX
+    stat = path.stat()
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    with _datasets_lock:
+        cached = _datasets.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        dataset = CityDataset.load_or_build(registry)
+        _datasets[path] = (signature, dataset)
+        return dataset
@@ -0,0 +1,259 @@
+"""
+City Registry for PostDisaster System
+Catalogue of supported cities with indexed name lookup and per-city document shards
+"""
+
+import hashlib
+import json
+import os
+import pathlib
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Directory with cities.json and per-city document shards; empty for the built-in cities and Cities.docx
+CITY_DATA_DIR = os.getenv("CITY_DATA_DIR", "")
+
+# Minimum trigram similarity (Dice coefficient, 0-1) for a fuzzy name match
+CITY_FUZZY_MIN_SIMILARITY = float(os.getenv("CITY_FUZZY_MIN_SIMILARITY", "0.5"))
+
+# City mapping - same as in PostDisaster_System.ipynb
+BUILTIN_CITIES = {
+    1: "Seabrook City",
+    2: "Highland Park City",
+    3: "Baytown City",
+    4: "Ridgeview City",
+    5: "Shoreline City"
+}
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize_name(text):
+    """
+    Lookup key for a city name: accents folded, lower case, punctuation
+    dropped and the word "city" removed ("Baytown City" -> "baytown")
+    """
+    folded = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    words = _WORD_RE.findall(folded.lower())
+    return " ".join(word for word in words if word != "city") or " ".join(words)
+
+
+def trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CityNameIndex:
+    """
+    Name -> city id lookup that stays fast with thousands of cities
+
+    Tried in order: the exact name, its normalized key, the longest run of
+    words in the text that is a normalized key (for answers like "This is
+    Baytown City."), and finally the closest key by character trigrams
+    (for misspellings), accepted above CITY_FUZZY_MIN_SIMILARITY.
+    """
+
+    def __init__(self, names, min_similarity=CITY_FUZZY_MIN_SIMILARITY):
+        """
+        Args:
+            names (dict): City id -> list of names (the first one is the display name)
+            min_similarity (float): Fuzzy match threshold
+        """
+        self.min_similarity = min_similarity
+        self._exact = {}
+        self._normalized = {}
+        self._trigrams = {}
+        self._postings = {}
+        for city_id, city_names in names.items():
+            for name in city_names:
+                self._exact.setdefault(name, city_id)
+                key = normalize_name(name)
+                if key and key not in self._normalized:
+                    self._normalized[key] = city_id
+                    grams = trigrams(key)
+                    self._trigrams[key] = len(grams)
+                    for gram in grams:
+                        self._postings.setdefault(gram, []).append(key)
+        self._max_words = max((len(key.split()) for key in self._normalized), default=0)
+
+    def match(self, text):
+        """
+        Resolve a name or a short answer mentioning one
+
+        Returns:
+            tuple: (city id, "exact" | "normalized" | "contained" | "fuzzy"), or (None, None)
+        """
+        text = text.strip()
+        if text in self._exact:
+            return self._exact[text], "exact"
+
+        key = normalize_name(text)
+        if key in self._normalized:
+            return self._normalized[key], "normalized"
+
+        words = key.split()
+        for length in range(min(self._max_words, len(words)), 0, -1):
+            for start in range(len(words) - length + 1):
+                city_id = self._normalized.get(" ".join(words[start:start + length]))
+                if city_id is not None:
+                    return city_id, "contained"
+
+        city_id = self._fuzzy(key)
+        if city_id is not None:
+            return city_id, "fuzzy"
+        return None, None
+
+    def _fuzzy(self, key):
+        grams = trigrams(key)
+        shared = Counter(candidate for gram in grams for candidate in self._postings.get(gram, ()))
+        best_key, best_score = None, 0.0
+        for candidate, count in shared.items():
+            score = 2 * count / (len(grams) + self._trigrams[candidate])
+            if score > best_score:
+                best_key, best_score = candidate, score
+        if best_key is None or best_score < self.min_similarity:
+            return None
+        return self._normalized[best_key]
+
+
+class CityRegistry:
+    """
+    The supported cities and where each one's documents live
+
+    Built in: the five cities of Cities.docx, whose per-city sections are
+    the shards. With CITY_DATA_DIR: `cities.json` in that directory lists
+    the cities as objects with "name" and optional "id", "aliases" and
+    "shard" (default `shards/<id>.txt`, one paragraph per line, or a
+    .docx). Ids default to 1..N in file order.
+    """
+
+    def __init__(self, cities, aliases=None, shards=None, data_dir=None):
+        """
+        Args:
+            cities (dict): City id -> display name
+            aliases (dict): City id -> other names the city is known by
+            shards (dict): City id -> shard file path (None: sections of Cities.docx)
+            data_dir: Directory the catalogue was loaded from, if any
+        """
+        self.city_map = cities
+        self.aliases = aliases or {}
+        self.shards = shards
+        self.data_dir = data_dir
+        self.names = CityNameIndex({
+            city_id: [name, *self.aliases.get(city_id, [])] for city_id, name in cities.items()
+        })
+        self._docx_sections = None
+        self._docx_key = None
+
+    @classmethod
+    def builtin(cls):
+        return cls(dict(BUILTIN_CITIES))
+
+    @classmethod
+    def load(cls, data_dir):
+        """
+        Load the catalogue in `data_dir`
+
+        Raises:
+            ValueError: For duplicate ids or names
+        """
+        data_dir = pathlib.Path(data_dir)
+        entries = json.loads((data_dir / "cities.json").read_text(encoding="utf-8"))
+        cities, aliases, shards = {}, {}, {}
+        seen_names = set()
+        for position, entry in enumerate(entries, start=1):
+            city_id = int(entry.get("id", position))
+            name = entry["name"]
+            if city_id in cities:
+                raise ValueError(f"Duplicate city id {city_id} in {data_dir / 'cities.json'}")
+            if name in seen_names:
+                raise ValueError(f"Duplicate city name '{name}' in {data_dir / 'cities.json'}")
+            seen_names.add(name)
+            cities[city_id] = name
+            if entry.get("aliases"):
+                aliases[city_id] = list(entry["aliases"])
+            shards[city_id] = data_dir / entry.get("shard", f"shards/{city_id}.txt")
+        return cls(cities, aliases, shards, data_dir=data_dir)
+
+    def lookup(self, text):
+        """City id for a name (or a short answer naming a city), or None"""
+        return self.names.match(text)[0]
+
+    def content_key(self):
+        """
+        Hash identifying the catalogue and shard contents, for cache keys
+
+        For a data directory this covers the catalogue and each shard's size
+        and modification time, so a changed shard invalidates derived caches
+        without reading every file. Cities.docx is hashed again only when its
+        size or modification time changes.
+        """
+        from embedding_index import CITIES_DOCX, file_sha256
+
+        if self.shards is None:
+            stat = pathlib.Path(CITIES_DOCX).stat()
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if self._docx_key is None or self._docx_key[0] != signature:
+                self._docx_key = (signature, file_sha256(CITIES_DOCX)[:32])
+            return self._docx_key[1]
+        digest = hashlib.sha256()
+        digest.update(json.dumps([self.city_map, self.aliases], sort_keys=True).encode("utf-8"))
+        for city_id in sorted(self.shards):
+            path = self.shards[city_id]
+            signature = f"{path.stat().st_size}:{path.stat().st_mtime_ns}" if path.exists() else "missing"
+            digest.update(f"{city_id}:{signature}\n".encode("utf-8"))
+        return digest.hexdigest()[:32]
+
+    def shard_paragraphs(self, city_id):
+        """Paragraphs of one city's documents (empty if it has none)"""
+        from embedding_index import read_docx_paragraphs
+
+        if self.shards is None:
+            return self._builtin_sections().get(city_id, [])
+        path = self.shards[city_id]
+        if not path.exists():
+            return []
+        if path.suffix == ".docx":
+            return read_docx_paragraphs(path)
+        return [line.strip() for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+    def _builtin_sections(self):
+        # Cities.docx split at each "<Name> City Disaster Information" heading
+        if self._docx_sections is None:
+            from city_data import SECTION_RE
+            from embedding_index import CITIES_DOCX, read_docx_paragraphs
+
+            sections = {}
+            current = None
+            for text in read_docx_paragraphs(CITIES_DOCX):
+                header = SECTION_RE.match(text)
+                if header:
+                    short_name = header.group("name")
+                    current = sections.setdefault(self.lookup(f"{short_name} City"), [])
+                elif current is not None and short_name not in text:
+                    # Every paragraph of a city section names the city; this one ends it
+                    current = None
+                if current is not None:
+                    current.append(text)
+            sections.pop(None, None)
+            self._docx_sections = sections
+        return self._docx_sections
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_city_registry():
+    """Process-wide registry: CITY_DATA_DIR if set, otherwise the built-in cities"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = CityRegistry.load(CITY_DATA_DIR) if CITY_DATA_DIR else CityRegistry.builtin()
+        return _registry
@@ -0,0 +1,298 @@
+"""
+Embedding Index for PostDisaster System
+Persistent, content-hashed vector index over each city's disaster documents
+"""
+
+import hashlib
+import json
+from abc import ABC, abstractmethod
+import os
+import pathlib
+import re
+import threading
+import zipfile
+from xml.etree import ElementTree
+
+import numpy as np
+from dotenv import load_dotenv
+
+from city_registry import get_city_registry
+
+load_dotenv()
+
+# Default document and on-disk cache location
+CITIES_DOCX = pathlib.Path(__file__).parent / "Cities.docx"
+INDEX_DIR = pathlib.Path(os.getenv("EMBEDDING_INDEX_DIR", pathlib.Path(__file__).parent / ".index_cache"))
+
+# Bump when chunking or the on-disk layout changes so old indexes are ignored
+INDEX_FORMAT_VERSION = 2
+
+_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+class Embedder(ABC):
+    """
+    Interface for embedding backends used by the index
+
+    Subclasses must set `name`, return their settings from `config()` (these
+    are part of the index key) and implement `embed_documents`/`embed_query`;
+    one that does not cannot be instantiated.
+    """
+
+    name = "base"
+
+    def config(self):
+        return {}
+
+    @abstractmethod
+    def embed_documents(self, texts):
+        """Unit-length float32 vectors, one row per text"""
+
+    @abstractmethod
+    def embed_query(self, text):
+        """Unit-length float32 vector for a search query"""
+
+
+class GoogleEmbedder(Embedder):
+    """Google Generative AI embeddings (same model the DOCXSearchTool used)"""
+
+    name = "google"
+
+    def __init__(self, model="models/text-embedding-004", api_key=None):
+        self.model = model
+        self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
+
+    def config(self):
+        return {"model": self.model}
+
+    def _embed(self, content, task_type):
+        import google.generativeai as genai
+
+        genai.configure(api_key=self.api_key)
+        result = genai.embed_content(model=self.model, content=content, task_type=task_type)
+        return np.asarray(result["embedding"], dtype=np.float32)
+
+    def embed_documents(self, texts):
+        return _normalize(self._embed(list(texts), "retrieval_document"))
+
+    def embed_query(self, text):
+        return _normalize(self._embed(text, "retrieval_query"))
+
+
+class HashingEmbedder(Embedder):
+    """
+    Deterministic local embedder based on feature hashing
+
+    Needs no network access or model download, so indexes built with it are
+    reproducible and usable for offline testing and benchmarking.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dimensions=256):
+        self.dimensions = dimensions
+
+    def config(self):
+        return {"dimensions": self.dimensions}
+
+    def _vector(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        tokens = _TOKEN_RE.findall(text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dimensions
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vector[bucket] += sign
+        return vector
+
+    def embed_documents(self, texts):
+        return _normalize(np.stack([self._vector(text) for text in texts]))
+
+    def embed_query(self, text):
+        return _normalize(self._vector(text))
+
+
+def _normalize(vectors):
+    """L2-normalize a vector or a matrix of row vectors"""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+def get_embedder():
+    """
+    Select the embedder from the EMBEDDER_PROVIDER environment variable
+
+    Falls back to the local hashing embedder when no Google API key is set.
+    """
+    provider = os.getenv("EMBEDDER_PROVIDER", "").lower()
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not provider:
+        provider = "google" if api_key and api_key != "your_google_api_key_here" else "hashing"
+
+    if provider == "google":
+        return GoogleEmbedder()
+    if provider in ("hashing", "local"):
+        return HashingEmbedder()
+    raise ValueError(f"Unknown EMBEDDER_PROVIDER '{provider}'")
+
+
+def read_docx_paragraphs(path):
+    """Extract the non-empty paragraphs of a DOCX file in document order"""
+    with zipfile.ZipFile(path) as archive:
+        root = ElementTree.fromstring(archive.read("word/document.xml"))
+
+    paragraphs = []
+    for paragraph in root.iter(f"{_WORD_NS}p"):
+        text = "".join(node.text or "" for node in paragraph.iter(f"{_WORD_NS}t")).strip()
+        if text:
+            paragraphs.append(text)
+    return paragraphs
+
+
+def chunk_paragraphs(paragraphs, max_chars=800):
+    """Greedily pack whole paragraphs into chunks of at most max_chars"""
+    chunks = []
+    current = []
+    size = 0
+    for paragraph in paragraphs:
+        if current and size + len(paragraph) > max_chars:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+        current.append(paragraph)
+        size += len(paragraph) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def file_sha256(path):
+    """Hash of the file contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def index_key(document_hash, embedder, max_chars):
+    """Cache key covering the document contents, the embedder and chunking"""
+    payload = {
+        "version": INDEX_FORMAT_VERSION,
+        "document": document_hash,
+        "embedder": embedder.name,
+        "embedder_config": embedder.config(),
+        "max_chars": max_chars,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+
+
+class ShardedEmbeddingIndex:
+    """
+    Chunked documents of every city with one normalized embedding row per chunk
+
+    All cities share one memory-mapped matrix in which each city's chunks
+    are a contiguous block of rows, so a search scores only the selected
+    city's shard instead of the whole corpus.
+    """
+
+    def __init__(self, key, chunks, vectors, offsets, embedder, source=None):
+        self.key = key
+        self.chunks = chunks
+        self.vectors = vectors
+        self.offsets = offsets
+        self.embedder = embedder
+        self.source = source
+
+    @classmethod
+    def load_or_build(cls, registry=None, embedder=None, index_dir=INDEX_DIR, max_chars=800, batch_size=256):
+        """
+        Load the index for the registry's shards from disk, building it only
+        if no index exists for the current shard contents and embedder config
+
+        Args:
+            registry (CityRegistry): Cities and their shards (defaults to get_city_registry())
+            embedder (Embedder): Embedding backend (defaults to get_embedder())
+            index_dir: Directory holding persisted indexes
+            max_chars (int): Maximum chunk size in characters
+            batch_size (int): Chunks per embedding call while building
+
+        Returns:
+            ShardedEmbeddingIndex: Index with memory-mapped vectors
+        """
+        registry = registry or get_city_registry()
+        embedder = embedder or get_embedder()
+        index_dir = pathlib.Path(index_dir)
+        source = str(registry.data_dir or CITIES_DOCX)
+        key = index_key(registry.content_key(), embedder, max_chars)
+        vectors_path = index_dir / f"{key}.npy"
+        meta_path = index_dir / f"{key}.json"
+
+        if not (vectors_path.exists() and meta_path.exists()):
+            print(f"Building embedding index for {len(registry.city_map)} city shards ({embedder.name})...")
+            chunks = []
+            offsets = {}
+            for city_id in registry.city_map:
+                start = len(chunks)
+                chunks += chunk_paragraphs(registry.shard_paragraphs(city_id), max_chars)
+                offsets[city_id] = (start, len(chunks))
+            batches = [embedder.embed_documents(chunks[i:i + batch_size]) for i in range(0, len(chunks), batch_size)]
+            vectors = np.concatenate(batches) if batches else np.zeros((0, 0), dtype=np.float32)
+
+            index_dir.mkdir(parents=True, exist_ok=True)
+            # Write to temporary names first so a crash never leaves a partial index
+            tmp_vectors = index_dir / f"{key}.{os.getpid()}.tmp.npy"
+            tmp_meta = index_dir / f"{key}.{os.getpid()}.tmp.json"
+            np.save(tmp_vectors, vectors)
+            tmp_meta.write_text(json.dumps({"source": source, "chunks": chunks, "offsets": offsets}), encoding="utf-8")
+            os.replace(tmp_vectors, vectors_path)
+            os.replace(tmp_meta, meta_path)
+
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        vectors = np.load(vectors_path, mmap_mode="r")
+        offsets = {int(city_id): tuple(bounds) for city_id, bounds in meta["offsets"].items()}
+        return cls(key, meta["chunks"], vectors, offsets, embedder, source=source)
+
+    def search(self, city_id, query, top_k=4):
+        """
+        Return the chunks of one city's shard most similar to the query
+
+        Returns:
+            list: (score, chunk) tuples, best match first (empty for a city without documents)
+        """
+        start, end = self.offsets.get(city_id, (0, 0))
+        if start == end:
+            return []
+        scores = self.vectors[start:end] @ self.embedder.embed_query(query)
+        best = np.argsort(-scores)[:top_k]
+        return [(float(scores[i]), self.chunks[start + i]) for i in best]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_shard_index(embedder=None):
+    """
+    Process-wide shard index for the city registry, reloaded only when its source changes
+
+    The modification time and size of the catalogue (cities.json, or
+    Cities.docx for the built-in cities) are checked on every call; the
+    shard contents are only hashed again (and the index rebuilt) when they
+    differ. Edits to individual shard files are picked up on restart.
+    """
+    registry = get_city_registry()
+    path = pathlib.Path(registry.data_dir) / "cities.json" if registry.data_dir else CITIES_DOCX
+    stat = path.stat()
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    with _indexes_lock:
+        cached = _indexes.get(path)
+        if cached and cached[0] == signature and (embedder is None or cached[1].embedder is embedder):
+            return cached[1]
+
+        index = ShardedEmbeddingIndex.load_or_build(registry, embedder=embedder or (cached[1].embedder if cached else None))
+        _indexes[path] = (signature, index)
+        return index
@@ -0,0 +1,159 @@
+"""
+Async Execution Layer for PostDisaster System
+Runs the blocking pipeline calls off the event loop with per-endpoint admission control
+"""
+
+import asyncio
+import contextvars
+import functools
+import importlib
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+# Default concurrency limit per endpoint (override with MAX_CONCURRENT_<NAME>)
+DEFAULT_LIMITS = {
+    "analyze_image": 8,
+    "analyze_batch": 8,
+    "analyze_city": 4,
+    "complete_analysis": 4,
+    "sweep": 1,  # each sweep runs its own pool of city analyses
+}
+
+# Requests allowed to wait for a slot, as a multiple of the limit (override with MAX_WAITING_<NAME>)
+DEFAULT_WAITING_FACTOR = 2
+
+# Seconds suggested to clients that are turned away
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", "5"))
+
+# Threads shared by all endpoints for blocking work
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("EXECUTOR_WORKERS", "16")),
+    thread_name_prefix="endpoint",
+)
+
+
+class EndpointLimiter:
+    """
+    Bounds how many calls of one endpoint run at once
+
+    Up to `max_concurrent` calls run on the shared executor; up to
+    `max_waiting` more wait for a slot. Anything beyond that is rejected
+    immediately with 503 and a Retry-After header instead of piling up.
+    """
+
+    def __init__(self, name, max_concurrent, max_waiting):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.completed = 0
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    async def run(self, fn, *args, **kwargs):
+        """Run a blocking function on the executor once a slot is free"""
+        if self.active >= self.max_concurrent and self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail=f"Server busy: too many concurrent {self.name} requests, retry later",
+                headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+            )
+
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        loop = asyncio.get_running_loop()
+        # Carry context variables (e.g. request-scoped state) into the worker thread
+        call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+        try:
+            future = _executor.submit(call)
+        except BaseException:
+            self._release()
+            raise
+        # The slot is freed when the work itself finishes, not when the request
+        # stops waiting: a disconnected client's call keeps its thread until done
+        future.add_done_callback(lambda done: self._release_from_thread(loop))
+        return await asyncio.wrap_future(future)
+
+    def _release(self):
+        self.active -= 1
+        self.completed += 1
+        self._semaphore.release()
+
+    def _release_from_thread(self, loop):
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            # The event loop is closed (shutdown); nothing is waiting on the slot any more
+            pass
+
+    def stats(self):
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_waiting": self.max_waiting,
+            "active": self.active,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+_limiters = {}
+
+
+def get_limiter(name):
+    """Limiter for an endpoint, configured from the environment on first use"""
+    if name not in _limiters:
+        limit = int(os.getenv(f"MAX_CONCURRENT_{name.upper()}", DEFAULT_LIMITS.get(name, 4)))
+        waiting = int(os.getenv(f"MAX_WAITING_{name.upper()}", limit * DEFAULT_WAITING_FACTOR))
+        _limiters[name] = EndpointLimiter(name, limit, waiting)
+    return _limiters[name]
+
+
+async def run_blocking(name, fn, *args, **kwargs):
+    """
+    Run a blocking pipeline call for an endpoint without stalling the event loop
+
+    Args:
+        name (str): Endpoint name used for the concurrency limit
+        fn: Blocking function to call
+        *args, **kwargs: Arguments for fn
+
+    Returns:
+        The return value of fn
+    """
+    return await get_limiter(name).run(fn, *args, **kwargs)
+
+
+def limiter_stats():
+    """Current admission-control counters for every endpoint"""
+    return {name: limiter.stats() for name, limiter in _limiters.items()}
+
+
+async def import_off_loop(name):
+    """
+    Import a module on a thread the first time, so the event loop keeps serving
+
+    The agent stack takes seconds to import, and while the warm-up thread
+    holds the module's import lock an import on the loop would stall every
+    request. Already-imported modules are returned directly.
+
+    Args:
+        name (str): Module name, e.g. "postdisaster_system"
+
+    Returns:
+        module: The imported module
+    """
+    module = sys.modules.get(name)
+    if module is None or getattr(getattr(module, "__spec__", None), "_initializing", False):
+        module = await asyncio.to_thread(importlib.import_module, name)
+    return module
@@ -0,0 +1,221 @@
+"""
+Perceptual Image Hashing for PostDisaster System
+pHash/dHash index of previously classified satellite images
+"""
+
+import os
+import pathlib
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+from city_registry import get_city_registry
+from sqlite_store import connect
+
+# Cache settings
+IMAGE_HASH_CACHE = os.getenv("IMAGE_HASH_CACHE", "1") == "1"
+IMAGE_HASH_ALGORITHM = os.getenv("IMAGE_HASH_ALGORITHM", "phash")  # "phash" or "dhash"
+IMAGE_HASH_MAX_DISTANCE = int(os.getenv("IMAGE_HASH_MAX_DISTANCE", "6"))  # bits out of 64
+IMAGE_HASH_DB = pathlib.Path(os.getenv("IMAGE_HASH_DB", pathlib.Path(__file__).parent / "image_hashes.sqlite3"))
+IMAGE_HASH_MAX_ENTRIES = int(os.getenv("IMAGE_HASH_MAX_ENTRIES", "5000"))
+
+# Share of max_entries kept when the store overflows; evicting a batch at once keeps the rebuild rare
+IMAGE_HASH_EVICT_TO = 0.9
+
+
+def _grayscale(image, size):
+    return np.asarray(image.convert("L").resize(size, Image.LANCZOS), dtype=np.float64)
+
+
+def _bits_to_int(bits):
+    return int.from_bytes(np.packbits(bits.flatten()).tobytes(), "big")
+
+
+def dhash(image, hash_size=8):
+    """Difference hash: sign of the horizontal gradient on a (hash_size+1) x hash_size thumbnail"""
+    pixels = _grayscale(image, (hash_size + 1, hash_size))
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def _dct_matrix(n):
+    k = np.arange(n)
+    matrix = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n))
+    matrix[0] *= 1 / np.sqrt(2)
+    return matrix * np.sqrt(2 / n)
+
+
+_DCT_32 = _dct_matrix(32)
+
+
+def phash(image, hash_size=8):
+    """Perceptual hash: low-frequency 2-D DCT coefficients of a 32x32 thumbnail compared to their median"""
+    pixels = _grayscale(image, (32, 32))
+    coefficients = (_DCT_32 @ pixels @ _DCT_32.T)[:hash_size, :hash_size]
+    return _bits_to_int(coefficients > np.median(coefficients))
+
+
+HASH_FUNCTIONS = {"phash": phash, "dhash": dhash}
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+def _popcount64(values):
+    """Number of set bits in each element of a uint64 array"""
+    return np.unpackbits(values.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+def _to_signed(value):
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+class ImageHashIndex:
+    """
+    Bounded on-disk map from perceptual hash to detected city
+
+    Hashes are mirrored in memory as a uint64 array so a lookup is one
+    vectorized Hamming-distance scan; new hashes are appended to it, and it
+    is reloaded only when another process changed the table. When the store
+    exceeds `max_entries` the least recently used hashes are evicted, down
+    to IMAGE_HASH_EVICT_TO of the limit.
+
+    Rows are stored under a namespace of the algorithm and the city
+    catalogue's content key, since the stored city ids are only valid for
+    the catalogue they were detected with.
+    """
+
+    def __init__(self, path=IMAGE_HASH_DB, algorithm=IMAGE_HASH_ALGORITHM,
+                 max_distance=IMAGE_HASH_MAX_DISTANCE, max_entries=IMAGE_HASH_MAX_ENTRIES, catalogue=None):
+        """
+        Args:
+            path: SQLite database file
+            algorithm (str): "phash" or "dhash"
+            max_distance (int): Largest Hamming distance counted as the same image
+            max_entries (int): Stored hashes before the least recently used are evicted
+            catalogue (str): Content key of the city catalogue (defaults to the registry's)
+        """
+        self.hash_function = HASH_FUNCTIONS[algorithm]
+        self.algorithm = algorithm
+        self.namespace = f"{algorithm}:{catalogue or get_city_registry().content_key()}"
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = connect(path)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS image_hashes (
+                algorithm TEXT NOT NULL,  -- the namespace, "<algorithm>:<catalogue key>"
+                hash INTEGER NOT NULL,
+                city_number INTEGER NOT NULL,
+                city_name TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (algorithm, hash)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS image_hashes_lru ON image_hashes (algorithm, last_used)")
+        # Detections made with another catalogue (or before namespacing) would return stale city ids
+        self._conn.execute(
+            "DELETE FROM image_hashes WHERE (algorithm = ? OR algorithm LIKE ?) AND algorithm != ?",
+            (algorithm, f"{algorithm}:%", self.namespace),
+        )
+        self._load()
+
+    def _load(self):
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        rows = self._conn.execute(
+            "SELECT hash, city_number, city_name FROM image_hashes WHERE algorithm = ?", (self.namespace,)
+        ).fetchall()
+        self._hashes = np.array([h for h, _, _ in rows], dtype=np.int64).view(np.uint64)
+        self._size = len(rows)
+        self._cities = [(number, name) for _, number, name in rows]
+        self._positions = {h: i for i, (h, _, _) in enumerate(rows)}
+
+    def _append(self, image_hash, city_number, city_name):
+        position = self._positions.get(_to_signed(image_hash))
+        if position is not None:
+            self._cities[position] = (city_number, city_name)
+            return
+        if self._size == len(self._hashes):
+            # Grow by doubling so appends are amortized O(1)
+            grown = np.zeros(max(64, 2 * len(self._hashes)), dtype=np.uint64)
+            grown[:self._size] = self._hashes[:self._size]
+            self._hashes = grown
+        self._hashes[self._size] = image_hash
+        self._positions[_to_signed(image_hash)] = self._size
+        self._cities.append((city_number, city_name))
+        self._size += 1
+
+    def hash_image(self, image):
+        return self.hash_function(image)
+
+    def lookup(self, image_hash):
+        """
+        Find the closest stored hash within max_distance
+
+        Returns:
+            tuple: (city_number, city_name, distance), or None on a miss
+        """
+        with self._lock:
+            if self._conn.execute("PRAGMA data_version").fetchone()[0] != self._data_version:
+                # Another worker process added or evicted hashes
+                self._load()
+            if self._size:
+                distances = _popcount64(self._hashes[:self._size] ^ np.uint64(image_hash))
+                best = int(np.argmin(distances))
+                if distances[best] <= self.max_distance:
+                    self.hits += 1
+                    self._conn.execute(
+                        "UPDATE image_hashes SET last_used = ? WHERE algorithm = ? AND hash = ?",
+                        (time.time(), self.namespace, int(self._hashes.view(np.int64)[best])),
+                    )
+                    return (*self._cities[best], int(distances[best]))
+            self.misses += 1
+            return None
+
+    def add(self, image_hash, city_number, city_name):
+        """Store a model detection for an image hash"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO image_hashes (algorithm, hash, city_number, city_name, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, _to_signed(image_hash), city_number, city_name, time.time()),
+            )
+            # Our own writes leave data_version unchanged, so the array is updated in place
+            self._append(image_hash, city_number, city_name)
+            if self._size > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM image_hashes WHERE algorithm = ? AND hash NOT IN "
+                    "(SELECT hash FROM image_hashes WHERE algorithm = ? ORDER BY last_used DESC LIMIT ?)",
+                    (self.namespace, self.namespace, max(1, int(self.max_entries * IMAGE_HASH_EVICT_TO))),
+                )
+                self._load()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "algorithm": self.algorithm,
+            "namespace": self.namespace,
+            "max_distance": self.max_distance,
+            "entries": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_image_hash_index():
+    """Process-wide detection cache backed by IMAGE_HASH_DB"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = ImageHashIndex()
+        return _index
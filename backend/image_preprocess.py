@@ -0,0 +1,259 @@
+"""
+Image Preprocessing for PostDisaster System
+Downscale, crop and re-encode satellite images before they go to the vision model
+"""
+
+import io
+import os
+import threading
+import time
+
+import numpy as np
+from PIL import Image, ImageOps
+
+# Preprocessing settings
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "1024"))  # longest side in pixels, 0 keeps size
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "JPEG").upper()  # "JPEG", "WEBP" or "ORIGINAL"
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "85"))
+IMAGE_CROP_MARKER = os.getenv("IMAGE_CROP_MARKER", "0") == "1"  # crop around the red-cross marker
+IMAGE_CROP_MARGIN = float(os.getenv("IMAGE_CROP_MARGIN", "0.5"))  # context kept around the marker, as a fraction of the image
+IMAGE_UPLINK_MBPS = float(os.getenv("IMAGE_UPLINK_MBPS", "10"))  # used to estimate upload time saved
+
+_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+# Upload formats the vision model reads directly
+_ORIGINAL_MIME_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+_EXIF_ORIENTATION = 0x0112
+
+
+def load_image(source, max_dimension=IMAGE_MAX_DIMENSION):
+    """
+    Decode an image at (roughly) the size it will be used at
+
+    For JPEGs `Image.draft` makes the decoder scale by 1/2, 1/4 or 1/8
+    while decoding, so the full-resolution bitmap is never built. For other
+    formats the image is reduced by an integer factor (cheap box filter)
+    before the final high-quality resize. EXIF orientation is applied.
+
+    Args:
+        source: File path or binary file object
+        max_dimension (int): Longest side of the result, 0 to keep the size
+
+    Returns:
+        PIL.Image.Image: Decoded RGB image
+    """
+    image = Image.open(source)
+    if max_dimension:
+        image.draft("RGB", (max_dimension, max_dimension))
+    image = ImageOps.exif_transpose(image)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+
+    if max_dimension and max(image.size) > max_dimension:
+        factor = max(image.size) // (2 * max_dimension)
+        if factor > 1:
+            image = image.reduce(factor)
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    return image
+
+
+def find_marker_box(image, margin=IMAGE_CROP_MARGIN):
+    """
+    Bounding box around the red-cross marker, padded by `margin`
+
+    Returns:
+        tuple: (left, upper, right, lower) in image pixels, or None if no marker is found
+    """
+    probe = image.copy()
+    probe.thumbnail((256, 256))
+    pixels = np.asarray(probe, dtype=np.int16)
+    red = (pixels[..., 0] > 170) & (pixels[..., 0] - np.maximum(pixels[..., 1], pixels[..., 2]) > 130)
+    if red.sum() < 4:
+        return None
+
+    # Trim stray red pixels so the box follows the marker, not the whole image
+    rows, cols = np.nonzero(red)
+    row_low, row_high = np.percentile(rows, [5, 95]).astype(int)
+    col_low, col_high = np.percentile(cols, [5, 95]).astype(int)
+    keep = (rows >= row_low) & (rows <= row_high) & (cols >= col_low) & (cols <= col_high)
+    rows, cols = rows[keep], cols[keep]
+    scale_x = image.width / probe.width
+    scale_y = image.height / probe.height
+    pad_x = margin * image.width / 2
+    pad_y = margin * image.height / 2
+    return (
+        max(0, int(cols.min() * scale_x - pad_x)),
+        max(0, int(rows.min() * scale_y - pad_y)),
+        min(image.width, int((cols.max() + 1) * scale_x + pad_x)),
+        min(image.height, int((rows.max() + 1) * scale_y + pad_y)),
+    )
+
+
+class PreparedImage:
+    """Preprocessed image plus the encoded payload sent to the model"""
+
+    def __init__(self, image, data, mime_type, stats):
+        self.image = image
+        self.data = data
+        self.mime_type = mime_type
+        self.stats = stats
+
+    def payload(self):
+        """Content part for `generate_content`"""
+        if self.data is None:
+            return self.image
+        return {"mime_type": self.mime_type, "data": self.data}
+
+
+_totals = {"images": 0, "original_bytes": 0, "sent_bytes": 0, "preprocess_ms": 0.0}
+_totals_lock = threading.Lock()
+
+
+def upload_size(source, original_bytes=None):
+    """Size of the upload in bytes: `original_bytes`, or the file size for a path"""
+    if original_bytes is None and isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    return original_bytes
+
+
+def decode_image(source, max_dimension=IMAGE_MAX_DIMENSION, crop_marker=IMAGE_CROP_MARKER):
+    """
+    Decode an upload at the size it is used at, cropped around the marker when enabled
+
+    The perceptual hash is computed from this image; the payload is encoded
+    afterwards (encode_image), only for images the hash cache cannot answer.
+
+    Args:
+        source: File path or binary file object
+        max_dimension (int): Longest side after resizing, 0 to keep the size
+        crop_marker (bool): Crop around the red-cross marker when one is found
+
+    Returns:
+        PIL.Image.Image: Decoded RGB image
+    """
+    image = load_image(source, max_dimension)
+    if crop_marker:
+        box = find_marker_box(image)
+        if box:
+            image = image.crop(box)
+    return image
+
+
+def _read_source(source):
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as handle:
+            return handle.read()
+    source.seek(0)
+    return source.read()
+
+
+def original_payload(source, image):
+    """
+    The upload's own bytes and MIME type, when the model can be sent them unchanged
+
+    That is when the upload is in a format the model reads and decoding did
+    not resize, crop or rotate it.
+
+    Args:
+        source: File path or binary file object the image was decoded from
+        image (PIL.Image.Image): Image from decode_image
+
+    Returns:
+        tuple: (bytes, MIME type), or None
+    """
+    if not isinstance(source, (str, os.PathLike)):
+        source.seek(0)
+    with Image.open(source) as original:
+        image_format, size = original.format, original.size
+        orientation = original.getexif().get(_EXIF_ORIENTATION, 1)
+    if image_format not in _ORIGINAL_MIME_TYPES or size != image.size or orientation != 1:
+        return None
+    return _read_source(source), _ORIGINAL_MIME_TYPES[image_format]
+
+
+def encode_image(image, original_bytes=None, decode_ms=0.0, image_format=IMAGE_FORMAT, quality=IMAGE_QUALITY,
+                 source=None):
+    """
+    Encode a decoded image into the payload sent to the vision model
+
+    When the encoded payload would be larger than the upload and the upload
+    can be sent as it is (see original_payload), the upload is sent instead.
+
+    Args:
+        image (PIL.Image.Image): Image from decode_image
+        original_bytes (int): Upload size, for the bytes and time saved
+        decode_ms (float): Time decode_image took, counted in preprocess_ms
+        image_format (str): "JPEG", "WEBP" or "ORIGINAL" (send the decoded image as-is)
+        quality (int): Encoder quality
+        source: File path or binary file object of the upload, to fall back to
+
+    Returns:
+        PreparedImage: Image, payload and stats (bytes and time saved)
+    """
+    start = time.perf_counter()
+    data = None
+    mime_type = None
+    kept_original = False
+    if image_format in _MIME_TYPES:
+        buffer = io.BytesIO()
+        image.save(buffer, image_format, quality=quality)
+        data = buffer.getvalue()
+        mime_type = _MIME_TYPES[image_format]
+        if source is not None and original_bytes and original_bytes <= len(data):
+            original = original_payload(source, image)
+            if original is not None:
+                (data, mime_type), kept_original = original, True
+
+    preprocess_ms = decode_ms + (time.perf_counter() - start) * 1000
+    sent_bytes = len(data) if data is not None else None
+    stats = {
+        "width": image.width,
+        "height": image.height,
+        "original_bytes": original_bytes,
+        "sent_bytes": sent_bytes,
+        "preprocess_ms": round(preprocess_ms, 2),
+        "kept_original": kept_original,
+    }
+    if original_bytes and sent_bytes is not None:
+        bytes_saved = original_bytes - sent_bytes
+        stats["bytes_saved"] = bytes_saved
+        # Upload time saved at the configured uplink, net of the preprocessing cost
+        stats["time_saved_ms"] = round(bytes_saved * 8 / (IMAGE_UPLINK_MBPS * 1e6) * 1000 - preprocess_ms, 2)
+
+        with _totals_lock:
+            _totals["images"] += 1
+            _totals["original_bytes"] += original_bytes
+            _totals["sent_bytes"] += sent_bytes
+            _totals["preprocess_ms"] += preprocess_ms
+
+    return PreparedImage(image, data, mime_type, stats)
+
+
+def preprocess_image(source, original_bytes=None, max_dimension=IMAGE_MAX_DIMENSION,
+                     image_format=IMAGE_FORMAT, quality=IMAGE_QUALITY, crop_marker=IMAGE_CROP_MARKER):
+    """
+    Prepare an uploaded image for the vision model (decode_image, then encode_image)
+
+    Args:
+        source: File path or binary file object
+        original_bytes (int): Upload size, read from the file when not given
+        max_dimension (int): Longest side after resizing, 0 to keep the size
+        image_format (str): "JPEG", "WEBP" or "ORIGINAL" (send the decoded image as-is)
+        quality (int): Encoder quality
+        crop_marker (bool): Crop around the red-cross marker when one is found
+
+    Returns:
+        PreparedImage: Image, payload and stats (bytes and time saved)
+    """
+    start = time.perf_counter()
+    original_bytes = upload_size(source, original_bytes)
+    image = decode_image(source, max_dimension, crop_marker)
+    return encode_image(image, original_bytes, (time.perf_counter() - start) * 1000, image_format, quality, source)
+
+
+def preprocess_totals():
+    """Cumulative preprocessing counters for this process"""
+    with _totals_lock:
+        totals = dict(_totals)
+    totals["bytes_saved"] = totals["original_bytes"] - totals["sent_bytes"]
+    totals["preprocess_ms"] = round(totals["preprocess_ms"], 2)
+    return totals
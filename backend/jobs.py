@@ -0,0 +1,307 @@
+"""
+Job Queue for PostDisaster System
+Durable background jobs for long-running complete analyses
+"""
+
+import io
+import json
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+import uuid
+
+from sqlite_store import connect
+
+# Job settings
+JOBS_DB = pathlib.Path(os.getenv("JOBS_DB", pathlib.Path(__file__).parent / "jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "50"))
+# Requeue jobs left "running" when the workers start. Multi-worker serving
+# does this once before the workers start (each worker would otherwise
+# requeue jobs its siblings are running)
+JOB_REQUEUE_ON_START = os.getenv("JOB_REQUEUE_ON_START", "1") == "1"
+# Seconds a claimed job stays leased to its worker; the worker renews the lease
+# while the job runs, and a job whose lease ran out (its worker crashed) is claimed again
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+
+# Used for the Retry-After hint until real job durations have been observed
+DEFAULT_JOB_SECONDS = 30.0
+
+
+class QueueFullError(Exception):
+    """Raised when the queue is at capacity; carries a retry hint in seconds"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Job queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class JobStore:
+    """SQLite-backed job table (survives restarts, shared by worker processes)"""
+
+    def __init__(self, path=JOBS_DB):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._conn = connect(self.path)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                filename TEXT,
+                image BLOB,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                lease_until REAL,
+                status_code INTEGER
+            )
+        """)
+        # Job tables created before leases and stored status codes
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("lease_until", "REAL"), ("status_code", "INTEGER")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    def submit(self, filename, image_bytes, max_queued=None):
+        """
+        Insert a queued job and return its id
+
+        The capacity check and the insert are one transaction, so concurrent
+        submissions (from any worker process) cannot overshoot `max_queued`.
+
+        Returns:
+            str: Job id, or None when `max_queued` jobs are already queued
+        """
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                inserted = self._conn.execute(
+                    "INSERT INTO jobs (id, status, filename, image, created_at) SELECT ?, 'queued', ?, ?, ? "
+                    "WHERE ? IS NULL OR (SELECT COUNT(*) FROM jobs WHERE status = 'queued') < ?",
+                    (job_id, filename, image_bytes, time.time(), max_queued, max_queued),
+                ).rowcount
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return job_id if inserted else None
+
+    def claim_next(self, lease_seconds=JOB_LEASE_SECONDS):
+        """
+        Atomically lease the oldest claimable job to the caller and return it (or None)
+
+        Claimable are queued jobs and running jobs whose lease has expired,
+        i.e. whose worker stopped renewing it (see renew).
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self._conn.execute(
+                    "SELECT id, filename, image FROM jobs "
+                    "WHERE status = 'queued' OR (status = 'running' AND lease_until < ?) "
+                    "ORDER BY created_at LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', started_at = ?, lease_until = ? WHERE id = ?",
+                        (now, now + lease_seconds, row["id"]),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return dict(row) if row is not None else None
+
+    def renew(self, job_ids, lease_seconds=JOB_LEASE_SECONDS):
+        """Extend the leases of running jobs"""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND status = 'running'",
+                [(time.time() + lease_seconds, job_id) for job_id in job_ids],
+            )
+
+    def complete(self, job_id, result):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'completed', result = ?, image = NULL, finished_at = ? WHERE id = ?",
+                (json.dumps(result), time.time(), job_id),
+            )
+
+    def fail(self, job_id, error, status_code=500):
+        """Record a failed job with the HTTP status its error maps to (e.g. 422 or 503)"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, status_code = ?, image = NULL, finished_at = ? "
+                "WHERE id = ?",
+                (error, status_code, time.time(), job_id),
+            )
+
+    def requeue_running(self):
+        """Put jobs interrupted by a shutdown or crash back in the queue"""
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE jobs SET status = 'queued', started_at = NULL, lease_until = NULL WHERE status = 'running'"
+            ).rowcount
+
+    def get(self, job_id):
+        """Job status (without the image), or None if unknown"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, filename, result, error, status_code, created_at, started_at, finished_at "
+                "FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def count(self, status):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+    def average_duration(self, last=20):
+        """Mean run time of the most recent completed jobs, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT AVG(finished_at - started_at) FROM (SELECT finished_at, started_at FROM jobs "
+                "WHERE status = 'completed' ORDER BY finished_at DESC LIMIT ?)",
+                (last,),
+            ).fetchone()
+        return row[0]
+
+
+class JobQueue:
+    """
+    Worker pool running complete analyses from the job store
+
+    Args:
+        store (JobStore): Durable job table
+        workers (int): Number of worker threads
+        max_queued (int): Queued jobs allowed before submissions are rejected
+        handler: Function (image_file, filename, size) -> results dict,
+            defaults to analyze_city_from_image_and_run_crew
+        lease_seconds (float): Lease on each claimed job, renewed while it runs
+    """
+
+    def __init__(self, store, workers=JOB_WORKERS, max_queued=JOB_QUEUE_MAX, handler=None,
+                 lease_seconds=JOB_LEASE_SECONDS):
+        self.store = store
+        self.workers = workers
+        self.max_queued = max_queued
+        self.handler = handler
+        self.lease_seconds = lease_seconds
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._running = set()
+        self._running_lock = threading.Lock()
+
+    def start(self):
+        """Requeue interrupted jobs and start the worker threads"""
+        if JOB_REQUEUE_ON_START:
+            requeued = self.store.requeue_running()
+            if requeued:
+                print(f"Requeued {requeued} interrupted job(s)")
+
+        self._stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        heartbeat = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        heartbeat.start()
+        self._threads.append(heartbeat)
+        self._wakeup.set()
+
+    def stop(self, timeout=5):
+        """Stop taking new jobs; running jobs are requeued on the next start if they don't finish"""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, filename, image_bytes):
+        """
+        Queue a complete analysis
+
+        Returns:
+            str: Job id
+
+        Raises:
+            QueueFullError: When max_queued jobs are already waiting
+        """
+        job_id = self.store.submit(filename, image_bytes, max_queued=self.max_queued)
+        if job_id is None:
+            raise QueueFullError(self.retry_after(self.store.count("queued")))
+        self._wakeup.set()
+        return job_id
+
+    def retry_after(self, queued):
+        """Rough seconds until a queue slot frees up"""
+        job_seconds = self.store.average_duration() or DEFAULT_JOB_SECONDS
+        return max(1, int(job_seconds * max(1, queued - self.max_queued + 1) / self.workers))
+
+    def _work(self):
+        while not self._stopping.is_set():
+            job = self.store.claim_next(self.lease_seconds)
+            if job is None:
+                self._wakeup.wait(timeout=1.0)
+                self._wakeup.clear()
+                continue
+            self._run(job)
+
+    def _heartbeat(self):
+        """Renew the leases of this queue's running jobs well before they expire"""
+        while not self._stopping.wait(self.lease_seconds / 3):
+            with self._running_lock:
+                running = list(self._running)
+            if running:
+                self.store.renew(running, self.lease_seconds)
+
+    def _run(self, job):
+        with self._running_lock:
+            self._running.add(job["id"])
+        try:
+            self._execute(job)
+        finally:
+            with self._running_lock:
+                self._running.discard(job["id"])
+
+    def _execute(self, job):
+        print(f"Job {job['id']}: running complete analysis for {job['filename']}")
+        if self.handler is None:
+            # Imported on the first job so starting the workers stays cheap
+            from postdisaster_system import analyze_city_from_image_and_run_crew
+            self.handler = analyze_city_from_image_and_run_crew
+        try:
+            results = self.handler(io.BytesIO(job["image"]), job["filename"], len(job["image"]))
+            results["filename"] = job["filename"]
+            self.store.complete(job["id"], results)
+            print(f"Job {job['id']}: completed")
+        except Exception as e:
+            # Keep the 422 (no city detected) / 503 (model unavailable) distinction for the result endpoint
+            self.store.fail(job["id"], str(e), getattr(e, "status_code", 500))
+            print(f"Job {job['id']}: failed ({e})")
+
+
+_queue = None
+
+
+def get_job_queue():
+    """Process-wide job queue backed by JOBS_DB"""
+    global _queue
+    if _queue is None:
+        _queue = JobQueue(JobStore())
+    return _queue
@@ -0,0 +1,288 @@
+"""
+LLM Providers for PostDisaster System
+One switch for the text (agent) and vision (satellite) models, including an offline stub
+"""
+
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import statistics
+import threading
+import time
+from collections import deque
+
+from dotenv import load_dotenv
+
+from cities import city_map
+
+load_dotenv()
+
+# Provider settings ("gemini" or "stub"); the vision provider follows the text one unless set
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+VISION_PROVIDER = os.getenv("VISION_PROVIDER", LLM_PROVIDER)
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini/gemini-2.0-flash")
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.5"))
+VISION_MODEL = os.getenv("VISION_MODEL", "gemini-1.5-flash")
+
+# Stub settings: latency distributions in milliseconds (see LatencyDistribution),
+# an optional JSON file of recorded responses and the random seed
+STUB_TEXT_LATENCY = os.getenv("STUB_TEXT_LATENCY", "lognormal:800:0.4")
+STUB_VISION_LATENCY = os.getenv("STUB_VISION_LATENCY", "lognormal:1200:0.3")
+STUB_RESPONSES = os.getenv("STUB_RESPONSES", "")
+STUB_SEED = int(os.getenv("STUB_SEED", "0"))
+# Injected faults for both stub models (see FaultInjector), e.g. "error:0.2,slow:0.05:4000"
+STUB_FAULTS = os.getenv("STUB_FAULTS", "")
+
+# Canned agent answers keyed by agent role; {city} and the figures from the
+# analyst's context ({helicopters}, {population}, ...) are filled in
+STUB_TEMPLATES = {
+    "Document Searcher": '{{"city": "{city}", "population": {population}, "hurt": {hurt}}}',
+    "Needs Analyser": "{city} ({population} residents) urgently needs food, clean water and medical supplies.",
+    "Aid Dispatcher": "{city}: {helicopters} helicopters, {police} police and {special_forces} special forces units have been dispatched.",
+    "Resources Allocator": "{city} needs {apples} apples, {bananas} bananas and {oranges} oranges for its {population} residents.",
+    "Damage Analyser": "{city}: critical infrastructure damage reported, affected zones need immediate attention.",
+}
+
+_FIGURE_RE = re.compile(r'"(population|hurt|stuck|helicopters|police|special_forces|apples|bananas|oranges)":\s*(\d+)')
+
+
+class LatencyDistribution:
+    """
+    Call latency of the stub models
+
+    Specs (all in milliseconds): "fixed:<ms>", "uniform:<low>:<high>",
+    "normal:<mean>:<stddev>" and "lognormal:<median>:<sigma>". Samples come
+    from a seeded generator so runs are reproducible.
+    """
+
+    def __init__(self, spec, seed=STUB_SEED):
+        self.spec = spec
+        kind, *params = spec.split(":")
+        params = [float(p) for p in params]
+        samplers = {
+            "fixed": lambda rng: params[0],
+            "uniform": lambda rng: rng.uniform(params[0], params[1]),
+            "normal": lambda rng: rng.gauss(params[0], params[1]),
+            "lognormal": lambda rng: rng.lognormvariate(math.log(params[0]), params[1]),
+        }
+        if kind not in samplers:
+            raise ValueError(f"Unknown latency distribution '{spec}'")
+        self._sample = samplers[kind]
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self):
+        """Next latency in seconds"""
+        with self._lock:
+            return max(0.0, self._sample(self._rng)) / 1000
+
+
+class StubServiceError(Exception):
+    """Injected provider failure, shaped like an HTTP 503 from the real API"""
+
+    status_code = 503
+
+
+class FaultInjector:
+    """
+    Failures and slow calls for the stub models, to exercise retries,
+    hedging and circuit breaking offline
+
+    Spec: comma-separated faults, each applied independently per call:
+    "error:<rate>" raises StubServiceError with that probability ("error:1"
+    is an outage), "slow:<rate>:<ms>" adds that much latency (a heavy tail).
+    Seeded like the latency samples, so runs are reproducible.
+    """
+
+    def __init__(self, spec=STUB_FAULTS, seed=STUB_SEED):
+        self.spec = spec
+        self.error_rate = 0.0
+        self.slow_rate = 0.0
+        self.slow_seconds = 0.0
+        for fault in filter(None, spec.split(",")):
+            kind, *params = fault.strip().split(":")
+            if kind == "error":
+                self.error_rate = float(params[0])
+            elif kind == "slow":
+                self.slow_rate, self.slow_seconds = float(params[0]), float(params[1]) / 1000
+            else:
+                raise ValueError(f"Unknown stub fault '{fault}'")
+        self.injected_errors = 0
+        self._rng = random.Random(seed + 1)
+        self._lock = threading.Lock()
+
+    def extra_latency(self):
+        """Seconds to add to this call (0 unless it drew a slow fault)"""
+        with self._lock:
+            return self.slow_seconds if self.slow_rate and self._rng.random() < self.slow_rate else 0.0
+
+    def maybe_fail(self):
+        """
+        Raises:
+            StubServiceError: When this call drew an error fault
+        """
+        with self._lock:
+            failed = self.error_rate and self._rng.random() < self.error_rate
+            self.injected_errors += bool(failed)
+        if failed:
+            raise StubServiceError("503 Service Unavailable (injected stub fault)")
+
+
+class CallStats:
+    """Latencies of the most recent model calls"""
+
+    def __init__(self, maxlen=10000):
+        self._latencies = deque(maxlen=maxlen)
+        self.calls = 0
+
+    def record(self, seconds):
+        self.calls += 1
+        self._latencies.append(seconds * 1000)
+
+    def summary(self):
+        latencies = sorted(self._latencies)
+        if not latencies:
+            return {"calls": self.calls}
+        return {
+            "calls": self.calls,
+            "p50_ms": round(statistics.median(latencies), 2),
+            "p95_ms": round(latencies[max(0, int(len(latencies) * 0.95) - 1)], 2),
+            "max_ms": round(latencies[-1], 2),
+        }
+
+
+def load_recorded_responses(path=STUB_RESPONSES):
+    """
+    Recorded responses from a JSON file, or {}
+
+    The file maps agent roles to answer templates (overriding STUB_TEMPLATES)
+    and may hold a "vision" entry: a city name returned for every image.
+    """
+    if not path:
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def stub_text_response(prompt, responses):
+    """
+    Deterministic answer for an agent prompt
+
+    The agent is recognised by its role in the prompt; the city name and any
+    figures found in its context fill the template.
+    """
+    templates = {**STUB_TEMPLATES, **{k: v for k, v in responses.items() if k != "vision"}}
+    template = next((t for role, t in templates.items() if role in prompt), "Report for {city}.")
+    city = next((name for name in city_map.values() if name in prompt), "the city")
+    figures = {name: int(value) for name, value in _FIGURE_RE.findall(prompt)}
+    return template.format_map(_Defaults(city=city, **figures))
+
+
+class _Defaults(dict):
+    def __missing__(self, key):
+        return "several"
+
+
+class StubVisionModel:
+    """
+    Offline stand-in for the Gemini vision model
+
+    Answers `generate_content` like the real model, after a sampled delay:
+    one city name, or "<n>: <city>" lines for packed prompts. Each image
+    maps to a city by a hash of its bytes (or the recorded "vision" answer),
+    so the same upload always gets the same answer.
+    """
+
+    def __init__(self, latency=STUB_VISION_LATENCY, responses=None, faults=STUB_FAULTS):
+        self.latency = LatencyDistribution(latency)
+        self.responses = load_recorded_responses() if responses is None else responses
+        self.faults = FaultInjector(faults)
+        self.stats = CallStats()
+
+    def _city_for(self, image):
+        if "vision" in self.responses:
+            return self.responses["vision"]
+        data = image["data"] if isinstance(image, dict) else image.tobytes()
+        digest = int(hashlib.sha1(data).hexdigest()[:8], 16)
+        return list(city_map.values())[digest % len(city_map)]
+
+    def generate_content(self, parts):
+        delay = self.latency.sample() + self.faults.extra_latency()
+        time.sleep(delay)
+        self.faults.maybe_fail()
+        self.stats.record(delay)
+
+        cities = [self._city_for(part) for part in parts if not isinstance(part, str)]
+
+        class Response:
+            text = cities[0] if len(cities) == 1 else "\n".join(f"{n}: {city}" for n, city in enumerate(cities, 1))
+        return Response()
+
+
+class GeminiProvider:
+    """Google Gemini through CrewAI/LiteLLM (text) and google.generativeai (vision)"""
+
+    name = "gemini"
+
+    def text_llm(self):
+        from crewai import LLM
+        return LLM(model=LLM_MODEL, temperature=LLM_TEMPERATURE, api_key=os.getenv("GOOGLE_API_KEY"))
+
+    def vision_model(self, api_key=None):
+        """Shared vision model, or None without an API key"""
+        api_key = api_key or os.getenv("GOOGLE_API_KEY")
+        if not api_key_configured(api_key):
+            return None
+        # Imported here: the SDK is slow to load and only needed once a key is configured
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        return genai.GenerativeModel(VISION_MODEL)
+
+    def config(self, kind):
+        if kind == "text":
+            return {"provider": self.name, "model": LLM_MODEL, "temperature": LLM_TEMPERATURE}
+        return {"provider": self.name, "model": VISION_MODEL}
+
+
+class StubProvider:
+    """Local stub models with recorded or templated answers and configurable latency"""
+
+    name = "stub"
+
+    def text_llm(self):
+        from stub_llm import StubLLM
+        return StubLLM(latency=STUB_TEXT_LATENCY, responses=load_recorded_responses())
+
+    def vision_model(self, api_key=None):
+        return StubVisionModel()
+
+    def config(self, kind):
+        latency = STUB_TEXT_LATENCY if kind == "text" else STUB_VISION_LATENCY
+        return {"provider": self.name, "latency": latency, "responses": STUB_RESPONSES, "seed": STUB_SEED, "faults": STUB_FAULTS}
+
+
+PROVIDERS = {
+    "gemini": GeminiProvider,
+    "stub": StubProvider,
+}
+
+
+def api_key_configured(api_key):
+    """Check that a real Google API key is set"""
+    return bool(api_key) and api_key != "your_google_api_key_here"
+
+
+def get_provider(kind="text"):
+    """
+    Provider for "text" (agents) or "vision" (satellite) calls
+
+    Raises:
+        ValueError: For an unknown LLM_PROVIDER/VISION_PROVIDER
+    """
+    name = LLM_PROVIDER if kind == "text" else VISION_PROVIDER
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown {kind} provider '{name}', expected one of {sorted(PROVIDERS)}")
+    return PROVIDERS[name]()
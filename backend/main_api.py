@@ -3,18 +3,30 @@ FastAPI Application for PostDisaster System
 Provides endpoints for satellite image analysis and disaster response
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import Body, FastAPI, File, Request, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+import asyncio
 import os
-import shutil
-from pathlib import Path
 import json
-from typing import Optional
+import re
+from typing import Annotated, List, Optional, Union
 
-# Import our modules
-from satellite import analyze_city_image
-from postdisaster_system import analyze_city_from_image_and_run_crew, city_map, run_disaster_analysis
+from pydantic import BaseModel, Field
+
+# Import our modules (only light ones here: the agent stack, the vision SDK
+# and NumPy-based modules are imported on first use or by the warm-up)
+from cities import city_map
+from city_registry import get_city_registry
+from resources import WARMUP_MODE, get_registry
+from executor import RETRY_AFTER_SECONDS, import_off_loop, limiter_stats, run_blocking
+from jobs import QueueFullError, get_job_queue
+from model_calls import ModelCallError, model_call_stats
+from uploads import BATCH_MAX_UPLOAD_BYTES, UploadLimitMiddleware, UploadRoute, upload_source
+from batch import collect_batch_items, stream_batch_analysis
+from streaming import sse_event, stream_pipeline
+from telemetry import TelemetryMiddleware, current_trace, render_metrics, wants_timings
+from tts import audio_bulletins, shutdown_audio_renderer
 
 app = FastAPI(
     title="PostDisaster AI System",
@@ -22,6 +34,12 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Uploads spool to memory up to UPLOAD_SPOOL_BYTES (must be set before the routes are declared)
+app.router.route_class = UploadRoute
+
+# Reject oversized uploads before they are read (added first so CORS headers still apply)
+app.add_middleware(UploadLimitMiddleware, path_limits={"/analyze-images/batch/": BATCH_MAX_UPLOAD_BYTES})
+
 # Add CORS middleware for frontend integration
 app.add_middleware(
     CORSMiddleware,
@@ -31,9 +49,51 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Create uploads directory
-UPLOAD_DIR = Path("../uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
+# Outermost, so request latency and the per-request trace cover everything below
+app.add_middleware(TelemetryMiddleware)
+
+async def with_timings(request, response):
+    """Add the per-stage timing breakdown to a JSON response if the debug header is set"""
+    trace = current_trace()
+    if trace is not None and wants_timings(request):
+        # Waits briefly for CrewAI's token usage events, so off the event loop
+        response["timings"] = await asyncio.to_thread(trace.breakdown)
+    return response
+
+def model_unavailable(e):
+    """503 for a model call that kept failing (or an open circuit), with a retry hint when known"""
+    headers = {"Retry-After": str(e.retry_after)} if e.retry_after else None
+    return HTTPException(status_code=e.status_code, detail=str(e), headers=headers)
+
+def mark_upload_received():
+    """Record the time spent receiving the request body as the "upload" stage"""
+    trace = current_trace()
+    if trace is not None:
+        trace.mark("upload")
+
+@app.on_event("startup")
+async def start_resources():
+    """Warm the shared LLM clients, document index and crew pool (see WARMUP_MODE)"""
+    registry = get_registry(start=False)
+    if WARMUP_MODE == "background":
+        registry.start_background()
+    elif WARMUP_MODE == "blocking":
+        registry.startup()
+        index = registry.document_index
+        print(f"Embedding index ready: {len(index.chunks)} chunks ({index.embedder.name}, key {index.key})")
+        print(f"Resource startup timings (ms): {json.dumps(registry.timings)}")
+
+@app.on_event("startup")
+async def start_job_workers():
+    """Start the background workers for queued complete analyses"""
+    get_job_queue().start()
+
+@app.on_event("shutdown")
+async def stop_resources():
+    """Stop the job workers and release the shared resources"""
+    get_job_queue().stop()
+    shutdown_audio_renderer()
+    get_registry(start=False).shutdown()
 
 @app.get("/")
 async def root():
@@ -43,9 +103,29 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "analyze_image": "/analyze-image/",
+            "analyze_images_batch": "/analyze-images/batch/",
             "analyze_city": "/analyze-city/{city_id}",
+            "analyze_city_stream": "/analyze-city/{city_id}/stream",
+            "city_figures": "/city-figures/{city_id}",
+            "plan": "/plan/",
+            "sweep": "/sweep/",
+            "sweep_stream": "/sweep/stream/",
             "get_cities": "/cities/",
-            "complete_analysis": "/complete-analysis/"
+            "lookup_city": "/cities/lookup/?name=",
+            "ready": "/ready/",
+            "metrics": "/metrics",
+            "startup_report": "/startup-report/",
+            "executor_stats": "/executor-stats/",
+            "cache_stats": "/cache/stats/",
+            "audio": "/audio/{audio_id}",
+            "audio_info": "/audio/{audio_id}/info",
+            "tts_stats": "/tts/stats/",
+            "model_call_stats": "/model-calls/stats/",
+            "complete_analysis": "/complete-analysis/",
+            "complete_analysis_stream": "/complete-analysis/stream/",
+            "submit_job": "/jobs/complete-analysis/",
+            "job_status": "/jobs/{job_id}",
+            "job_result": "/jobs/{job_id}/result"
         }
     }
 
@@ -58,8 +138,118 @@ async def get_cities():
         "status": "success"
     }
 
+@app.get("/cities/lookup/")
+async def lookup_city(name: str):
+    """
+    Resolve a city name (exact, normalized, mentioned in a sentence or misspelled)
+
+    Args:
+        name: City name or text naming a city
+
+    Returns:
+        JSON response with the city id, its name and how it was matched
+    """
+    city_id, method = get_city_registry().names.match(name)
+    if city_id is None:
+        raise HTTPException(status_code=404, detail=f"No city matches '{name}'")
+    return {"city_id": city_id, "city_name": city_map[city_id], "match": method}
+
+@app.get("/ready/")
+async def readiness():
+    """Readiness probe: 200 once warm-up is done, 503 while warming or if it failed"""
+    status = get_registry(start=False).readiness()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: stage latencies, HTTP requests, LLM calls, tokens and retries"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/startup-report/")
+async def startup_report():
+    """Startup timings and per-request crew binding overhead"""
+    return get_registry(start=False).report()
+
+@app.get("/cache/stats/")
+async def cache_stats():
+    """Hit/miss counters of the disaster analysis result cache"""
+    # Imports NumPy and may connect to Redis, so off the event loop
+    result_cache = await import_off_loop("result_cache")
+    return await asyncio.to_thread(lambda: result_cache.get_result_cache().stats())
+
+@app.get("/executor-stats/")
+async def executor_stats():
+    """Active, waiting and rejected requests per endpoint"""
+    return limiter_stats()
+
+@app.get("/model-calls/stats/")
+async def model_call_stats_endpoint():
+    """Circuit breaker state and hedging counters for the vision model and agent LLM"""
+    return model_call_stats()
+
+@app.get("/tts/stats/")
+async def tts_stats_endpoint():
+    """Audio bulletin renderer: engine, cache hits, renders and mean render time"""
+    from tts import TTS_ENGINE, get_audio_renderer
+    renderer = await asyncio.to_thread(get_audio_renderer)
+    return renderer.stats() if renderer else {"engine": TTS_ENGINE, "available": False}
+
+AUDIO_ID_RE = re.compile(r"[0-9a-f]{40}")
+
+async def rendered_audio(audio_id):
+    """
+    Cache metadata of a bulletin, waiting up to TTS_WAIT_SECONDS if this process is still rendering it
+
+    Returns:
+        tuple: (AudioCache, metadata or None if still rendering)
+    """
+    from tts import TTS_WAIT_SECONDS, AudioCache, get_audio_renderer
+
+    if not AUDIO_ID_RE.fullmatch(audio_id):
+        raise HTTPException(status_code=404, detail=f"Unknown audio id {audio_id}")
+    renderer = await asyncio.to_thread(get_audio_renderer)
+    cache = renderer.cache if renderer else AudioCache()
+    info = cache.info(audio_id)
+    future = renderer.pending(audio_id) if renderer and info is None else None
+    if future is not None:
+        try:
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), TTS_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            return cache, None
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error rendering audio: {str(e)}")
+        info = cache.info(audio_id)
+    if info is None:
+        raise HTTPException(status_code=404, detail=f"Unknown audio id {audio_id}")
+    return cache, info
+
+@app.get("/audio/{audio_id}")
+async def audio_endpoint(audio_id: str):
+    """
+    Stream a rendered audio bulletin (WAV)
+    
+    Args:
+        audio_id: `audio_id` from an analysis response's `audio_bulletins`
+        
+    Returns:
+        The audio, with its render time in the X-Render-Ms header, or 202
+        with Retry-After while it is still rendering
+    """
+    cache, info = await rendered_audio(audio_id)
+    if info is None:
+        return JSONResponse(status_code=202, content={"audio_id": audio_id, "status": "rendering"}, headers={"Retry-After": "1"})
+    return FileResponse(cache.audio_path(audio_id), media_type="audio/wav", headers={"X-Render-Ms": str(info["render_ms"])})
+
+@app.get("/audio/{audio_id}/info")
+async def audio_info_endpoint(audio_id: str):
+    """Render time, duration and size of a bulletin (or its status while rendering)"""
+    _, info = await rendered_audio(audio_id)
+    if info is None:
+        return JSONResponse(status_code=202, content={"audio_id": audio_id, "status": "rendering"}, headers={"Retry-After": "1"})
+    return {"audio_id": audio_id, "status": "ready", **info}
+
 @app.post("/analyze-image/")
-async def analyze_image_endpoint(file: UploadFile = File(...)):
+async def analyze_image_endpoint(request: Request, file: UploadFile = File(...)):
     """
     Analyze uploaded satellite image to identify city
     
@@ -69,18 +259,17 @@ async def analyze_image_endpoint(file: UploadFile = File(...)):
     Returns:
         JSON response with detected city information
     """
+    analyze_city_image = (await import_off_loop("satellite")).analyze_city_image
+
+    mark_upload_received()
     try:
         # Validate file type
         if not file.content_type.startswith('image/'):
             raise HTTPException(status_code=400, detail="File must be an image")
         
-        # Save uploaded file
-        file_path = UPLOAD_DIR / file.filename
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Analyze the image
-        city_number = analyze_city_image(str(file_path))
+        # Analyze the spooled upload directly, without copying it to disk
+        source, size = upload_source(file)
+        city_number = await run_blocking("analyze_image", analyze_city_image, source, file.filename, size)
         
         if city_number:
             response = {
@@ -94,27 +283,41 @@ async def analyze_image_endpoint(file: UploadFile = File(...)):
         else:
             response = {
                 "success": False,
-                "city_number": 1,
-                "city_name": city_map[1],
-                "message": "Could not identify city, using default (Seabrook City)",
+                "city_number": None,
+                "city_name": None,
+                "message": "Could not identify the city in the image",
                 "filename": file.filename,
                 "available_cities": city_map
             }
         
-        # Clean up uploaded file
-        os.remove(file_path)
-        
-        return JSONResponse(content=response)
+        return JSONResponse(content=await with_timings(request, response))
         
+    except HTTPException:
+        raise
+    except ModelCallError as e:
+        raise model_unavailable(e)
     except Exception as e:
-        # Clean up file if it exists
-        if 'file_path' in locals() and os.path.exists(file_path):
-            os.remove(file_path)
-            
         raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
 
+@app.post("/analyze-images/batch/")
+async def analyze_images_batch_endpoint(files: List[UploadFile] = File(...), run_crew: bool = True):
+    """
+    Analyze many satellite images (or zip archives of images) in one request
+
+    Args:
+        files: Uploaded images and/or zip archives
+        run_crew: Run one disaster analysis per distinct detected city
+
+    Returns:
+        NDJSON stream: one "image" line per image as it is classified, one
+        "city" line per crew run, then a "summary" line
+    """
+    items = await asyncio.to_thread(collect_batch_items, files)
+    print(f"Processing batch of {len(items)} images")
+    return StreamingResponse(stream_batch_analysis(items, run_crew), media_type="application/x-ndjson")
+
 @app.get("/analyze-city/{city_id}")
-async def analyze_city_endpoint(city_id: int):
+async def analyze_city_endpoint(city_id: int, request: Request):
     """
     Run disaster analysis for a specific city
     
@@ -124,30 +327,203 @@ async def analyze_city_endpoint(city_id: int):
     Returns:
         JSON response with disaster analysis results
     """
+    run_disaster_analysis_cached = (await import_off_loop("postdisaster_system")).run_disaster_analysis_cached
+
     try:
         if city_id not in city_map:
-            raise HTTPException(status_code=400, detail=f"Invalid city_id. Must be between 1 and {len(city_map)}")
+            raise HTTPException(status_code=400, detail=f"Unknown city ids: {[city_id]}")
         
         print(f"Running disaster analysis for city {city_id}: {city_map[city_id]}")
         
         # Run CrewAI analysis
-        crew_results = run_disaster_analysis(city_id)
+        crew_results = await run_blocking("analyze_city", run_disaster_analysis_cached, city_id)
         
         response = {
             "success": True,
             "city_id": city_id,
             "city_name": city_map[city_id],
             "disaster_analysis": crew_results,
+            "audio_bulletins": await asyncio.to_thread(audio_bulletins, city_map[city_id], crew_results),
             "message": f"Disaster analysis completed for {city_map[city_id]}"
         }
         
-        return JSONResponse(content=response)
+        return JSONResponse(content=await with_timings(request, response))
         
+    except HTTPException:
+        raise
+    except ModelCallError as e:
+        raise model_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error running disaster analysis: {str(e)}")
 
+@app.get("/city-figures/{city_id}")
+async def city_figures_endpoint(city_id: int):
+    """
+    Dispatch and resource figures for a city, computed from the parsed document without the LLM
+    
+    Args:
+        city_id: City ID (1-5)
+        
+    Returns:
+        JSON response with population, hurt/stuck counts, dispatch and resource figures
+    """
+    if city_id not in city_map:
+        raise HTTPException(status_code=400, detail=f"Unknown city ids: {[city_id]}")
+    
+    # The first call parses the city document, so off the event loop
+    city_data = await import_off_loop("city_data")
+    dataset = await asyncio.to_thread(city_data.get_city_dataset)
+    figures = dataset.figures(city_map[city_id])
+    if figures is None:
+        raise HTTPException(status_code=404, detail=f"No records for {city_map[city_id]} in the city document")
+    
+    return {"success": True, "city_id": city_id, **figures}
+
+# Largest population or casualty count accepted by /plan/ (more people than live on Earth)
+PLAN_MAX_COUNT = int(os.getenv("PLAN_MAX_COUNT", str(10 ** 10)))
+
+PlanCount = Annotated[float, Field(ge=0, le=PLAN_MAX_COUNT, allow_inf_nan=False)]
+PlanCounts = Union[List[PlanCount], List[List[PlanCount]]]
+
+class PlanRequest(BaseModel):
+    city_ids: Optional[List[int]] = None
+    hurt: Optional[PlanCounts] = None
+    populations: Optional[PlanCounts] = None
+    totals_only: bool = False
+
+@app.post("/plan/")
+async def plan_endpoint(request: Optional[PlanRequest] = Body(default=None)):
+    """
+    Resource and dispatch figures for many cities and what-if scenarios in one call
+    
+    Args:
+        request: Optional body with `city_ids` (defaults to all cities),
+            `hurt` and `populations` per city or as a scenarios x cities grid
+            (default to the document's figures), and `totals_only`
+        
+    Returns:
+        JSON response with per-city figures and regional totals (per scenario)
+    """
+    planner = await import_off_loop("planner")
+
+    request = request or PlanRequest()
+    city_ids = request.city_ids or list(city_map)
+    invalid = [city_id for city_id in city_ids if city_id not in city_map]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Unknown city ids: {invalid}")
+    
+    try:
+        # Parses the city document on first use and can be large, so off the event loop
+        result = await asyncio.to_thread(
+            planner.plan_cities,
+            [city_map[city_id] for city_id in city_ids],
+            hurt=request.hurt,
+            populations=request.populations,
+            totals_only=request.totals_only,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {"success": True, "city_ids": city_ids, **result}
+
+class SweepRequest(BaseModel):
+    city_ids: Optional[List[int]] = None
+
+@app.post("/sweep/")
+async def sweep_endpoint(request: Request, body: Optional[SweepRequest] = Body(default=None)):
+    """
+    Analyze every affected city of a regional event and aggregate the results
+    
+    Args:
+        body: Optional `city_ids` (defaults to all cities)
+        
+    Returns:
+        JSON situation report: regional totals, cities grouped by disaster and
+        each city's analysis in priority order (most casualties first)
+    """
+    from sweep import run_sweep
+
+    city_ids = (body.city_ids if body else None) or list(city_map)
+    print(f"Sweeping {len(city_ids)} cities")
+    
+    try:
+        report = await run_blocking("sweep", run_sweep, city_ids)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return await with_timings(request, {"success": True, **report})
+
+def _sweep_with_events(city_ids, emit):
+    from sweep import run_sweep
+    return {"success": True, **run_sweep(city_ids, on_event=emit)}
+
+@app.post("/sweep/stream/")
+async def sweep_stream_endpoint(body: Optional[SweepRequest] = Body(default=None)):
+    """
+    Regional sweep streamed as Server-Sent Events
+    
+    Returns:
+        SSE stream: a "sweep" event with the priority order, one "city" event
+        per city as its analysis finishes, then "complete" with the situation
+        report (or "error")
+    """
+    city_ids = (body.city_ids if body else None) or list(city_map)
+    invalid = [city_id for city_id in city_ids if city_id not in city_map]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Unknown city ids: {invalid}")
+    
+    return StreamingResponse(
+        stream_pipeline("sweep", _sweep_with_events, city_ids),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+def _analyze_city_with_events(city_id, emit):
+    from postdisaster_system import run_disaster_analysis_cached
+    crew_results = run_disaster_analysis_cached(
+        city_id, on_output=lambda name, text: emit("agent", {"agent": name, "output": text})
+    )
+    return {
+        "success": True,
+        "city_id": city_id,
+        "city_name": city_map[city_id],
+        "disaster_analysis": crew_results,
+        "audio_bulletins": audio_bulletins(city_map[city_id], crew_results),
+        "message": f"Disaster analysis completed for {city_map[city_id]}"
+    }
+
+@app.get("/analyze-city/{city_id}/stream")
+async def analyze_city_stream_endpoint(city_id: int):
+    """
+    Run disaster analysis for a specific city, streamed as Server-Sent Events
+    
+    Args:
+        city_id: City ID (1-5)
+        
+    Returns:
+        SSE stream: a "city" event, a "figures" event with the computed
+        dispatch/resource numbers, one "agent" event per report as soon as
+        that agent finishes, then "complete" with the full results (or "error")
+    """
+    if city_id not in city_map:
+        raise HTTPException(status_code=400, detail=f"Unknown city ids: {[city_id]}")
+    
+    print(f"Streaming disaster analysis for city {city_id}: {city_map[city_id]}")
+    
+    async def events():
+        yield sse_event("city", {"city_id": city_id, "city_name": city_map[city_id]})
+        city_data = await import_off_loop("city_data")
+        dataset = await asyncio.to_thread(city_data.get_city_dataset)
+        figures = dataset.figures(city_map[city_id])
+        if figures:
+            yield sse_event("figures", figures)
+        async for event in stream_pipeline("analyze_city", _analyze_city_with_events, city_id):
+            yield event
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @app.post("/complete-analysis/")
-async def complete_analysis_endpoint(file: UploadFile = File(...)):
+async def complete_analysis_endpoint(request: Request, file: UploadFile = File(...)):
     """
     Complete workflow: Upload image -> Analyze city -> Run disaster analysis
     
@@ -157,56 +533,156 @@ async def complete_analysis_endpoint(file: UploadFile = File(...)):
     Returns:
         JSON response with complete analysis results
     """
+    analyze_city_from_image_and_run_crew = (await import_off_loop("postdisaster_system")).analyze_city_from_image_and_run_crew
+    CityNotDetectedError = (await import_off_loop("satellite")).CityNotDetectedError
+
+    mark_upload_received()
     try:
         # Validate file type
         if not file.content_type.startswith('image/'):
             raise HTTPException(status_code=400, detail="File must be an image")
         
-        # Save uploaded file
-        file_path = UPLOAD_DIR / file.filename
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        source, size = upload_source(file)
         
         print(f"Processing complete analysis for: {file.filename}")
         
-        # Run complete analysis
-        results = analyze_city_from_image_and_run_crew(str(file_path))
+        # Run complete analysis on the spooled upload
+        results = await run_blocking("complete_analysis", analyze_city_from_image_and_run_crew, source, file.filename, size)
         
         # Add filename to results
         results["filename"] = file.filename
         
-        # Clean up uploaded file
-        os.remove(file_path)
-        
-        return JSONResponse(content=results)
+        return JSONResponse(content=await with_timings(request, results))
         
+    except HTTPException:
+        raise
+    except CityNotDetectedError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except ModelCallError as e:
+        raise model_unavailable(e)
     except Exception as e:
-        # Clean up file if it exists
-        if 'file_path' in locals() and os.path.exists(file_path):
-            os.remove(file_path)
-            
         raise HTTPException(status_code=500, detail=f"Error in complete analysis: {str(e)}")
 
+def _complete_analysis_with_events(source, filename, size, emit):
+    from postdisaster_system import analyze_city_from_image_and_run_crew
+    results = analyze_city_from_image_and_run_crew(source, filename, size, on_event=emit)
+    results["filename"] = filename
+    return results
+
+@app.post("/complete-analysis/stream/")
+async def complete_analysis_stream_endpoint(file: UploadFile = File(...)):
+    """
+    Complete workflow streamed as Server-Sent Events
+    
+    Args:
+        file: Uploaded satellite image
+        
+    Returns:
+        SSE stream: a "satellite" event with the detected city, a "figures"
+        event with the computed dispatch/resource numbers, one "agent" event
+        per report as soon as that agent finishes, then "complete" with the
+        full results (or "error")
+    """
+    if not file.content_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="File must be an image")
+    
+    source, size = upload_source(file)
+    
+    print(f"Streaming complete analysis for: {file.filename}")
+    
+    return StreamingResponse(
+        stream_pipeline("complete_analysis", _complete_analysis_with_events, source, file.filename, size),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+@app.post("/jobs/complete-analysis/", status_code=202)
+async def submit_complete_analysis_job(file: UploadFile = File(...)):
+    """
+    Queue a complete analysis and return immediately
+
+    Args:
+        file: Uploaded satellite image
+
+    Returns:
+        JSON response with the job id and where to poll for it
+    """
+    if not file.content_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="File must be an image")
+
+    upload_source(file)
+    image_bytes = await file.read()
+    try:
+        # SQLite writes (with the image) stay off the event loop
+        job_id = await asyncio.to_thread(get_job_queue().submit, file.filename, image_bytes)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+    return {
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/jobs/{job_id}",
+        "result_url": f"/jobs/{job_id}/result"
+    }
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """Status and timestamps of a queued analysis job"""
+    job = await asyncio.to_thread(get_job_queue().store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    job.pop("result")
+    return job
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    """
+    Result of a finished analysis job
+
+    Returns 202 with a Retry-After header while the job is still queued or running.
+    A failed job answers with the status of its error: 422 when no city was
+    detected, 503 when the model was unavailable, 500 otherwise.
+    """
+    job = await asyncio.to_thread(get_job_queue().store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    if job["status"] == "failed":
+        status_code = job["status_code"] or 500
+        if status_code == 500:
+            raise HTTPException(status_code=500, detail=f"Error in complete analysis: {job['error']}")
+        headers = {"Retry-After": str(RETRY_AFTER_SECONDS)} if status_code == 503 else None
+        raise HTTPException(status_code=status_code, detail=job["error"], headers=headers)
+    if job["status"] != "completed":
+        return JSONResponse(
+            status_code=202,
+            content={"job_id": job_id, "status": job["status"]},
+            headers={"Retry-After": "5"}
+        )
+    return JSONResponse(content=job["result"])
+
 @app.get("/test-analysis/")
 async def test_analysis():
     """
-    Test endpoint using the default Baytown image
+    Test endpoint using the sample city image (TEST_IMAGE)
     """
+    analyze_city_from_image_and_run_crew = (await import_off_loop("postdisaster_system")).analyze_city_from_image_and_run_crew
+    TEST_IMAGE = (await import_off_loop("satellite")).TEST_IMAGE
+
     try:
-        print("Running test analysis with default Baytown image...")
+        print(f"Running test analysis with {TEST_IMAGE}...")
         
-        # Use the default Baytown image path
-        default_image = r"D:\All Projects\Site uploaded\PostDisaster-Ai-Agentic-Alert-System\Dummy Cities\Baytown.png"
+        # The Highland Park image in the repository's frontend, or TEST_IMAGE
+        default_image = TEST_IMAGE
         
         if not os.path.exists(default_image):
             return {
                 "success": False,
-                "message": "Default test image not found",
+                "message": "Default test image not found (set TEST_IMAGE to a city image)",
                 "image_path": default_image
             }
         
         # Run complete analysis
-        results = analyze_city_from_image_and_run_crew(default_image)
+        results = await run_blocking("complete_analysis", analyze_city_from_image_and_run_crew, default_image)
         results["test_mode"] = True
         results["image_path"] = default_image
         
@@ -221,9 +697,29 @@ if __name__ == "__main__":
     print("Available endpoints:")
     print("- GET  /: API information")
     print("- GET  /cities/: List available cities")
+    print("- GET  /cities/lookup/?name=: Resolve a city name")
+    print("- GET  /ready/: Readiness (warm-up finished)")
+    print("- GET  /metrics: Prometheus metrics")
+    print("- GET  /startup-report/: Resource startup timings")
+    print("- GET  /executor-stats/: Per-endpoint concurrency and rejections")
+    print("- GET  /cache/stats/: Analysis result cache counters")
+    print("- GET  /tts/stats/: Audio bulletin renderer counters")
+    print("- GET  /audio/{audio_id}: Stream a rendered audio bulletin")
+    print("- GET  /audio/{audio_id}/info: Render time and duration of a bulletin")
+    print("- GET  /model-calls/stats/: Circuit breaker and hedging state of the model calls")
     print("- POST /analyze-image/: Analyze uploaded image")
+    print("- POST /analyze-images/batch/: Analyze many images, streamed as NDJSON")
     print("- GET  /analyze-city/{city_id}: Run disaster analysis for specific city")
+    print("- GET  /analyze-city/{city_id}/stream: Same, streamed per agent as Server-Sent Events")
+    print("- GET  /city-figures/{city_id}: Dispatch and resource figures without the LLM")
+    print("- POST /plan/: Bulk resource and dispatch plan for many cities and scenarios")
+    print("- POST /sweep/: Analyze many cities concurrently into one situation report")
+    print("- POST /sweep/stream/: Same, streamed per city as Server-Sent Events")
     print("- POST /complete-analysis/: Complete workflow (image + analysis)")
-    print("- GET  /test-analysis/: Test with default Baytown image")
+    print("- POST /complete-analysis/stream/: Complete workflow streamed as Server-Sent Events")
+    print("- POST /jobs/complete-analysis/: Queue a complete analysis job")
+    print("- GET  /jobs/{job_id}: Job status")
+    print("- GET  /jobs/{job_id}/result: Job result")
+    print("- GET  /test-analysis/: Test with the sample Highland Park image")
     
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
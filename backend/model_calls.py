@@ -0,0 +1,336 @@
+"""
+Model Calls for PostDisaster System
+Retries, hedged requests and circuit breaking around vision calls and agent tasks
+"""
+
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from dotenv import load_dotenv
+
+from telemetry import CIRCUIT_REJECTIONS, HEDGES, record_retry
+
+load_dotenv()
+
+# Attempts per model call (1: no retries) and the jittered exponential backoff between them
+MODEL_RETRY_ATTEMPTS = int(os.getenv("MODEL_RETRY_ATTEMPTS", "3"))
+MODEL_RETRY_BASE_DELAY = float(os.getenv("MODEL_RETRY_BASE_DELAY", "0.5"))  # seconds
+MODEL_RETRY_MAX_DELAY = float(os.getenv("MODEL_RETRY_MAX_DELAY", "8"))  # seconds
+# Time budget for one call including its retries; no retry starts that would end after it
+MODEL_CALL_DEADLINE = float(os.getenv("MODEL_CALL_DEADLINE", "60"))  # seconds
+# Same for one agent task, which makes several LLM calls
+MODEL_TASK_DEADLINE = float(os.getenv("MODEL_TASK_DEADLINE", "300"))  # seconds
+
+# Hedging: when an attempt is slower than this quantile of recent call latencies,
+# send a duplicate request and use whichever answers first (costs extra quota)
+MODEL_HEDGE = os.getenv("MODEL_HEDGE", "0") == "1"
+MODEL_HEDGE_QUANTILE = float(os.getenv("MODEL_HEDGE_QUANTILE", "0.95"))
+MODEL_HEDGE_MIN_SAMPLES = int(os.getenv("MODEL_HEDGE_MIN_SAMPLES", "20"))  # latencies needed before hedging
+MODEL_HEDGE_THREADS = int(os.getenv("MODEL_HEDGE_THREADS", "32"))
+
+# Circuit breaker: open after this many consecutive failed attempts, probe again after the reset time
+MODEL_BREAKER_FAILURES = int(os.getenv("MODEL_BREAKER_FAILURES", "5"))
+MODEL_BREAKER_RESET = float(os.getenv("MODEL_BREAKER_RESET", "30"))  # seconds
+
+# Provider errors worth retrying: throttling, timeouts, dropped connections and
+# server-side failures, by HTTP status or by exception class name (LiteLLM,
+# google-api-core and the OpenAI-style SDKs all name them this way)
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+TRANSIENT_ERROR_NAMES = {
+    "APIConnectionError", "APITimeoutError", "BadGatewayError", "DeadlineExceeded", "InternalServerError",
+    "RateLimitError", "ResourceExhausted", "ServiceUnavailable", "ServiceUnavailableError", "Timeout",
+    "TooManyRequests",
+}
+
+
+class ModelCallError(Exception):
+    """Raised when a model call keeps failing; carries the model name and a retry hint in seconds"""
+
+    status_code = 503  # for API responses and stream error events
+
+    def __init__(self, model, message, retry_after=None):
+        super().__init__(message)
+        self.model = model
+        self.retry_after = retry_after
+
+
+class ModelUnavailableError(ModelCallError):
+    """Raised without calling the model while its circuit breaker is open"""
+
+
+def operation_label(name):
+    """Metric label for a model name ("agent LLM" -> "agent_llm")"""
+    return name.lower().replace(" ", "_")
+
+
+def is_transient(error):
+    """Whether a failed model call may succeed if repeated"""
+    if isinstance(error, ModelCallError):
+        return False  # already retried
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    for attribute in ("status_code", "code"):
+        status = getattr(error, attribute, None)
+        if isinstance(status, int) and status in TRANSIENT_STATUS_CODES:
+            return True
+    return any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__)
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker
+
+    Closed: calls go through. After `failure_threshold` failed attempts in a
+    row it opens and rejects calls straight away for `reset_seconds`; then
+    one probe call is let through (half open) and its outcome closes or
+    reopens the circuit.
+    """
+
+    def __init__(self, name, failure_threshold=MODEL_BREAKER_FAILURES, reset_seconds=MODEL_BREAKER_RESET):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def retry_after(self):
+        """Seconds until the next probe is allowed"""
+        return max(0.0, self._opened_at + self.reset_seconds - time.monotonic())
+
+    def before_call(self):
+        """
+        Raises:
+            ModelUnavailableError: While the circuit is open (or a probe is in flight)
+        """
+        with self._lock:
+            if self.state == "open" and self.retry_after() == 0:
+                self.state = "half_open"
+                return
+            if self.state == "closed":
+                return
+            self.rejected += 1
+            retry_after = max(1, round(self.retry_after()))
+        CIRCUIT_REJECTIONS.inc(operation=operation_label(self.name))
+        raise ModelUnavailableError(
+            self.name,
+            f"The {self.name} is unavailable after repeated failures, retry in {retry_after}s",
+            retry_after=retry_after,
+        )
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"Warning: {self.name} circuit opened after {self.failures} consecutive failures")
+                    self.opened += 1
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "times_opened": self.opened,
+                "rejected": self.rejected,
+                "retry_after_s": round(self.retry_after(), 1) if self.state == "open" else 0,
+            }
+
+
+class LatencyWindow:
+    """Latencies of the most recent successful calls, for the hedging threshold"""
+
+    def __init__(self, maxlen=200):
+        self._latencies = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def quantile(self, q, min_samples=MODEL_HEDGE_MIN_SAMPLES):
+        """Latency quantile in seconds, or None with fewer than min_samples latencies"""
+        with self._lock:
+            if len(self._latencies) < max(1, min_samples):
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+_hedge_pool = None
+_hedge_pool_lock = threading.Lock()
+
+
+def hedge_pool():
+    """Threads for hedged attempts; a losing attempt finishes there and is discarded"""
+    global _hedge_pool
+    with _hedge_pool_lock:
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(max_workers=MODEL_HEDGE_THREADS, thread_name_prefix="model-hedge")
+        return _hedge_pool
+
+
+class ModelCaller:
+    """
+    Runs calls to one model with deadline-aware retries, optional hedging
+    and a circuit breaker
+
+    Transient errors (see is_transient) are retried with full-jitter
+    exponential backoff while attempts and the deadline allow, and count
+    towards the breaker. Other errors (bad requests, auth) are raised as is.
+    Once retries are exhausted a ModelCallError is raised; while the breaker
+    is open calls fail fast with ModelUnavailableError. Callers never get a
+    made-up answer instead.
+    """
+
+    def __init__(self, name, attempts=MODEL_RETRY_ATTEMPTS, base_delay=MODEL_RETRY_BASE_DELAY,
+                 max_delay=MODEL_RETRY_MAX_DELAY, deadline=MODEL_CALL_DEADLINE, hedge=MODEL_HEDGE,
+                 breaker=None):
+        """
+        Args:
+            name (str): Model name for errors and metrics (e.g. "vision model")
+            attempts (int): Attempts per call
+            base_delay (float): Backoff before the first retry (doubling, with jitter)
+            max_delay (float): Backoff cap
+            deadline (float): Seconds per call including retries
+            hedge (bool): Send a duplicate request when an attempt is slow
+            breaker (CircuitBreaker): Defaults to one owned by this caller
+        """
+        self.name = name
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.hedge = hedge
+        self.breaker = breaker or CircuitBreaker(name)
+        self.latencies = LatencyWindow()
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._rng = random.Random()
+        self._operation = operation_label(name)
+
+    def backoff(self, retry):
+        """Full-jitter delay before retry number `retry` (1-based)"""
+        return self._rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** (retry - 1)))
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Call fn(*args, **kwargs) under the retry, hedging and breaker policy
+
+        Raises:
+            ModelUnavailableError: The circuit is open
+            ModelCallError: Transient failures outlasted the attempts or the deadline
+            Exception: Any non-transient error from fn
+        """
+        deadline = time.monotonic() + self.deadline
+        for attempt in range(1, self.attempts + 1):
+            self.breaker.before_call()
+            start = time.monotonic()
+            try:
+                result = self._attempt(fn, args, kwargs, deadline)
+            except Exception as error:
+                if not is_transient(error):
+                    # The model answered (e.g. a bad request), so it is not down
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                last_error = error
+                delay = self.backoff(attempt)
+                if attempt == self.attempts or time.monotonic() + delay >= deadline or self.breaker.state == "open":
+                    break
+                print(f"Warning: {self.name} call failed ({type(error).__name__}: {error}), "
+                      f"retrying in {delay:.2f}s ({attempt}/{self.attempts - 1})")
+                record_retry(self._operation)
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            self.latencies.add(time.monotonic() - start)
+            return result
+
+        if self.breaker.state == "open":
+            raise ModelUnavailableError(
+                self.name,
+                f"The {self.name} is unavailable after repeated failures ({type(last_error).__name__}: {last_error})",
+                retry_after=max(1, round(self.breaker.retry_after())),
+            ) from last_error
+        raise ModelCallError(
+            self.name,
+            f"The {self.name} failed after {attempt} attempt(s) ({type(last_error).__name__}: {last_error})",
+        ) from last_error
+
+    def _attempt(self, fn, args, kwargs, deadline):
+        threshold = self.latencies.quantile(MODEL_HEDGE_QUANTILE) if self.hedge else None
+        if threshold is None:
+            return fn(*args, **kwargs)
+
+        # Attempts run in a copy of the caller's context so traces and LLM call scopes carry over
+        pool = hedge_pool()
+        primary = pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+        done, _ = wait([primary], timeout=threshold)
+        if done:
+            return primary.result()
+
+        self.hedged += 1
+        HEDGES.inc(operation=self._operation)
+        hedge = pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                raise TimeoutError(f"{self.name} call exceeded its {self.deadline:g}s deadline")
+            for future in done:
+                if future.exception() is None:
+                    self.hedge_wins += future is hedge
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def stats(self):
+        threshold = self.latencies.quantile(MODEL_HEDGE_QUANTILE)
+        return {
+            "breaker": self.breaker.stats(),
+            "hedging": self.hedge,
+            "hedge_threshold_ms": round(threshold * 1000, 1) if threshold is not None else None,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+        }
+
+
+_callers = {}
+_callers_lock = threading.Lock()
+
+
+def get_model_caller(kind):
+    """Shared caller for "vision" (satellite) calls or "text" (agent task) runs"""
+    with _callers_lock:
+        if kind not in _callers:
+            if kind == "vision":
+                _callers[kind] = ModelCaller("vision model")
+            else:
+                # A retry re-runs the whole task, whose LLM calls take quota through the agents'
+                # rate limiter as usual; a task must not run twice at once, so it is never hedged
+                _callers[kind] = ModelCaller("agent LLM", deadline=MODEL_TASK_DEADLINE, hedge=False)
+        return _callers[kind]
+
+
+def model_call_stats():
+    """Breaker and hedging state per model kind that has been called"""
+    with _callers_lock:
+        callers = dict(_callers)
+    return {kind: caller.stats() for kind, caller in callers.items()}
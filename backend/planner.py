@@ -0,0 +1,91 @@
+"""
+Bulk Response Planner for PostDisaster System
+Vectorized resource and dispatch figures for many cities and what-if scenarios at once
+"""
+
+import os
+
+import numpy as np
+
+from city_data import FOOD_PER_PERSON, HURT_PER_UNIT, get_city_dataset
+
+# Largest scenarios x cities grid accepted in one call
+PLAN_MAX_CELLS = int(os.getenv("PLAN_MAX_CELLS", "1000000"))
+
+# Largest count whose figures still sum over a full grid without overflowing int64
+_MAX_COUNT = np.iinfo(np.int64).max // (max(FOOD_PER_PERSON.values()) * PLAN_MAX_CELLS)
+
+
+def _counts(values, label):
+    """Non-negative whole counts as an int64 array (fractions are rounded down)"""
+    array = np.asarray(values, dtype=np.float64)
+    if not np.all(np.isfinite(array)) or np.any(array < 0):
+        raise ValueError(f"{label} must be non-negative numbers")
+    if np.any(array > _MAX_COUNT):
+        raise ValueError(f"{label} must be at most {_MAX_COUNT}")
+    return np.floor(array).astype(np.int64)
+
+
+def plan(populations, hurt):
+    """
+    Resource and dispatch figures for arrays of populations and casualties
+
+    Uses the same formulas as the `resourcing` and `helping` agent tools.
+    The two inputs are broadcast against each other, so a (cities,)
+    population vector combines with a (scenarios, cities) casualty grid.
+
+    Args:
+        populations: Array-like of people per city
+        hurt: Array-like of injured people per city (or per scenario and city)
+
+    Returns:
+        dict: apples/bananas/oranges and helicopters/police/special_forces arrays
+    """
+    populations = _counts(populations, "populations")
+    hurt = _counts(hurt, "hurt")
+    populations, hurt = np.broadcast_arrays(populations, hurt)
+    if hurt.size > PLAN_MAX_CELLS:
+        raise ValueError(f"Plan too large: {hurt.size} cells, the limit is {PLAN_MAX_CELLS}")
+
+    figures = {food: populations * amount for food, amount in FOOD_PER_PERSON.items()}
+    figures.update({unit: hurt // per_unit for unit, per_unit in HURT_PER_UNIT.items()})
+    return figures
+
+
+def plan_cities(city_names, hurt=None, populations=None, totals_only=False):
+    """
+    Plan for named cities, filling in unspecified inputs from the parsed document
+
+    Args:
+        city_names (list): City names (e.g. "Baytown City")
+        hurt: Optional casualty estimates, (cities,) or (scenarios, cities)
+        populations: Optional populations, (cities,) or (scenarios, cities)
+        totals_only (bool): Leave out the per-city figures
+
+    Returns:
+        dict: JSON-ready plan with per-city figures and regional totals
+    """
+    dataset = get_city_dataset()
+    records = [dataset.get(name) for name in city_names]
+    missing = [name for name, record in zip(city_names, records) if record is None]
+    if missing and (hurt is None or populations is None):
+        raise ValueError(f"No records for {', '.join(missing)} in the city document")
+
+    if populations is None:
+        populations = [record.population for record in records]
+    if hurt is None:
+        hurt = [record.hurt for record in records]
+    if np.shape(populations)[-1:] != (len(city_names),) or np.shape(hurt)[-1:] != (len(city_names),):
+        raise ValueError(f"populations and hurt must have one value per city ({len(city_names)})")
+
+    figures = plan(populations, hurt)
+    scenarios = figures["apples"].shape[0] if figures["apples"].ndim > 1 else None
+
+    result = {
+        "cities": list(city_names),
+        "scenarios": scenarios,
+        "totals": {name: values.sum(axis=-1).tolist() for name, values in figures.items()},
+    }
+    if not totals_only:
+        result["per_city"] = {name: values.tolist() for name, values in figures.items()}
+    return result
@@ -5,29 +5,61 @@ AI-powered disaster response analysis using CrewAI
 
 import os
 import json
+import time
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dotenv import load_dotenv
-import requests
-from crewai import Agent, Task, Crew, LLM
+from crewai import Agent, Task, Crew
 from crewai.tools import tool
-from crewai_tools import DOCXSearchTool
-from langchain_openai import ChatOpenAI
-from langchain.chat_models import ChatLiteLLM
-from crewai.knowledge.source.string_knowledge_source import StringKnowledgeSource
-import pathlib
-import pyttsx3
+
+from cities import city_map
+from city_registry import get_city_registry
+from city_data import dispatch_figures, get_city_dataset, resource_figures
+from embedding_index import get_shard_index
+from llm_providers import get_provider
+from model_calls import get_model_caller
+from rate_limit import QuotaWait, get_llm_rate_limiter, quota_wait
+from resources import get_registry
+from result_cache import analysis_cache_key, get_result_cache
+from telemetry import register_llm_events, span, task_span
+from tts import audio_bulletins
 
 # Load environment variables
 load_dotenv()
 
-# City mapping
-city_map = {
-    1: "Seabrook City",
-    2: "Highland Park City",
-    3: "Baytown City",
-    4: "Ridgeview City",
-    5: "Shoreline City"
+# Count LLM calls and tokens per agent for /metrics
+register_llm_events()
+
+# Bump when agent or task prompts change so cached analyses are not reused
+PROMPT_VERSION = 3
+
+# Report name for each analyst task, in crew task order (after the data collector)
+AGENT_OUTPUT_NAMES = [
+    'Needs Analyst Agent',
+    'Help Dispatcher Agent',
+    'Resource Allocator Agent',
+    'Damage Analyser',
+]
+
+# City facts each analyst needs (keys of the parsed city record, see CityDataset.brief);
+# with context compaction an analyst is sent only these instead of everything collected
+AGENT_CONTEXT_FIELDS = {
+    'Needs Analyst Agent': ("name", "city", "disaster", "population", "needs"),
+    'Help Dispatcher Agent': ("name", "city", "disaster", "hurt", "casualties", "stuck", "trapped", "dispatch"),
+    'Resource Allocator Agent': ("name", "city", "population", "resources_needed"),
+    'Damage Analyser': ("name", "city", "disaster", "damaged_infrastructure"),
 }
 
+# Crew execution settings
+CREW_EXECUTION_MODE = os.getenv("CREW_EXECUTION_MODE", "parallel")  # "parallel" or "sequential"
+CREW_TASK_TIMEOUT = float(os.getenv("CREW_TASK_TIMEOUT", "120"))  # seconds per analyst task
+CREW_MAX_PARALLEL = int(os.getenv("CREW_MAX_PARALLEL", "8"))  # analyst tasks running at once
+CREW_CITY_DATA = os.getenv("CREW_CITY_DATA", "dataset")  # "dataset" (parsed records) or "rag" (data collector agent)
+CREW_CONTEXT_COMPACTION = os.getenv("CREW_CONTEXT_COMPACTION", "1") == "1"  # per-analyst context instead of all facts
+
+# Bounded pool shared by all requests for the analyst fan-out
+_analyst_pool = ThreadPoolExecutor(max_workers=CREW_MAX_PARALLEL, thread_name_prefix="analyst")
+
 # Tool functions
 @tool
 def resourcing(number: int) -> str:
@@ -40,7 +72,8 @@ def resourcing(number: int) -> str:
     Returns:
         str: A string describing the required quantities of apples, bananas, and oranges.
     """
-    return f"{number * 3} apples, {number * 2} bananas, and {number} oranges are needed for {number} people."
+    food = resource_figures(number)
+    return f"{food['apples']} apples, {food['bananas']} bananas, and {food['oranges']} oranges are needed for {number} people."
 
 @tool
 def helping(number: int) -> str:
@@ -54,57 +87,51 @@ def helping(number: int) -> str:
         str: A detailed message indicating the resources allocated, 
              including helicopters, police personnel, and special forces units.
     """
-    return f"{number//100} helicopters dispatched, {number//50} police dispatched and {number//200} special forces"
+    units = dispatch_figures(number)
+    return f"{units['helicopters']} helicopters dispatched, {units['police']} police dispatched and {units['special_forces']} special forces"
+
+def city_document_search(city_id):
+    """Document search tool bound to one city's shard, for that city's data collector"""
+    @tool("search_city_documents")
+    def search_city_documents(query: str) -> str:
+        """
+        Searches the selected city's disaster documents for passages relevant to the query.
+
+        Args:
+            query (str): What to look for, e.g. "population and casualties".
+
+        Returns:
+            str: The most relevant passages from the city's documents.
+        """
+        with span("docx_retrieval"):
+            hits = get_shard_index().search(city_id, query)
+        return "\n\n".join(chunk for _, chunk in hits)
 
-def run_disaster_analysis(selected_city_id: int):
+    return search_city_documents
+
+def create_llm():
+    """Create the shared LLM client used by all agents (provider set by LLM_PROVIDER)"""
+    return get_provider("text").text_llm()
+
+def build_crew(Analysed_Site, llm, tool=None):
     """
-    Run the complete disaster analysis for a selected city
-    
+    Create the five agents and their tasks for one city
+
     Args:
-        selected_city_id (int): City ID (1-5) from the city_map
-        
+        Analysed_Site (str): City name from the city_map
+        llm (LLM): LLM client shared by the agents
+        tool: Document search tool for the data collector (defaults to the city's shard)
+
     Returns:
-        dict: Analysis results from all agents
+        Crew: Crew ready for kickoff
     """
-    
-    print(f"Starting disaster analysis for: {city_map[selected_city_id]}")
-    
-    # Initialize LLM
-    llm = LLM(
-        model='gemini/gemini-2.0-flash',  
-        temperature=0.5,
-        api_key=os.getenv("GOOGLE_API_KEY"),  
-    )
-
-    # Initialize DOCXSearchTool
-    tool = DOCXSearchTool(
-        config=dict(
-            llm=dict(
-                provider="google",
-                config=dict(
-                    model='gemini/gemini-2.0-flash',
-                    temperature=0.5,
-                ),
-            ),
-            embedder=dict(
-                provider="google",
-                config=dict(
-                    model="models/text-embedding-004",
-                    task_type="retrieval_document",
-                    title="Embeddings"
-                ),
-            ),
-        )
-    )
+    tool = tool or city_document_search(get_city_registry().lookup(Analysed_Site))
 
-    # Use the city selected from satellite analysis
-    Analysed_Site = city_map[selected_city_id]
-    print(f"Analyzing disaster response for: {Analysed_Site}")
-
-    # Create Agents
+    # Create Agents (roles, goals and backstories do not mention the city, so the
+    # system prompt is the same prefix on every run and providers can cache it)
     data_collector = Agent(
         role="Document Searcher",
-        goal=f'Collect All the data available about {Analysed_Site} city in DOCX files. For example(just for reference, read through document for actual data)',
+        goal="Collect all the data available about the city from the disaster documents",
         backstory="You're a proactive data collector agent who collects all the data available about the city in DOCX files. You will use the tool provided to search through documents and gather relevant information.",
         llm=llm,
         verbose=True,
@@ -113,7 +140,7 @@ def run_disaster_analysis(selected_city_id: int):
 
     needs_analyst = Agent(
         role="Needs Analyser",
-        goal=f"Based on the information available from data_collector agent, generate a professional grade News report for only {Analysed_Site} city about TOTAL POPULATION and Essential Needs for the city people",
+        goal="Report the total population and essential needs of the city's people",
         backstory="You're a News reporter and analyst who finds out the needs of population",
         llm=llm,
         verbose=True
@@ -121,7 +148,7 @@ def run_disaster_analysis(selected_city_id: int):
 
     help_dispatcher = Agent(
         role="Aid Dispatcher",
-        goal=f"Based on that Number of People Hurt, Number of People Stuck and where they are stuck from the information gathered by data_collector about the city, generate a professional grade News report for only {Analysed_Site} city about number of helicopters dispatched, police dispatched, special forces dispatched using the tool you are provided with.",
+        goal="Report the helicopters, police and special forces dispatched for the people hurt and stuck",
         backstory="You're a proactive News report generator agent who provides the numbers of the help that is dispatched effectively to meet the needs of the number of people hurt due to disaster.",
         llm=llm,
         verbose=True,
@@ -130,7 +157,7 @@ def run_disaster_analysis(selected_city_id: int):
 
     resource_allocator = Agent(
         role="Resources Allocator",
-        goal=f"Based on that Number of Population in the input city information provided by data_collector for the city, generate a professional grade News report for only {Analysed_Site} city what is the population of city and use given tool to estimate amount of foods needed returned by the tool you are provided with",
+        goal="Report the city's population and the food needed for it",
         backstory="You're a proactive News report generator agent who generates information about resources that needs to be dispatched effectively to meet the needs of the population.",
         llm=llm,
         verbose=True,
@@ -139,14 +166,12 @@ def run_disaster_analysis(selected_city_id: int):
 
     damage_analyser = Agent(
         role="Damage Analyser",
-        goal=f"Based on the Damaged Infrastructure information collected by data_collector, generate report for only {Analysed_Site} city of the Damaged Infrastructure in the disaster-affected area for the input city and identify critical zones requiring immediate attention.",
+        goal="Report damaged infrastructure and the critical zones requiring immediate attention",
         backstory="You're a proactive News report generator agent who generates information about disaster impacts to provide Infrastructure damage.",
         llm=llm,
         verbose=True
     )
 
-    print("Agents created successfully!")
-
     # Create Tasks
     dataCollect_task = Task(
         description=f'Collect All the data available about {Analysed_Site} city in DOCX files. For example(just for reference, read through document for actual data), you will find docx file in "Cities.docx"',
@@ -182,78 +207,345 @@ def run_disaster_analysis(selected_city_id: int):
         context=[dataCollect_task]
     )
 
-    # Create and run Crew
-    crew = Crew(
-        agents=[data_collector, needs_analyst, help_dispatcher, resource_allocator, damage_analyser],
+    # Every agent of every crew draws from the same LLM quota (see LLM_RATE_LIMIT_RPM)
+    agents = [data_collector, needs_analyst, help_dispatcher, resource_allocator, damage_analyser]
+    limiter = get_llm_rate_limiter()
+    for agent in agents:
+        if limiter is not None:
+            agent.set_rpm_controller(limiter)
+        # A failed task is re-run only for transient model errors, by the agent LLM's model caller
+        agent.max_retry_limit = 0
+
+    # Create Crew
+    return Crew(
+        agents=agents,
         tasks=[dataCollect_task, needs_task, dispatch_task, resource_allocation_task, damageAnalysis_task],
         verbose=True
     )
-    
-    print("Tasks and crew set up successfully!")
-    print("Starting CrewAI execution...")
 
-    # Execute the crew
-    result = crew.kickoff()
-    
-    # Process results
-    agent_outputs = {}
-    for i, task_output in enumerate(result.tasks_output):
-        agent_outputs[f"Agent{i}"] = task_output.raw
+def attach_output_callbacks(crew, on_output):
+    """
+    Set CrewAI task callbacks that report each analyst's output as soon as its task completes
+
+    Args:
+        crew (Crew): Checked-out crew
+        on_output: Function (agent name, report text), or None to clear the callbacks
+    """
+    for name, task in zip(AGENT_OUTPUT_NAMES, crew.tasks[1:]):
+        task.callback = (lambda output, name=name: on_output(name, output.raw)) if on_output else None
+
+def execute_task(task, name, context=None):
+    """Run one task on its own, traced as 'task:<name>', re-running it on transient agent LLM errors"""
+    with task_span(task, name):
+        return get_model_caller("text").call(task.execute_sync, context=context)
+
+def compact_context(collected, name):
+    """
+    Project the collected city facts onto the fields one analyst needs
+
+    Top-level keys of a JSON object (optionally in a ```json fence) are kept
+    when they contain a word of one of the analyst's AGENT_CONTEXT_FIELDS,
+    so free-form collector keys like "city_name" or "infrastructure_damage"
+    still match. Anything that is not a JSON object, or has none of the
+    fields, is returned unchanged.
+
+    Args:
+        collected (str): Data collector output or CityDataset.brief JSON
+        name (str): Analyst name from AGENT_OUTPUT_NAMES
+
+    Returns:
+        str: Compact JSON with only the analyst's fields, or `collected`
+    """
+    text = collected.strip().removeprefix("```json").removeprefix("```").removesuffix("```")
+    try:
+        facts = json.loads(text)
+    except ValueError:
+        return collected
+    if not isinstance(facts, dict):
+        return collected
+
+    words = {word for field in AGENT_CONTEXT_FIELDS[name] for word in field.split("_")}
+    kept = {key: value for key, value in facts.items() if any(word in key.lower() for word in words)}
+    return json.dumps(kept, separators=(",", ":")) if kept else collected
+
+def analyst_contexts(collected):
+    """Context per analyst name: compacted when CREW_CONTEXT_COMPACTION is on, else everything collected"""
+    return {
+        name: compact_context(collected, name) if CREW_CONTEXT_COMPACTION else collected
+        for name in AGENT_OUTPUT_NAMES
+    }
 
-    # Remove data collector output and rename agents
-    agent_outputs.pop("Agent0", None)  # Remove the data collector's output if not needed
+def run_crew_sequential(crew, contexts=None):
+    """
+    Run all tasks one after another with crew.kickoff()
+
+    Args:
+        crew (Crew): Checked-out crew
+        contexts (dict): City facts per analyst name, used instead of running the data collector
+
+    Returns:
+        dict: Analyst reports keyed by AGENT_OUTPUT_NAMES
+    """
+    if contexts is not None:
+        return {
+            name: execute_task(task, name, context=contexts[name]).raw
+            for name, task in zip(AGENT_OUTPUT_NAMES, crew.tasks[1:])
+        }
+
+    if CREW_CONTEXT_COMPACTION:
+        collected = execute_task(crew.tasks[0], "Data Collector").raw
+        return run_crew_sequential(crew, contexts=analyst_contexts(collected))
+
+    # Without compaction every analyst gets the full collector output through kickoff
+    with span("crew_kickoff"):
+        result = get_model_caller("text").call(crew.kickoff)
+
+    # Drop the data collector's output and name the analyst reports
+    analyst_outputs = [task_output.raw for task_output in result.tasks_output[1:]]
+    return dict(zip(AGENT_OUTPUT_NAMES, analyst_outputs))
+
+class TaskClock(QuotaWait):
+    """Running time of one analyst task, leaving out the time it waited for LLM quota"""
+
+    def __init__(self):
+        super().__init__()
+        self.started = None
+
+    def deadline(self, timeout, now):
+        """When the task times out, or None while it is still queued for the pool"""
+        if self.started is None:
+            return None
+        return self.started + self.total(now) + timeout
+
+def run_clocked(clock, task, name, context):
+    """Run an analyst task on the pool, starting its clock and counting its quota waits"""
+    clock.started = time.monotonic()
+    quota_wait.set(clock)
+    return execute_task(task, name, context)
+
+def run_crew_parallel(crew, task_timeout=CREW_TASK_TIMEOUT, contexts=None):
+    """
+    Run the data collector once, then fan the analyst tasks out concurrently
+
+    All analyst tasks depend only on the data collector, so they receive its
+    output (compacted per analyst, see analyst_contexts) as context and run
+    on the shared bounded pool. A task that fails or runs longer than
+    `task_timeout` is left out of the result instead of failing the whole
+    analysis; if every task fails, the first error is raised. The timeout
+    counts from when the task starts on the pool and leaves out the time it
+    waits for LLM quota, so a busy pool or rate limiter does not time it out.
+
+    Args:
+        crew (Crew): Checked-out crew
+        task_timeout (float): Seconds each analyst task may run
+        contexts (dict): City facts per analyst name, used instead of running the data collector
+
+    Returns:
+        dict: Analyst reports keyed by AGENT_OUTPUT_NAMES (completed tasks only)
+    """
+    collect_task, *analyst_tasks = crew.tasks
+    if contexts is None:
+        contexts = analyst_contexts(execute_task(collect_task, "Data Collector").raw)
+
+    # Each task runs in a copy of this context so its spans join the request's trace
+    clocks = {}
+    names = {}
+    for name, task in zip(AGENT_OUTPUT_NAMES, analyst_tasks):
+        clock = TaskClock()
+        future = _analyst_pool.submit(contextvars.copy_context().run, run_clocked, clock, task, name, contexts[name])
+        clocks[future] = clock
+        names[future] = name
+
+    results = {}
+    errors = []
+    pending = set(names)
+    while pending:
+        now = time.monotonic()
+        deadlines = {}
+        for future in list(pending):
+            deadline = clocks[future].deadline(task_timeout, now)
+            if deadline is not None and deadline <= now and not future.done():
+                pending.discard(future)
+                future.cancel()
+                print(f"Warning: {names[future]} timed out after {task_timeout}s, returning partial results")
+            elif deadline is not None:
+                deadlines[future] = deadline
+        if not pending:
+            break
+
+        # Wake for the first result or the nearest deadline; queued tasks are checked again after task_timeout
+        timeout = min([deadline - now for deadline in deadlines.values()] + [task_timeout])
+        done, _ = wait(pending, timeout=max(timeout, 0), return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.discard(future)
+            try:
+                results[names[future]] = future.result().raw
+            except Exception as e:
+                errors.append(e)
+                print(f"Warning: {names[future]} failed ({e}), returning partial results")
+
+    if not results and errors:
+        # Nothing to return (e.g. the LLM circuit is open): report why instead of an empty analysis
+        raise errors[0]
+
+    # Keep the usual report order
+    return {name: results[name] for name in AGENT_OUTPUT_NAMES if name in results}
+
+def run_disaster_analysis(selected_city_id: int, mode=None, on_output=None):
+    """
+    Run the complete disaster analysis for a selected city
     
-    # Rename agents for better readability
-    final_outputs = {}
-    if "Agent1" in agent_outputs:
-        final_outputs['Needs Analyst Agent'] = agent_outputs['Agent1']
-    if "Agent2" in agent_outputs:
-        final_outputs['Help Dispatcher Agent'] = agent_outputs['Agent2']
-    if "Agent3" in agent_outputs:
-        final_outputs['Resource Allocator Agent'] = agent_outputs['Agent3']
-    if "Agent4" in agent_outputs:
-        final_outputs['Damage Analyser'] = agent_outputs['Agent4']
+    Args:
+        selected_city_id (int): City ID (1-5) from the city_map
+        mode (str): "parallel" or "sequential" (defaults to CREW_EXECUTION_MODE)
+        on_output: Optional function (agent name, report text) called as each analyst finishes
+        
+    Returns:
+        dict: Analysis results from all agents
+    """
+    mode = mode or CREW_EXECUTION_MODE
+    print(f"Starting disaster analysis for: {city_map[selected_city_id]}")
+
+    # With the parsed city records the analysts only word the facts, so the
+    # data collector's LLM round trip is skipped
+    contexts = None
+    if CREW_CITY_DATA == "dataset":
+        with span("city_data"):
+            collected = get_city_dataset().brief(city_map[selected_city_id])
+        if collected is None:
+            print(f"Warning: no parsed record for {city_map[selected_city_id]}, using the data collector agent")
+        else:
+            contexts = analyst_contexts(collected)
+
+    # Check out a warm crew for this city and execute it
+    with get_registry().bind_city(selected_city_id) as crew:
+        print(f"Starting CrewAI execution ({mode})...")
+        attach_output_callbacks(crew, on_output)
+        try:
+            with span("crew", mode=mode):
+                if mode == "parallel":
+                    final_outputs = run_crew_parallel(crew, contexts=contexts)
+                    if len(final_outputs) < len(AGENT_OUTPUT_NAMES):
+                        # Timed-out tasks may still be running on this crew's agents
+                        get_registry().discard(crew)
+                elif mode == "sequential":
+                    final_outputs = run_crew_sequential(crew, contexts=contexts)
+                else:
+                    raise ValueError(f"Unknown crew execution mode '{mode}'")
+        finally:
+            attach_output_callbacks(crew, None)
 
     print("CrewAI analysis completed successfully!")
     return final_outputs
 
-def analyze_city_from_image_and_run_crew(image_path=None):
+def city_figures(selected_city_id: int):
+    """
+    Dispatch and resource figures for a city straight from the parsed records (no LLM)
+
+    Args:
+        selected_city_id (int): City ID (1-5) from the city_map
+
+    Returns:
+        dict: Figures, or None if the document has no record for the city
+    """
+    return get_city_dataset().figures(city_map[selected_city_id])
+
+def run_disaster_analysis_cached(selected_city_id: int, on_output=None):
+    """
+    run_disaster_analysis behind the shared result cache
+
+    Identical requests within the cache TTL reuse the stored reports, and
+    concurrent misses for the same city share one crew run. Partial results
+    (a timed-out or failed analyst) are returned but not cached.
+
+    Args:
+        selected_city_id (int): City ID (1-5) from the city_map
+        on_output: Optional function (agent name, report text); on a cache hit
+            or a shared run it is called for every report once they are available
+
+    Returns:
+        dict: Analysis results from all agents
+    """
+    config = {
+        **get_provider("text").config("text"),
+        "prompt_version": PROMPT_VERSION,
+        "mode": CREW_EXECUTION_MODE,
+        "city_data": CREW_CITY_DATA,
+        "context_compaction": CREW_CONTEXT_COMPACTION,
+    }
+    emitted = set()
+
+    def report(name, text):
+        emitted.add(name)
+        on_output(name, text)
+
+    final_outputs = get_result_cache().get_or_compute(
+        analysis_cache_key(selected_city_id, config),
+        lambda: run_disaster_analysis(selected_city_id, on_output=report if on_output else None),
+        should_cache=lambda outputs: len(outputs) == len(AGENT_OUTPUT_NAMES),
+    )
+
+    if on_output:
+        for name, text in final_outputs.items():
+            if name not in emitted:
+                report(name, text)
+    return final_outputs
+
+def analyze_city_from_image_and_run_crew(image_path=None, filename=None, size=None, on_event=None):
     """
     Complete workflow: Analyze image -> Get city -> Run CrewAI analysis
 
     Args:
-        image_path (str): Path to city image (optional, uses default if None)
+        image_path: Path to city image or an open binary file (optional, uses default if None)
+        filename (str): Original file name when image_path is a file object
+        size (int): Upload size in bytes
+        on_event: Optional function (event, data) called with the "satellite"
+            result first, then an "agent" event per analyst report
 
     Returns:
         dict: Complete analysis results
+
+    Raises:
+        CityNotDetectedError: The image does not show a supported city
+        ModelCallError: The vision model or agent LLM keeps failing
     """
-    from satellite import analyze_city_image
+    from satellite import CityNotDetectedError, analyze_city_image
 
     # Step 1: Analyze satellite image
     print("Step 1: Analyzing satellite image...")
-    detected_city_number = analyze_city_image(image_path)
+    with span("satellite"):
+        detected_city_number = analyze_city_image(image_path, filename=filename, size=size)
 
-    if detected_city_number:
-        print(f"Satellite analysis detected: {city_map[detected_city_number]} (City #{detected_city_number})")
-        selected_city_id = detected_city_number
-    else:
-        print("Satellite analysis failed, falling back to default city (Seabrook City)")
-        selected_city_id = 1  # Fallback to Seabrook City
+    if not detected_city_number:
+        # Analysing some other city would send aid to the wrong place
+        raise CityNotDetectedError()
+    print(f"Satellite analysis detected: {city_map[detected_city_number]} (City #{detected_city_number})")
+    selected_city_id = detected_city_number
 
     print(f"Selected city for analysis: {city_map[selected_city_id]}")
+    satellite_analysis = {
+        "detected_city_id": selected_city_id,
+        "detected_city_name": city_map[selected_city_id],
+        "image_path": image_path if isinstance(image_path, str) else filename
+    }
+
+    on_output = None
+    if on_event:
+        on_event("satellite", satellite_analysis)
+        figures = city_figures(selected_city_id)
+        if figures:
+            on_event("figures", figures)
+        on_output = lambda name, text: on_event("agent", {"agent": name, "output": text})
 
     # Step 2: Run CrewAI analysis
     print("\nStep 2: Running CrewAI disaster analysis...")
-    crew_results = run_disaster_analysis(selected_city_id)
+    crew_results = run_disaster_analysis_cached(selected_city_id, on_output=on_output)
 
-    # Step 3: Combine results
+    # Step 3: Queue the spoken bulletins (rendered in the background) and combine results
     complete_results = {
-        "satellite_analysis": {
-            "detected_city_id": selected_city_id,
-            "detected_city_name": city_map[selected_city_id],
-            "image_path": image_path
-        },
+        "satellite_analysis": satellite_analysis,
         "disaster_analysis": crew_results,
+        "audio_bulletins": audio_bulletins(city_map[selected_city_id], crew_results),
         "status": "success"
     }
 
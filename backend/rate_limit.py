@@ -0,0 +1,126 @@
+"""
+LLM Rate Limiting for PostDisaster System
+Process-wide token bucket in front of every agent LLM call, sized to the provider quota
+"""
+
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Agent LLM requests per minute for this process (0: unlimited). With several
+# API workers each one gets this budget, so divide the provider quota between them
+LLM_RATE_LIMIT_RPM = float(os.getenv("LLM_RATE_LIMIT_RPM", "0"))
+# Requests that may be sent back to back after an idle period
+LLM_RATE_LIMIT_BURST = int(os.getenv("LLM_RATE_LIMIT_BURST", str(max(1, int(LLM_RATE_LIMIT_RPM // 10)))))
+
+# Priority of the current analysis: lower values get quota first (the sweep passes each city's rank, 0 = most casualties)
+request_priority = contextvars.ContextVar("llm_request_priority", default=0)
+
+
+class QuotaWait:
+    """Time one task has spent blocked on the rate limiter, so its deadline can leave it out"""
+
+    def __init__(self):
+        self.waited = 0.0
+        self.waiting_since = None
+
+    def total(self, now=None):
+        """Seconds waited so far, including a wait still in progress"""
+        # Read the open wait first: if it ends meanwhile it is counted twice (never missed)
+        since = self.waiting_since
+        waited = self.waited
+        if since is None:
+            return waited
+        return waited + (now if now is not None else time.monotonic()) - since
+
+
+# Quota wait counter of the current task, if one is kept (see run_crew_parallel)
+quota_wait = contextvars.ContextVar("llm_quota_wait", default=None)
+
+
+class TokenBucket:
+    """
+    Token bucket that serves waiting callers in priority order
+
+    Holds up to `burst` tokens and refills at `rate_per_minute`. A caller
+    takes one token per request and blocks until one is available; when
+    several callers wait, the lowest priority value (then the earliest
+    caller) goes first, so urgent work is not starved by a large backlog.
+    """
+
+    def __init__(self, rate_per_minute, burst=1):
+        self.rate = rate_per_minute / 60
+        self.capacity = max(1, burst)
+        self.granted = 0
+        self.waited_seconds = 0.0
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, priority=0):
+        """Block until a token is available for this caller, then take it"""
+        start = time.monotonic()
+        counter = quota_wait.get()
+        if counter is not None:
+            counter.waiting_since = start
+        with self._condition:
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._waiters, ticket)
+            while True:
+                self._refill()
+                if self._waiters[0] == ticket and self._tokens >= 1:
+                    heapq.heappop(self._waiters)
+                    self._tokens -= 1
+                    break
+                if self._waiters[0] == ticket:
+                    # Next in line: sleep until the next token is due
+                    self._condition.wait(timeout=(1 - self._tokens) / self.rate)
+                else:
+                    # Woken when a caller ahead of us takes its token
+                    self._condition.wait()
+            self.granted += 1
+            waited = time.monotonic() - start
+            self.waited_seconds += waited
+            if counter is not None:
+                counter.waited += waited
+                counter.waiting_since = None
+            self._condition.notify_all()
+
+    def check_or_wait(self):
+        """CrewAI RPM controller interface, called by agents before every LLM request"""
+        self.acquire(request_priority.get())
+        return True
+
+    def stats(self):
+        with self._condition:
+            self._refill()
+            return {
+                "rate_per_minute": round(self.rate * 60, 2),
+                "burst": self.capacity,
+                "granted": self.granted,
+                "waiting": len(self._waiters),
+                "waited_seconds": round(self.waited_seconds, 3),
+                "tokens": round(self._tokens, 2),
+            }
+
+
+_limiter = TokenBucket(LLM_RATE_LIMIT_RPM, LLM_RATE_LIMIT_BURST) if LLM_RATE_LIMIT_RPM > 0 else None
+
+
+def get_llm_rate_limiter():
+    """Shared limiter for agent LLM calls, or None when LLM_RATE_LIMIT_RPM is not set"""
+    return _limiter
@@ -0,0 +1,183 @@
+"""
+Resource Registry for PostDisaster System
+Process-wide warm pool of LLM clients, tools and per-city crew templates
+"""
+
+import os
+import statistics
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+# How the API process warms up: "background" (serve light endpoints at once,
+# build the agent stack on a thread), "blocking" (finish warm-up before
+# serving) or "lazy" (build on the first request that needs it)
+WARMUP_MODE = os.getenv("WARMUP_MODE", "background")
+
+# Cities whose crews are prebuilt at startup (in catalogue order) and cities
+# whose idle crews are kept; with large catalogues the rest are built on demand
+CREW_PREWARM_CITIES = int(os.getenv("CREW_PREWARM_CITIES", "5"))
+CREW_POOL_MAX_CITIES = int(os.getenv("CREW_POOL_MAX_CITIES", "64"))
+
+
+class ResourceRegistry:
+    """
+    Holds the expensive, reusable objects of the pipeline
+
+    Created once per process (at FastAPI startup). The LLM client, the vision
+    model and the document index are shared by every request. Crews are kept
+    in a per-city pool: a request checks one out, and only builds a new crew
+    (on the shared LLM) when every pooled crew for that city is busy. The
+    pool keeps crews for the `max_cities` most recently used cities.
+    """
+
+    def __init__(self, max_idle_per_city=4, max_cities=CREW_POOL_MAX_CITIES):
+        self.max_idle_per_city = max_idle_per_city
+        self.max_cities = max_cities
+        self.llm = None
+        self.vision_model = None
+        self.document_index = None
+        self.city_dataset = None
+        self.started = False
+        self.warming = False
+        self.warmup_error = None
+        self.timings = {}
+        self._idle_crews = OrderedDict()
+        self._bind_times = deque(maxlen=1000)
+        self._discarded = set()
+        self._lock = threading.Lock()
+
+    def _timed(self, name, factory):
+        start = time.perf_counter()
+        value = factory()
+        self.timings[name] = round((time.perf_counter() - start) * 1000, 2)
+        return value
+
+    def startup(self):
+        """Import the agent stack, create all shared resources and prebuild crews for the first CREW_PREWARM_CITIES cities"""
+        with self._lock:
+            if self.started:
+                return self
+
+            total_start = time.perf_counter()
+            # The heavy modules are first imported here, not when the API module loads
+            from city_data import get_city_dataset
+            from embedding_index import get_shard_index
+            from postdisaster_system import city_map, create_llm
+            from satellite import create_vision_model
+            self.timings["imports"] = round((time.perf_counter() - total_start) * 1000, 2)
+
+            self.llm = self._timed("llm", create_llm)
+            self.vision_model = self._timed("vision_model", create_vision_model)
+            self.document_index = self._timed("document_index", get_shard_index)
+            self.city_dataset = self._timed("city_dataset", get_city_dataset)
+            for city_id, city_name in list(city_map.items())[:min(CREW_PREWARM_CITIES, self.max_cities)]:
+                self._idle_crews[city_id] = [self._timed(f"crew:{city_name}", lambda: self._build_crew(city_id))]
+            self.timings["total"] = round((time.perf_counter() - total_start) * 1000, 2)
+            self.started = True
+
+        return self
+
+    def start_background(self):
+        """Run startup() on a daemon thread so the process can serve light endpoints meanwhile"""
+        if self.started or self.warming:
+            return
+
+        def warm():
+            try:
+                self.startup()
+                print(f"Warm-up finished, resource timings (ms): {self.timings}")
+            except Exception as e:
+                self.warmup_error = str(e)
+                print(f"Warm-up failed: {e}")
+            finally:
+                self.warming = False
+
+        self.warming = True
+        self.warmup_error = None
+        threading.Thread(target=warm, name="warmup", daemon=True).start()
+
+    def readiness(self):
+        """Whether warm-up is done (in lazy mode the process counts as ready straight away)"""
+        return {
+            "ready": self.started or (WARMUP_MODE == "lazy" and self.warmup_error is None),
+            "warm": self.started,
+            "warming": self.warming,
+            "mode": WARMUP_MODE,
+            "error": self.warmup_error,
+            "startup_ms": dict(self.timings),
+        }
+
+    def shutdown(self):
+        """Release shared resources"""
+        with self._lock:
+            self.llm = None
+            self.vision_model = None
+            self.document_index = None
+            self.city_dataset = None
+            self._idle_crews.clear()
+            self.started = False
+
+    def _build_crew(self, city_id):
+        from postdisaster_system import build_crew, city_document_search, city_map
+        return build_crew(city_map[city_id], self.llm, tool=city_document_search(city_id))
+
+    @contextmanager
+    def bind_city(self, city_id):
+        """
+        Check out a crew bound to one city for the duration of a request
+
+        Args:
+            city_id (int): City ID from the city_map
+
+        Yields:
+            Crew: Crew sharing the warm LLM and tools, returned to the pool afterwards
+        """
+        start = time.perf_counter()
+        with self._lock:
+            idle = self._idle_crews.get(city_id)
+            crew = idle.pop() if idle else None
+        if crew is None:
+            crew = self._build_crew(city_id)
+        self._bind_times.append((time.perf_counter() - start) * 1000)
+
+        try:
+            yield crew
+        finally:
+            with self._lock:
+                idle = self._idle_crews.setdefault(city_id, [])
+                self._idle_crews.move_to_end(city_id)
+                discarded = id(crew) in self._discarded
+                self._discarded.discard(id(crew))
+                if self.started and not discarded and len(idle) < self.max_idle_per_city:
+                    idle.append(crew)
+                while len(self._idle_crews) > self.max_cities:
+                    # Drop the crews of the least recently used city
+                    self._idle_crews.popitem(last=False)
+
+    def discard(self, crew):
+        """Keep a checked-out crew from returning to the pool (e.g. a task is still running)"""
+        with self._lock:
+            self._discarded.add(id(crew))
+
+    def report(self):
+        """Startup timings and per-request binding overhead in milliseconds"""
+        bind_times = list(self._bind_times)
+        return {
+            "started": self.started,
+            "startup_ms": dict(self.timings),
+            "bindings": len(bind_times),
+            "bind_p50_ms": round(statistics.median(bind_times), 3) if bind_times else None,
+            "bind_max_ms": round(max(bind_times), 3) if bind_times else None,
+        }
+
+
+_registry = ResourceRegistry()
+
+
+def get_registry(start=True):
+    """Process-wide registry, started on first use if the app did not start it"""
+    if start and not _registry.started:
+        _registry.startup()
+    return _registry
@@ -0,0 +1,282 @@
+"""
+Result Cache for PostDisaster System
+TTL/LRU cache with single-flight deduplication for per-city disaster analyses
+"""
+
+import hashlib
+import json
+import math
+import os
+import pathlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from city_registry import get_city_registry
+from sqlite_store import connect
+
+# Cache settings
+RESULT_CACHE_BACKEND = os.getenv("RESULT_CACHE_BACKEND", "memory")  # "memory", "sqlite", "redis" or "none"
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "300"))  # seconds; 0: entries never expire
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "256"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+RESULT_CACHE_DB = pathlib.Path(os.getenv("RESULT_CACHE_DB", pathlib.Path(__file__).parent / "result_cache.sqlite3"))
+
+
+def expiry(now, ttl):
+    """Expiry time for an entry written at `now` (infinite for a ttl of 0)"""
+    return now + ttl if ttl > 0 else math.inf
+
+
+class NullBackend:
+    """Stores nothing: every analysis runs (concurrent misses still share one run)"""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+    def clear(self):
+        pass
+
+
+class MemoryBackend:
+    """In-process LRU store with per-entry expiry"""
+
+    def __init__(self, max_entries=RESULT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, expiry(time.monotonic(), ttl))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteBackend:
+    """
+    Shared store for worker processes on one host
+
+    Entries expire by wall-clock time; beyond `max_entries` the least
+    recently used entries are pruned on write.
+    """
+
+    def __init__(self, path=RESULT_CACHE_DB, max_entries=RESULT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = connect(path)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used_at)")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM results WHERE key = ? AND expires_at < ?", (key, now))
+                return None
+            self._conn.execute("UPDATE results SET used_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, expires_at, used_at) VALUES (?, ?, ?, ?)",
+                (key, value, expiry(now, ttl), now),
+            )
+            self._conn.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+
+
+class RedisBackend:
+    """
+    Shared store for multi-worker deployments
+
+    Works with any client exposing redis-py's `get`/`set(..., ex=)`/`delete`
+    /`scan_iter`, e.g. `redis.Redis` or `fakeredis.FakeRedis` for local runs.
+    Eviction is left to Redis (configure `maxmemory-policy allkeys-lru`).
+    """
+
+    def __init__(self, client, prefix="postdisaster:analysis:"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url=REDIS_URL):
+        import redis
+        return cls(redis.Redis.from_url(url))
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    def set(self, key, value, ttl):
+        # Redis expiries are whole seconds; no expiry for a ttl of 0
+        self.client.set(self.prefix + key, value, ex=max(1, math.ceil(ttl)) if ttl > 0 else None)
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + "*"):
+            self.client.delete(key)
+
+
+class ResultCache:
+    """
+    JSON result cache with hit/miss counters and single-flight misses
+
+    Concurrent misses for the same key (within one process) share a single
+    computation: the first caller computes, the others wait for its result.
+    """
+
+    def __init__(self, backend, ttl=RESULT_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute, should_cache=None):
+        """
+        Return the cached value for `key`, computing it once on a miss
+
+        Args:
+            key (str): Cache key
+            compute: Function returning a JSON-serializable value
+            should_cache: Optional predicate; values it rejects are returned but not stored
+
+        Returns:
+            The cached or freshly computed value
+        """
+        cached = self.backend.get(key)
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+            return json.loads(cached)
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            # The previous leader may have stored the value between our lookup and now
+            cached = self.backend.get(key)
+            with self._lock:
+                if cached is not None:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+            if cached is not None:
+                value = json.loads(cached)
+            else:
+                value = compute()
+                if should_cache is None or should_cache(value):
+                    self.backend.set(key, json.dumps(value), self.ttl)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            hits, misses, coalesced = self.hits, self.misses, self.coalesced
+        lookups = hits + misses + coalesced
+        return {
+            "backend": type(self.backend).__name__,
+            "ttl_seconds": self.ttl,
+            "hits": hits,
+            "misses": misses,
+            "coalesced": coalesced,
+            "hit_ratio": round((hits + coalesced) / lookups, 3) if lookups else None,
+        }
+
+
+def analysis_cache_key(city_id, config):
+    """
+    Key for one city's analysis
+
+    The registry's content key covers the catalogue and every city's documents,
+    so a changed shard (or Cities.docx) gives new keys.
+
+    Args:
+        city_id (int): City ID from the city_map
+        config (dict): Model/prompt settings that change the output
+    """
+    config_hash = hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    return f"city:{city_id}:doc:{get_city_registry().content_key()[:16]}:cfg:{config_hash}"
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """Process-wide analysis cache using RESULT_CACHE_BACKEND"""
+    global _cache
+    # One instance per process, or concurrent first requests would not share their runs
+    with _cache_lock:
+        if _cache is None:
+            if RESULT_CACHE_BACKEND == "redis":
+                backend = RedisBackend.from_url()
+            elif RESULT_CACHE_BACKEND == "sqlite":
+                backend = SQLiteBackend()
+            elif RESULT_CACHE_BACKEND == "memory":
+                backend = MemoryBackend()
+            elif RESULT_CACHE_BACKEND == "none":
+                backend = NullBackend()
+            else:
+                raise ValueError(f"Unknown RESULT_CACHE_BACKEND '{RESULT_CACHE_BACKEND}'")
+            _cache = ResultCache(backend)
+        return _cache
@@ -1,77 +1,222 @@
-import google.generativeai as genai
 from PIL import Image
 import os
+import json
+import re
+import time
 
 from dotenv import load_dotenv
 import os
 load_dotenv()
 
-# City mapping - same as in PostDisaster_System.ipynb
-city_map = {
-    1: "Seabrook City",
-    2: "Highland Park City", 
-    3: "Baytown City",
-    4: "Ridgeview City",
-    5: "Shoreline City"
-}
+from cities import city_map
+from city_registry import get_city_registry
+from image_hash import IMAGE_HASH_CACHE, get_image_hash_index
+from image_preprocess import decode_image, encode_image, upload_size
+from telemetry import record_retry, span
+from llm_providers import get_provider
+from model_calls import ModelCallError, get_model_caller
 
 def get_city_number_from_name(city_name):
-    """Convert city name to city number"""
-    for number, name in city_map.items():
-        if name.lower() in city_name.lower():
-            return number
-    return None
-
-def detect_city_with_red_cross(image_path):
-    """Analyze satellite image and return city number"""
-    # Check if API key is available
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key or api_key == "your_google_api_key_here":
-        print("Google API key not configured. Using mock analysis for Baytown.png")
-        # Mock response for Baytown image
-        if "Baytown" in image_path:
-            return 3, "Baytown City"
-        else:
-            return 1, "Seabrook City"  # Default fallback
-    
-    # Real API analysis
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-1.5-flash')
-    
-    image = Image.open(image_path)
-    
-    # List of valid cities for the prompt
-    valid_cities = list(city_map.values())
-    cities_str = ", ".join(valid_cities)
-    
-    prompt = f"""
+    """Convert city name (or the model's answer naming one) to city number through the registry's name index"""
+    return get_city_registry().lookup(city_name)
+
+class CityNotDetectedError(ValueError):
+    """Raised when the image cannot be matched to a supported city"""
+
+    status_code = 422  # for API responses and stream error events
+
+    def __init__(self, city_name=None):
+        detail = f" ('{city_name}' is not a supported city)" if city_name else ""
+        super().__init__(f"Could not identify the city in the image{detail}")
+        self.city_name = city_name
+
+def create_vision_model(api_key=None):
+    """Create the shared vision model from VISION_PROVIDER (None for Gemini without an API key)"""
+    return get_provider("vision").vision_model(api_key)
+
+# Images sent per vision model call by the batch endpoint
+BATCH_IMAGES_PER_CALL = int(os.getenv("BATCH_IMAGES_PER_CALL", "4"))
+
+# Largest catalogue listed in the vision prompt; beyond it the model is asked for the
+# name shown in the image, which the registry's name index resolves
+VISION_PROMPT_MAX_CITIES = int(os.getenv("VISION_PROMPT_MAX_CITIES", "50"))
+
+# Sample image for /test-analysis/ and analyze_city_image() without a path
+# (defaults to the Highland Park image shipped with the frontend)
+TEST_IMAGE = os.getenv(
+    "TEST_IMAGE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "frontend", "public", "images", "Highland Park.png"),
+)
+
+def build_prompt(image_count=1):
+    """Vision prompt for one image, or for several images answered one per line"""
+    if len(city_map) <= VISION_PROMPT_MAX_CITIES:
+        # List of valid cities for the prompt
+        cities_str = ", ".join(city_map.values())
+        choice = f"""use ONLY ONE of these exact city names:
+    {cities_str}"""
+    else:
+        choice = "use the city name exactly as it is written in the image."
+
+    if image_count == 1:
+        return f"""
     Analyze this satellite image and identify which city it represents.
     
-    You must return ONLY ONE of these exact city names:
-    {cities_str}
+    You must {choice}
     
     Look for any text, labels, or identifying features in the image that indicate which city this is.
     If there's a red cross marker, pay attention to any city name near it.
     
-    Return ONLY the city name from the list above. Do not include any other text or explanation.
+    Return ONLY the city name. Do not include any other text or explanation.
     """
+
+    return f"""
+    Analyze each of the {image_count} numbered satellite images below and identify which city each one represents.
     
-    response = model.generate_content([prompt, image])
+    For every image you must {choice}
     
-    # Clean the response and get city number
-    city_name = response.text.strip()
-    city_number = get_city_number_from_name(city_name)
+    Look for any text, labels, or identifying features in the image that indicate which city this is.
+    If there's a red cross marker, pay attention to any city name near it.
     
-    return city_number, city_name
+    Return exactly {image_count} lines in image order, each formatted as "<image number>: <city name>".
+    Do not include any other text or explanation.
+    """
+
+def parse_packed_response(text, image_count):
+    """City name per image from a packed response (None where a line is missing)"""
+    names = [None] * image_count
+    for line in text.splitlines():
+        match = re.match(r"\s*(?:image\s*)?(\d+)\s*[:.)-]\s*(.+)", line, re.IGNORECASE)
+        if match and 1 <= int(match.group(1)) <= image_count:
+            names[int(match.group(1)) - 1] = match.group(2).strip()
+    return names
+
+def mock_detection(name):
+    """Filename-based detection used when no API key is configured (no match for other names)"""
+    stem = os.path.splitext(os.path.basename(name))[0].replace("_", " ").replace("-", " ")
+    city_number = get_city_registry().lookup(stem) if stem else None
+    return city_number, city_map[city_number] if city_number else stem
+
+def generate(model, parts):
+    """Vision model call through the shared retry, hedging and circuit breaker policy"""
+    return get_model_caller("vision").call(model.generate_content, parts)
+
+def detect_cities_packed(items, model=None):
+    """
+    Detect the cities of several images, packing them into one model call
+
+    Images matching the perceptual hash cache are answered without the
+    model; the rest are sent together in a single generate_content call.
+    An image that cannot be read is left out of the call and gets
+    (None, None), so it does not fail the others.
+
+    Args:
+        items (list): (image_path, filename, size) tuples; image_path may be an open binary file
+        model: Vision model, defaults to the shared one
 
-def analyze_city_image(image_path=None):
-    """Main function to analyze city image and return city number"""
-    # For now, use the hardcoded Baytown image path as requested
+    Returns:
+        list: (city_number, city_name) per item, in order
+    """
+    if model is None:
+        from resources import get_registry
+        registry = get_registry(start=False)
+        model = registry.vision_model if registry.started else create_vision_model()
+
+    # Check if API key is available
+    if model is None:
+        print("Google API key not configured. Using mock analysis from the file names")
+        return [
+            mock_detection(filename or (image_path if isinstance(image_path, str) else ""))
+            for image_path, filename, size in items
+        ]
+
+    hash_index = get_image_hash_index() if IMAGE_HASH_CACHE else None
+    results = [None] * len(items)
+    pending = []
+    for i, (image_path, filename, size) in enumerate(items):
+        # Real API analysis with the shared model, on a downscaled copy
+        try:
+            with span("image_decode"):
+                start = time.perf_counter()
+                size = upload_size(image_path, size)
+                image = decode_image(image_path)
+                decode_ms = (time.perf_counter() - start) * 1000
+        except Exception as e:
+            print(f"Could not read image {filename or image_path}: {e}")
+            results[i] = (None, None)
+            continue
+
+        # Reuse the detection of a previously seen (near-)identical image
+        image_hash = None
+        if hash_index is not None:
+            with span("image_hash"):
+                image_hash = hash_index.hash_image(image)
+                cached = hash_index.lookup(image_hash)
+            if cached:
+                city_number, city_name, distance = cached
+                print(f"Perceptual hash match (distance {distance}), skipping vision model")
+                results[i] = (city_number, city_name)
+                continue
+
+        # Only images the model will see are re-encoded
+        try:
+            with span("image_encode"):
+                prepared = encode_image(image, original_bytes=size, decode_ms=decode_ms, source=image_path)
+        except Exception as e:
+            print(f"Could not encode image {filename or image_path}: {e}")
+            results[i] = (None, None)
+            continue
+        print(f"Image preprocessing: {json.dumps(prepared.stats)}")
+        pending.append((i, prepared, image_hash))
+
+    if len(pending) == 1:
+        with span("vision_model", images=1):
+            response = generate(model, [build_prompt(), pending[0][1].payload()])
+        names = [response.text.strip()]
+    elif pending:
+        parts = [build_prompt(len(pending))]
+        for n, (_, prepared, _) in enumerate(pending, start=1):
+            parts += [f"Image {n}:", prepared.payload()]
+        with span("vision_model", images=len(pending)):
+            response = generate(model, parts)
+        names = parse_packed_response(response.text, len(pending))
+    else:
+        names = []
+
+    for (i, prepared, image_hash), city_name in zip(pending, names):
+        if city_name is None:
+            # The packed answer skipped this image, ask about it on its own
+            record_retry("vision_model")
+            with span("vision_model", images=1, retry=True):
+                city_name = generate(model, [build_prompt(), prepared.payload()]).text.strip()
+
+        # Clean the response and get city number
+        city_number = get_city_number_from_name(city_name)
+        if hash_index is not None and city_number:
+            hash_index.add(image_hash, city_number, city_name)
+        results[i] = (city_number, city_name)
+
+    return results
+
+def detect_city_with_red_cross(image_path, model=None, filename=None, size=None):
+    """
+    Analyze satellite image and return city number
+
+    Args:
+        image_path: Path to the image, or an open binary file (e.g. a spooled upload)
+        model: Vision model, defaults to the shared one
+        filename (str): Original file name when image_path is a file object
+        size (int): Upload size in bytes, for the preprocessing report
+    """
+    return detect_cities_packed([(image_path, filename, size)], model=model)[0]
+
+def analyze_city_image(image_path=None, filename=None, size=None):
+    """Main function to analyze city image (path or binary file) and return city number"""
     if image_path is None:
-        image_path = r"D:\All Projects\Site uploaded\PostDisaster-Ai-Agentic-Alert-System\Dummy Cities\Baytown.png"
+        image_path = TEST_IMAGE
     
     try:
-        city_number, city_name = detect_city_with_red_cross(image_path)
+        city_number, city_name = detect_city_with_red_cross(image_path, filename=filename, size=size)
         
         if city_number:
             print(f"Detected City: {city_name}")
@@ -79,13 +224,45 @@ def analyze_city_image(image_path=None):
             return city_number
         else:
             print(f"Could not match detected city '{city_name}' to valid city list")
-            print("Valid cities are:", list(city_map.values()))
+            print(f"Valid cities are ({len(city_map)}):", list(city_map.values())[:VISION_PROMPT_MAX_CITIES])
             return None
             
+    except ModelCallError:
+        # The model is failing: report it rather than guessing a city
+        raise
     except Exception as e:
         print(f"Error analyzing image: {e}")
         return None
 
+def analyze_city_images(items):
+    """
+    Batch version of analyze_city_image
+
+    Args:
+        items (list): (image_path, filename, size) tuples
+
+    Returns:
+        list: City number (or None) per item, in order
+    """
+    try:
+        detections = detect_cities_packed(items)
+    except ModelCallError:
+        raise
+    except Exception as e:
+        print(f"Error analyzing images: {e}")
+        return [None] * len(items)
+
+    city_numbers = []
+    for (image_path, filename, size), (city_number, city_name) in zip(items, detections):
+        if city_number:
+            print(f"Detected City for {filename}: {city_name}")
+        elif city_name is None:
+            print(f"Could not read {filename}")
+        else:
+            print(f"Could not match detected city '{city_name}' for {filename} to valid city list")
+        city_numbers.append(city_number)
+    return city_numbers
+
 if __name__ == "__main__":
     # Test the function
     result = analyze_city_image()
@@ -0,0 +1,77 @@
+"""
+Production Server for PostDisaster System
+Runs the API in several worker processes that share job state and cached results
+
+Usage (from backend/):
+    python serve.py --workers 4 --port 8000
+"""
+
+import argparse
+import os
+import time
+
+
+def prepare_shared_state():
+    """
+    Build everything the workers read but should not each rebuild
+
+    Uvicorn starts workers with `spawn`, so nothing is inherited through
+    fork: LLM clients, crews and threads are created per worker after it
+    starts (fork-unsafe objects never cross a process boundary). The
+    read-only data is instead prepared here on disk: the embedding index is
+    memory-mapped by every worker, so its vectors share one copy in the page
+    cache, and the parsed city records load from their cache file. The
+    shared SQLite stores are created in WAL mode and interrupted jobs are
+    requeued once.
+
+    Returns:
+        dict: Milliseconds spent per step
+    """
+    from city_data import get_city_dataset
+    from embedding_index import get_shard_index
+    from jobs import JobStore
+    from result_cache import RESULT_CACHE_BACKEND, SQLiteBackend
+
+    timings = {}
+
+    def timed(name, step):
+        start = time.perf_counter()
+        value = step()
+        timings[name] = round((time.perf_counter() - start) * 1000, 2)
+        return value
+
+    index = timed("document_index", get_shard_index)
+    timed("city_dataset", get_city_dataset)
+    requeued = timed("job_store", lambda: JobStore().requeue_running())
+    if RESULT_CACHE_BACKEND == "sqlite":
+        timed("result_cache", SQLiteBackend)
+
+    print(f"Shared embedding index: {len(index.chunks)} chunks for {len(index.offsets)} cities (key {index.key})")
+    if requeued:
+        print(f"Requeued {requeued} interrupted job(s)")
+    return timings
+
+
+def main(args):
+    # Workers inherit the environment: share results across processes and
+    # leave job recovery to the step above (jobs of a worker that dies later
+    # are claimed again once their lease expires)
+    if args.workers > 1:
+        os.environ.setdefault("RESULT_CACHE_BACKEND", "sqlite")
+    os.environ["JOB_REQUEUE_ON_START"] = "0"
+
+    print(f"Preparing shared state for {args.workers} worker(s)...")
+    print(f"Shared state timings (ms): {prepare_shared_state()}")
+
+    import uvicorn
+    uvicorn.run(args.app, host=args.host, port=args.port, workers=args.workers, log_level=args.log_level)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the PostDisaster API with several worker processes")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--app", default="main_api:app", help="ASGI app import string")
+    parser.add_argument("--log-level", default="info")
+    main(parser.parse_args())
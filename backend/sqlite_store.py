@@ -0,0 +1,30 @@
+"""
+Shared SQLite Connections for PostDisaster System
+Settings that let several worker processes use the same database file safely
+"""
+
+import os
+import sqlite3
+
+# Seconds a writer waits for another process's write lock before failing
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "30"))
+
+
+def connect(path):
+    """
+    Open a database shared between threads and worker processes
+
+    Uses autocommit mode (transactions are explicit), the WAL journal so
+    readers never block on a writer in another process, and a busy timeout
+    instead of failing immediately on a locked database.
+
+    Args:
+        path: Database file
+
+    Returns:
+        sqlite3.Connection: Connection usable from any thread (callers serialize access)
+    """
+    conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None, timeout=SQLITE_BUSY_TIMEOUT)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
@@ -0,0 +1,61 @@
+"""
+Server-Sent Events for PostDisaster System
+Streams pipeline progress (satellite detection, each agent's report) as it happens
+"""
+
+import asyncio
+import json
+
+from executor import run_blocking
+
+
+def sse_event(event, data):
+    """Format one SSE message with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_pipeline(name, fn, *args):
+    """
+    Run a blocking pipeline call and yield its progress as SSE messages
+
+    `fn(*args, emit)` runs on the shared executor (under the `name` endpoint
+    limit) and calls `emit(event, data)` from its worker thread; every call
+    is forwarded to the client straight away. Its return value is sent as
+    a final "complete" event, or an "error" event if it raised.
+
+    Args:
+        name (str): Endpoint name used for the concurrency limit
+        fn: Blocking function taking an extra `emit` argument
+        *args: Arguments for fn
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    def emit(event, data):
+        loop.call_soon_threadsafe(queue.put_nowait, (event, data))
+
+    run = asyncio.ensure_future(run_blocking(name, fn, *args, emit))
+    try:
+        while not run.done():
+            next_event = asyncio.ensure_future(queue.get())
+            await asyncio.wait({next_event, run}, return_when=asyncio.FIRST_COMPLETED)
+            if next_event.done():
+                yield sse_event(*next_event.result())
+            else:
+                next_event.cancel()
+
+        # Events emitted just before the call returned
+        while not queue.empty():
+            yield sse_event(*queue.get_nowait())
+
+        try:
+            yield sse_event("complete", run.result())
+        except Exception as e:
+            yield sse_event("error", {
+                "status_code": getattr(e, "status_code", 500),
+                "detail": getattr(e, "detail", str(e)),
+            })
+    finally:
+        # Client went away: the pipeline keeps its executor slot until it finishes
+        if not run.done():
+            run.add_done_callback(lambda task: task.cancelled() or task.exception())
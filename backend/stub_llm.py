@@ -0,0 +1,79 @@
+"""
+Stub Agent LLM for PostDisaster System
+CrewAI-compatible text model that answers offline with canned responses
+"""
+
+import time
+from typing import Any
+
+from crewai.events.types.llm_events import LLMCallType
+from crewai.llms.base_llm import BaseLLM, llm_call_context
+from pydantic import PrivateAttr
+
+from llm_providers import STUB_FAULTS, STUB_TEXT_LATENCY, CallStats, FaultInjector, LatencyDistribution, stub_text_response
+
+
+class StubLLM(BaseLLM):
+    """
+    Answers every agent step with a final answer after a sampled delay
+
+    The answer is the role's template (or recorded response) filled with the
+    city and figures from the prompt, so crews run end to end without
+    network access and with reproducible timing.
+    """
+
+    _latency: Any = PrivateAttr()
+    _responses: dict = PrivateAttr()
+    _stats: Any = PrivateAttr()
+    _faults: Any = PrivateAttr()
+
+    def __init__(self, latency=STUB_TEXT_LATENCY, responses=None, faults=STUB_FAULTS, **kwargs):
+        super().__init__(model=kwargs.pop("model", "stub"), **kwargs)
+        self._latency = LatencyDistribution(latency)
+        self._responses = responses or {}
+        self._stats = CallStats()
+        self._faults = FaultInjector(faults)
+
+    @property
+    def stats(self):
+        return self._stats
+
+    @property
+    def faults(self):
+        return self._faults
+
+    def call(self, messages, *args, **kwargs):
+        prompt = messages if isinstance(messages, str) else "\n".join(
+            str(message.get("content", "")) for message in messages
+        )
+        from_task, from_agent = kwargs.get("from_task"), kwargs.get("from_agent")
+        with llm_call_context():
+            self._emit_call_started_event(messages=messages, from_task=from_task, from_agent=from_agent)
+            delay = self._latency.sample() + self._faults.extra_latency()
+            time.sleep(delay)
+            try:
+                self._faults.maybe_fail()
+            except Exception as e:
+                self._emit_call_failed_event(str(e), from_task=from_task, from_agent=from_agent)
+                raise
+            self._stats.record(delay)
+            response = f"Thought: I now know the final answer\nFinal Answer: {stub_text_response(prompt, self._responses)}"
+
+            # Report usage like a real provider (roughly 4 characters per token) so token metrics work offline
+            usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(response) // 4}
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+            self._track_token_usage_internal(usage)
+            self._emit_call_completed_event(
+                response, LLMCallType.LLM_CALL,
+                from_task=from_task, from_agent=from_agent, messages=messages, usage=usage,
+            )
+        return response
+
+    def supports_function_calling(self):
+        return False
+
+    def supports_stop_words(self):
+        return False
+
+    def get_context_window_size(self):
+        return 128000
@@ -0,0 +1,201 @@
+"""
+Region Sweep for PostDisaster System
+Analyzes every affected city of a regional event concurrently, highest casualties first, within the LLM quota
+
+Usage (from backend/):
+    python sweep.py --cities 1 3 5
+    python sweep.py --all --output report.json
+"""
+
+import argparse
+import contextvars
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from cities import city_map
+
+# Sweep settings
+SWEEP_MAX_CITIES = int(os.getenv("SWEEP_MAX_CITIES", "1000"))
+SWEEP_MAX_PARALLEL = int(os.getenv("SWEEP_MAX_PARALLEL", "8"))  # city analyses in flight per sweep
+
+
+def prioritize(city_ids):
+    """
+    Order cities by casualties, most injured first (then most trapped)
+
+    Cities without a parsed record keep their relative order at the end.
+
+    Returns:
+        list: (city id, record or None) in priority order
+    """
+    from city_data import get_city_dataset
+
+    dataset = get_city_dataset()
+    entries = [(city_id, dataset.get(city_map[city_id])) for city_id in city_ids]
+    return sorted(entries, key=lambda entry: (-entry[1].hurt, -entry[1].stuck) if entry[1] else (1, 0))
+
+
+def situation_report(entries, outcomes, wall_seconds):
+    """
+    Aggregate the per-city results into one regional report
+
+    Args:
+        entries (list): (city id, record or None) in priority order
+        outcomes (dict): City id -> (reports or None, error or None, seconds)
+        wall_seconds (float): Duration of the whole sweep
+
+    Returns:
+        dict: JSON-ready situation report
+    """
+    from city_data import get_city_dataset
+    from planner import plan_cities
+    from postdisaster_system import AGENT_OUTPUT_NAMES
+    from rate_limit import get_llm_rate_limiter
+
+    dataset = get_city_dataset()
+    cities = []
+    by_disaster = {}
+    for rank, (city_id, record) in enumerate(entries, start=1):
+        reports, error, seconds = outcomes[city_id]
+        if error is not None:
+            status = "failed"
+        elif len(reports) < len(AGENT_OUTPUT_NAMES):
+            status = "partial"
+        else:
+            status = "complete"
+        city = {
+            "priority": rank,
+            "city_id": city_id,
+            "city_name": city_map[city_id],
+            "status": status,
+            "duration_ms": round(seconds * 1000, 1),
+            **(dataset.figures(city_map[city_id]) or {}),
+            "disaster_analysis": reports,
+        }
+        if error is not None:
+            city["error"] = error
+        cities.append(city)
+        if record is not None:
+            by_disaster.setdefault(record.disaster or "unknown", []).append(city_map[city_id])
+
+    with_records = [(city_id, record) for city_id, record in entries if record is not None]
+    totals = plan_cities([city_map[city_id] for city_id, _ in with_records], totals_only=True)["totals"] if with_records else {}
+    totals.update({
+        "population": sum(record.population for _, record in with_records),
+        "hurt": sum(record.hurt for _, record in with_records),
+        "stuck": sum(record.stuck for _, record in with_records),
+    })
+
+    limiter = get_llm_rate_limiter()
+    return {
+        "cities_analyzed": len(cities),
+        "complete": sum(city["status"] == "complete" for city in cities),
+        "partial": sum(city["status"] == "partial" for city in cities),
+        "failed": sum(city["status"] == "failed" for city in cities),
+        "wall_ms": round(wall_seconds * 1000, 1),
+        "totals": totals,
+        "by_disaster": by_disaster,
+        "rate_limit": limiter.stats() if limiter else None,
+        "cities": cities,
+    }
+
+
+def run_sweep(city_ids, on_event=None, max_parallel=SWEEP_MAX_PARALLEL):
+    """
+    Analyze many cities concurrently and aggregate a situation report
+
+    All crews share the process-wide crew pool, shard index and LLM rate
+    limiter (LLM_RATE_LIMIT_RPM). Cities start in casualty order and their
+    agents get quota in that order too, so with a tight quota the most
+    affected cities finish first and total wall time is bounded by the
+    quota rather than by running the analyses one after another.
+
+    Args:
+        city_ids (list): City IDs from the city_map
+        on_event: Optional function (event, data) called with the "sweep"
+            plan first, then a "city" event as each analysis finishes
+        max_parallel (int): City analyses in flight
+
+    Returns:
+        dict: Situation report (see situation_report)
+
+    Raises:
+        ValueError: For an empty or oversized list or unknown city ids
+    """
+    from postdisaster_system import run_disaster_analysis_cached
+    from rate_limit import request_priority
+    from telemetry import span
+
+    city_ids = list(dict.fromkeys(city_ids))
+    if not city_ids:
+        raise ValueError("city_ids must list at least one city")
+    if len(city_ids) > SWEEP_MAX_CITIES:
+        raise ValueError(f"Too many cities, the limit is {SWEEP_MAX_CITIES} per sweep")
+    unknown = [city_id for city_id in city_ids if city_id not in city_map]
+    if unknown:
+        raise ValueError(f"Unknown city ids: {unknown}")
+
+    entries = prioritize(city_ids)
+    if on_event:
+        on_event("sweep", {"cities": [
+            {"priority": rank, "city_id": city_id, "city_name": city_map[city_id], "hurt": record.hurt if record else None}
+            for rank, (city_id, record) in enumerate(entries, start=1)
+        ]})
+
+    def analyze(city_id, priority):
+        request_priority.set(priority)
+        start = time.perf_counter()
+        try:
+            return run_disaster_analysis_cached(city_id), None, time.perf_counter() - start
+        except Exception as e:
+            print(f"Warning: sweep analysis for {city_map[city_id]} failed ({e})")
+            return None, str(e), time.perf_counter() - start
+
+    print(f"Sweeping {len(entries)} cities, {max_parallel} at a time...")
+    start = time.perf_counter()
+    outcomes = {}
+    with span("sweep", cities=len(entries)), ThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix="sweep") as pool:
+        # Submitted in priority order, so the pool also starts the worst-hit cities first
+        futures = {
+            pool.submit(contextvars.copy_context().run, analyze, city_id, rank): city_id
+            for rank, (city_id, _) in enumerate(entries)
+        }
+        for future in as_completed(futures):
+            city_id = futures[future]
+            outcomes[city_id] = future.result()
+            if on_event:
+                reports, error, seconds = outcomes[city_id]
+                on_event("city", {
+                    "city_id": city_id,
+                    "city_name": city_map[city_id],
+                    "success": error is None,
+                    "duration_ms": round(seconds * 1000, 1),
+                    "disaster_analysis": reports,
+                    **({"error": error} if error else {}),
+                })
+
+    return situation_report(entries, outcomes, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze every affected city of a regional event")
+    targets = parser.add_mutually_exclusive_group(required=True)
+    targets.add_argument("--cities", type=int, nargs="+", help="city ids to analyze")
+    targets.add_argument("--all", action="store_true", help="analyze every city in the catalogue")
+    parser.add_argument("--parallel", type=int, default=SWEEP_MAX_PARALLEL, help="city analyses in flight")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    from resources import get_registry
+    get_registry().startup()
+
+    report = run_sweep(list(city_map) if args.all else args.cities, max_parallel=args.parallel)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Sweep report written to {args.output}: {report['complete']} complete, "
+              f"{report['partial']} partial, {report['failed']} failed in {report['wall_ms'] / 1000:.1f}s")
+    else:
+        print(json.dumps(report, indent=2))
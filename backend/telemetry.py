@@ -0,0 +1,312 @@
+"""
+Telemetry for PostDisaster System
+Tracing spans per pipeline stage, LLM token/retry counters, Prometheus metrics and optional OpenTelemetry export
+"""
+
+import bisect
+import contextvars
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Request header that adds a per-stage timing breakdown to JSON responses
+DEBUG_TIMINGS_HEADER = "x-debug-timings"
+
+# OpenTelemetry export: "0" (off), "otlp" (OTEL_EXPORTER_OTLP_* settings) or "console"
+OTEL_TRACES = os.getenv("OTEL_TRACES", "0")
+
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Counter:
+    """Monotonic counter with labels, rendered in the Prometheus text format"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in sorted(self._values.items())]
+
+
+class Histogram(Counter):
+    """Cumulative-bucket histogram with labels"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = buckets
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip([*self.buckets, "+Inf"], counts):
+                    cumulative += count
+                    samples.append((f"{self.name}_bucket", key + (str(bound),), cumulative))
+                samples.append((f"{self.name}_sum", key, round(total, 6)))
+                samples.append((f"{self.name}_count", key, cumulative))
+        return samples
+
+
+STAGE_SECONDS = Histogram("postdisaster_stage_seconds", "Time spent in each pipeline stage", ("stage",))
+HTTP_REQUESTS = Counter("postdisaster_http_requests_total", "HTTP requests by route and status", ("route", "status"))
+HTTP_SECONDS = Histogram("postdisaster_http_request_seconds", "HTTP request latency by route", ("route",))
+LLM_CALLS = Counter("postdisaster_llm_calls_total", "LLM calls by agent and outcome", ("agent", "status"))
+LLM_TOKENS = Counter("postdisaster_llm_tokens_total", "LLM tokens by agent and kind", ("agent", "kind"))
+RETRIES = Counter("postdisaster_retries_total", "Retried operations", ("operation",))
+HEDGES = Counter("postdisaster_hedged_requests_total", "Duplicate model requests sent for slow calls", ("operation",))
+CIRCUIT_REJECTIONS = Counter("postdisaster_circuit_rejections_total", "Model calls rejected by an open circuit breaker", ("operation",))
+
+METRICS = [STAGE_SECONDS, HTTP_REQUESTS, HTTP_SECONDS, LLM_CALLS, LLM_TOKENS, RETRIES, HEDGES, CIRCUIT_REJECTIONS]
+
+
+def _escape_label(value):
+    # Label values (agent roles, routes) may contain quotes, backslashes or newlines
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in METRICS:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, key, value in metric.samples():
+            label_names = list(metric.labels) + (["le"] if name.endswith("_bucket") else [])
+            labels = ",".join(f'{label}="{_escape_label(label_value)}"' for label, label_value in zip(label_names, key))
+            lines.append(f"{name}{{{labels}}} {value}" if labels else f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class Trace:
+    """Spans and token counts collected for one request"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans = []
+        self.tokens = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, name, start, duration, attributes):
+        with self._lock:
+            self.spans.append({
+                "stage": name,
+                "start_ms": round((start - self.start) * 1000, 2),
+                "duration_ms": round(duration * 1000, 2),
+                **attributes,
+            })
+
+    def add_tokens(self, agent, prompt_tokens, completion_tokens):
+        with self._lock:
+            counts = self.tokens.setdefault(agent, {"prompt": 0, "completion": 0})
+            counts["prompt"] += prompt_tokens
+            counts["completion"] += completion_tokens
+
+    def mark(self, name, **attributes):
+        """Record a span from the start of the request until now (e.g. the upload)"""
+        now = time.perf_counter()
+        self.add_span(name, self.start, now - self.start, attributes)
+        STAGE_SECONDS.observe(now - self.start, stage=name)
+
+    def breakdown(self):
+        """Timing breakdown for the debug response field"""
+        _flush_llm_events()
+        with self._lock:
+            return {
+                "total_ms": round((time.perf_counter() - self.start) * 1000, 2),
+                "spans": sorted(self.spans, key=lambda span: span["start_ms"]),
+                "tokens": {agent: dict(counts) for agent, counts in self.tokens.items()},
+            }
+
+
+_current_trace = contextvars.ContextVar("postdisaster_trace", default=None)
+
+# Task ids mapped to the trace and agent name their LLM calls count towards. Entries
+# stay after the task ends (usage events arrive asynchronously); the oldest are
+# dropped beyond _MAX_TASK_TRACES
+_MAX_TASK_TRACES = 4096
+_task_traces = OrderedDict()
+_task_traces_lock = threading.Lock()
+
+
+def current_trace():
+    """Trace of the request being handled, or None outside a request"""
+    return _current_trace.get()
+
+
+def start_trace():
+    """Begin collecting spans for the current request (or job)"""
+    trace = Trace()
+    _current_trace.set(trace)
+    return trace
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time one pipeline stage
+
+    The duration goes to the stage histogram, to the current request's
+    trace (threads started through the executor share it) and, when
+    enabled, to OpenTelemetry.
+
+    Args:
+        name (str): Stage name, e.g. "vision_model" or "task:Damage Analyser"
+        **attributes: Extra fields recorded with the span
+    """
+    otel_span = _tracer.start_as_current_span(name, attributes=attributes) if _tracer else None
+    if otel_span:
+        otel_span.__enter__()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_SECONDS.observe(duration, stage=name)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_span(name, start, duration, attributes)
+        if otel_span:
+            otel_span.__exit__(None, None, None)
+
+
+@contextmanager
+def task_span(task, agent_name):
+    """Span around one CrewAI task; its LLM calls and token usage are attributed to the agent"""
+    retries_before = getattr(task, "retry_count", 0) or 0
+    with _task_traces_lock:
+        _task_traces[str(task.id)] = (_current_trace.get(), agent_name)
+        _task_traces.move_to_end(str(task.id))
+        while len(_task_traces) > _MAX_TASK_TRACES:
+            _task_traces.popitem(last=False)
+    try:
+        with span(f"task:{agent_name}"):
+            yield
+    finally:
+        retries = (getattr(task, "retry_count", 0) or 0) - retries_before
+        if retries > 0:
+            RETRIES.inc(retries, operation=f"task:{agent_name}")
+
+
+def record_retry(operation):
+    RETRIES.inc(operation=operation)
+
+
+class TelemetryMiddleware:
+    """Starts a trace per HTTP request and records request counts and latency by route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_trace()
+        start = time.perf_counter()
+        status = 500
+
+        async def record_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, record_status)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUESTS.inc(route=route, status=status)
+            HTTP_SECONDS.observe(time.perf_counter() - start, route=route)
+
+
+def wants_timings(request):
+    """Whether the client asked for the timing breakdown"""
+    return request.headers.get(DEBUG_TIMINGS_HEADER, "").lower() in ("1", "true", "yes")
+
+
+def _on_llm_call(source, event, status):
+    trace, agent_name = _task_traces.get(event.task_id, (None, None))
+    agent = agent_name or event.agent_role or "unknown"
+    LLM_CALLS.inc(agent=agent, status=status)
+
+    usage = getattr(event, "usage", None) or {}
+    prompt_tokens = int(usage.get("prompt_tokens") or 0)
+    completion_tokens = int(usage.get("completion_tokens") or 0)
+    if prompt_tokens or completion_tokens:
+        LLM_TOKENS.inc(prompt_tokens, agent=agent, kind="prompt")
+        LLM_TOKENS.inc(completion_tokens, agent=agent, kind="completion")
+        if trace is not None:
+            trace.add_tokens(agent, prompt_tokens, completion_tokens)
+
+
+_llm_events_registered = False
+
+
+def register_llm_events():
+    """Count LLM calls and token usage from CrewAI's event bus (called once the agent stack is loaded)"""
+    global _llm_events_registered
+    if _llm_events_registered:
+        return
+    from crewai.events import LLMCallCompletedEvent, LLMCallFailedEvent, crewai_event_bus
+
+    crewai_event_bus.on(LLMCallCompletedEvent)(lambda source, event: _on_llm_call(source, event, "success"))
+    crewai_event_bus.on(LLMCallFailedEvent)(lambda source, event: _on_llm_call(source, event, "failure"))
+    _llm_events_registered = True
+
+
+def _flush_llm_events():
+    # CrewAI runs event handlers on its own pool; let pending token counts land
+    if _llm_events_registered:
+        from crewai.events import crewai_event_bus
+        crewai_event_bus.flush(timeout=1.0)
+
+
+def _setup_otel():
+    if OTEL_TRACES == "0":
+        return None
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    except ImportError:
+        print("OTEL_TRACES is set but opentelemetry-sdk is not installed, skipping OpenTelemetry export")
+        return None
+
+    if OTEL_TRACES == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        exporter = OTLPSpanExporter()
+    else:
+        exporter = ConsoleSpanExporter()
+    provider = TracerProvider(resource=Resource.create({"service.name": "postdisaster-api"}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    return trace.get_tracer("postdisaster")
+
+
+_tracer = _setup_otel()
@@ -0,0 +1,32 @@
+"""
+Shared test setup: offline stub models and throwaway stores
+
+Settings are read at import time, so they are set here before any test
+imports the pipeline.
+"""
+
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+_tmp = tempfile.mkdtemp(prefix="postdisaster-tests-")
+os.environ.update({
+    "LLM_PROVIDER": "stub",
+    "VISION_PROVIDER": "stub",
+    "EMBEDDER_PROVIDER": "hashing",
+    "STUB_TEXT_LATENCY": "fixed:1",
+    "STUB_VISION_LATENCY": "fixed:1",
+    "STUB_FAULTS": "",
+    "WARMUP_MODE": "lazy",
+    "TTS_BULLETINS": "0",
+    "IMAGE_HASH_CACHE": "0",
+    "RESULT_CACHE_BACKEND": "none",
+    "JOBS_DB": os.path.join(_tmp, "jobs.sqlite3"),
+    "IMAGE_HASH_DB": os.path.join(_tmp, "hashes.sqlite3"),
+    "EMBEDDING_INDEX_DIR": os.path.join(_tmp, "index"),
+    "CREWAI_DISABLE_TELEMETRY": "true",
+    "OTEL_SDK_DISABLED": "true",
+})
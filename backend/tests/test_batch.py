@@ -0,0 +1,125 @@
+"""
+Batch classification: one unreadable image does not fail its pack, zip
+members are size-checked while they are read, and crew runs are queued
+within the analyze_city limit
+"""
+
+import asyncio
+import io
+import json
+import threading
+import time
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+
+import batch
+import executor
+from cities import city_map
+from executor import EndpointLimiter
+from llm_providers import StubVisionModel
+from satellite import detect_cities_packed
+from uploads import UploadTooLarge
+
+
+def png(color):
+    image = io.BytesIO()
+    Image.new("RGB", (64, 64), color).save(image, "PNG")
+    return image.getvalue()
+
+
+def zip_upload(members):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    archive.seek(0)
+    return SimpleNamespace(filename="tiles.zip", content_type="application/zip", file=archive)
+
+
+def test_unreadable_image_is_dropped_from_the_pack():
+    model = StubVisionModel(latency="fixed:1", responses={"vision": "Baytown City"}, faults="")
+    items = [
+        (io.BytesIO(png("olive")), "a.png", None),
+        (io.BytesIO(b"not an image"), "broken.png", None),
+        (io.BytesIO(png("teal")), "b.png", None),
+    ]
+
+    results = detect_cities_packed(items, model=model)
+
+    assert results[1] == (None, None)
+    assert [name for _, name in (results[0], results[2])] == ["Baytown City", "Baytown City"]
+    assert results[0][0] is not None
+    # The two readable images still went out in a single packed call
+    assert model.stats.calls == 1
+
+
+def test_zip_members_are_opened_lazily_and_non_images_skipped():
+    upload = zip_upload({"a.png": png("olive"), "notes.txt": b"hello", "tiles/b.png": png("teal")})
+
+    items = batch.collect_batch_items([upload])
+
+    assert [filename for _, filename, _ in items] == ["a.png", "tiles/b.png"]
+    assert Image.open(items[0][0]).size == (64, 64)
+
+
+def test_zip_member_claiming_too_many_bytes_is_refused(monkeypatch):
+    monkeypatch.setattr(batch, "MAX_UPLOAD_BYTES", 100)
+    upload = zip_upload({"big.png": png("olive")})
+
+    with pytest.raises(HTTPException) as raised:
+        batch.collect_batch_items([upload])
+
+    assert raised.value.status_code == 413
+
+
+def test_zip_member_is_cut_off_past_the_limit_while_reading():
+    upload = zip_upload({"big.png": b"x" * 1000})
+    archive = zipfile.ZipFile(upload.file)
+    member = batch.BoundedMember(archive.open("big.png"), "big.png", limit=100)
+
+    assert len(member.read(50)) == 50
+    with pytest.raises(UploadTooLarge):
+        member.read()
+    # No more than one byte past the limit was decompressed
+    assert member.tell() == 101
+
+
+def test_crew_runs_are_queued_within_the_analyze_city_limit(monkeypatch):
+    import postdisaster_system
+    import satellite
+
+    # Room for one running and one waiting analysis: five concurrent runs would get 503s
+    monkeypatch.setattr(executor, "_limiters", {"analyze_city": EndpointLimiter("analyze_city", 1, 1)})
+    city_ids = list(city_map)
+    monkeypatch.setattr(satellite, "analyze_city_images", lambda pack: [int(filename) for _, filename, _ in pack])
+
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def run_disaster_analysis_cached(city_id):
+        with lock:
+            running.append(city_id)
+            peak.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.remove(city_id)
+        return {"city": city_id}
+
+    monkeypatch.setattr(postdisaster_system, "run_disaster_analysis_cached", run_disaster_analysis_cached)
+    items = [(None, str(city_id), None) for city_id in city_ids]
+
+    async def scenario():
+        return [json.loads(line) async for line in batch.stream_batch_analysis(items)]
+
+    lines = asyncio.run(scenario())
+
+    cities = [line for line in lines if line["type"] == "city"]
+    assert sorted(line["city_id"] for line in cities) == sorted(city_ids)
+    assert all(line["success"] for line in cities)
+    assert max(peak) == 1
+    assert lines[-1]["type"] == "summary"
@@ -0,0 +1,98 @@
+"""
+City records parsed from the document shards, their cache and the figures
+served without the LLM
+"""
+
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from city_data import CityDataset, dispatch_figures, parse_city_records, resource_figures
+
+PARAGRAPHS = [
+    "Emergency Response Overview",
+    "Lakeside City Disaster Information",
+    "Lakeside has been hit by a major flood disaster. The city has a total population of 12,500 residents. "
+    "Current casualty reports indicate 1,250 people have been injured in Lakeside due to the flood.",
+    "Lakeside Trapped Residents Locations",
+    "Harbour Mall in Lakeside: 120 people are trapped",
+    "Old Mill in Lakeside: 30 people are trapped",
+    "Lakeside Infrastructure Damage Assessment",
+    "North Bridge in Lakeside: Partial collapse.",
+    "Lakeside needs the following resources: rescue boats, clean water and blankets.",
+    "General Response Guidelines",
+    "Teams must coordinate through the central command.",
+]
+
+
+def test_sections_are_parsed_into_records():
+    [record] = parse_city_records(PARAGRAPHS)
+
+    assert record.name == "Lakeside City"
+    assert record.disaster == "flood"
+    assert (record.population, record.hurt, record.stuck) == (12500, 1250, 150)
+    assert [(site.place, site.people) for site in record.trapped] == [("Harbour Mall", 120), ("Old Mill", 30)]
+    assert [(site.place, site.damage) for site in record.damaged_infrastructure] == [("North Bridge", "Partial collapse")]
+    assert record.needs == ["rescue boats", "clean water", "blankets"]
+
+
+def test_paragraphs_outside_city_sections_are_ignored():
+    assert parse_city_records(["Emergency Response Overview", "No cities here."]) == []
+
+
+def test_every_builtin_city_has_a_record(tmp_path):
+    from cities import city_map
+
+    dataset = CityDataset.load_or_build(cache_dir=tmp_path)
+
+    for name in city_map.values():
+        record = dataset.get(name)
+        assert record is not None, name
+        assert record.population > 0 and record.hurt > 0 and record.trapped
+    seabrook = dataset.get("seabrook")
+    assert (seabrook.disaster, seabrook.population, seabrook.hurt, seabrook.stuck) == ("tsunami", 1200000, 4500, 700)
+
+
+def test_records_are_parsed_once_and_then_read_from_the_cache(tmp_path, monkeypatch):
+    import city_data
+
+    built = CityDataset.load_or_build(cache_dir=tmp_path)
+    monkeypatch.setattr(city_data, "parse_city_records", lambda paragraphs: [])
+
+    cached = CityDataset.load_or_build(cache_dir=tmp_path)
+
+    assert cached.key == built.key
+    assert [record.name for record in cached.records] == [record.name for record in built.records]
+
+
+def test_figures_match_the_tool_formulas(tmp_path):
+    figures = CityDataset.load_or_build(cache_dir=tmp_path).figures("Baytown City")
+
+    assert figures["dispatch"] == dispatch_figures(figures["hurt"])
+    assert figures["resources"] == resource_figures(figures["population"])
+    assert dispatch_figures(450) == {"helicopters": 4, "police": 9, "special_forces": 2}
+    assert CityDataset.load_or_build(cache_dir=tmp_path).figures("Atlantis") is None
+
+
+def test_figures_endpoint_loads_the_dataset_off_the_event_loop(monkeypatch):
+    import city_data
+    import main_api
+
+    loop_threads = []
+    get_city_dataset = city_data.get_city_dataset
+
+    def tracking_get_city_dataset():
+        try:
+            asyncio.get_running_loop()
+            loop_threads.append(True)
+        except RuntimeError:
+            loop_threads.append(False)
+        return get_city_dataset()
+
+    monkeypatch.setattr(city_data, "get_city_dataset", tracking_get_city_dataset)
+
+    response = TestClient(main_api.app).get("/city-figures/1")
+
+    assert response.status_code == 200
+    assert response.json()["city_name"] == "Seabrook City"
+    assert loop_threads == [False]
@@ -0,0 +1,92 @@
+"""
+City registry: the built-in cities parsed from Cities.docx, name lookup,
+and the content key that analysis and index caches are keyed on
+"""
+
+import os
+import shutil
+
+import pytest
+from fastapi.testclient import TestClient
+
+import embedding_index
+from city_registry import BUILTIN_CITIES, CityRegistry
+from result_cache import analysis_cache_key
+
+
+@pytest.fixture
+def registry():
+    return CityRegistry.builtin()
+
+
+@pytest.fixture
+def docx_copy(tmp_path, monkeypatch):
+    """A copy of Cities.docx the registry reads instead of the shipped one"""
+    path = tmp_path / "Cities.docx"
+    shutil.copyfile(embedding_index.CITIES_DOCX, path)
+    monkeypatch.setattr(embedding_index, "CITIES_DOCX", path)
+    return path
+
+
+def test_builtin_sections_split_cities_docx(registry):
+    sections = {city_id: registry.shard_paragraphs(city_id) for city_id in BUILTIN_CITIES}
+
+    for city_id, name in BUILTIN_CITIES.items():
+        short_name = name.removesuffix(" City")
+        assert sections[city_id][0] == f"{name} Disaster Information"
+        assert len(sections[city_id]) > 1
+        assert all(short_name in text for text in sections[city_id])
+
+    # No paragraph is read into two sections
+    paragraphs = [text for section in sections.values() for text in section]
+    assert len(paragraphs) == len(set(paragraphs))
+    assert registry.shard_paragraphs(99) == []
+
+
+def test_lookup_matches_names_and_model_answers(registry):
+    assert registry.lookup("Highland Park City") == 2
+    assert registry.lookup("highland park") == 2
+    assert registry.lookup("Seabrok City") == 1
+    assert registry.lookup("Atlantis") is None
+
+
+def test_content_key_hashes_cities_docx_once_per_change(registry, docx_copy, monkeypatch):
+    hashed = []
+    file_sha256 = embedding_index.file_sha256
+    monkeypatch.setattr(embedding_index, "file_sha256", lambda path: hashed.append(path) or file_sha256(path))
+
+    first = registry.content_key()
+    assert registry.content_key() == first
+    assert len(hashed) == 1
+
+    with open(docx_copy, "ab") as handle:
+        handle.write(b"\0")
+    os.utime(docx_copy, ns=(0, 0))
+
+    assert registry.content_key() != first
+    assert len(hashed) == 2
+
+
+def test_analysis_cache_key_follows_the_registry(docx_copy, monkeypatch):
+    registry = CityRegistry.builtin()
+    monkeypatch.setattr("result_cache.get_city_registry", lambda: registry)
+    config = {"model": "stub"}
+
+    first = analysis_cache_key(1, config)
+    with open(docx_copy, "ab") as handle:
+        handle.write(b"\0")
+    os.utime(docx_copy, ns=(0, 0))
+
+    assert f":doc:{registry.content_key()[:16]}:" in analysis_cache_key(1, config)
+    assert analysis_cache_key(1, config) != first
+    assert analysis_cache_key(2, config) != analysis_cache_key(1, config)
+
+
+@pytest.mark.parametrize("path", ["/analyze-city/99", "/analyze-city/99/stream", "/city-figures/99"])
+def test_unknown_city_id_is_named(path):
+    import main_api
+
+    response = TestClient(main_api.app).get(path)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unknown city ids: [99]"
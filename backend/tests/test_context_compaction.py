@@ -0,0 +1,68 @@
+"""
+Context compaction: each analyst is sent only the city facts it needs
+"""
+
+import json
+
+import postdisaster_system
+from city_data import get_city_dataset
+from postdisaster_system import AGENT_OUTPUT_NAMES, analyst_contexts, compact_context, run_crew_sequential
+from test_crew_execution import FakeTask, fake_crew
+
+
+def brief(city_name="Seabrook City"):
+    return get_city_dataset().brief(city_name)
+
+
+def test_each_analyst_gets_its_own_fields():
+    keys = {name: set(json.loads(compact_context(brief(), name))) for name in AGENT_OUTPUT_NAMES}
+
+    assert keys["Resource Allocator Agent"] == {"name", "population", "resources_needed"}
+    assert keys["Help Dispatcher Agent"] == {"name", "disaster", "hurt", "stuck", "trapped", "dispatch"}
+    assert keys["Damage Analyser"] == {"name", "disaster", "damaged_infrastructure"}
+    assert keys["Needs Analyst Agent"] == {"name", "disaster", "population", "needs"}
+
+
+def test_values_are_passed_through_unchanged():
+    facts = json.loads(brief())
+    compacted = json.loads(compact_context(brief(), "Help Dispatcher Agent"))
+
+    assert all(compacted[key] == facts[key] for key in compacted)
+
+
+def test_free_form_collector_keys_in_a_fence_are_matched():
+    collected = '```json\n{"city_name": "Baytown City", "total_population": 600000, "injured_casualties": 3800}\n```'
+
+    assert json.loads(compact_context(collected, "Resource Allocator Agent")) == {
+        "city_name": "Baytown City", "total_population": 600000,
+    }
+
+
+def test_anything_else_is_sent_unchanged():
+    prose = "Seabrook has 1,200,000 residents and 4,500 injured."
+
+    assert compact_context(prose, "Damage Analyser") == prose
+    assert compact_context("[1, 2]", "Damage Analyser") == "[1, 2]"
+    assert compact_context('{"weather": "rain"}', "Damage Analyser") == '{"weather": "rain"}'
+
+
+def test_compaction_sends_less_than_the_full_facts_to_every_analyst(monkeypatch):
+    compacted = analyst_contexts(brief())
+    monkeypatch.setattr(postdisaster_system, "CREW_CONTEXT_COMPACTION", False)
+    full = analyst_contexts(brief())
+
+    assert all(context == brief() for context in full.values())
+    assert sum(map(len, compacted.values())) < 0.75 * sum(map(len, full.values()))
+
+
+def test_sequential_crew_runs_the_collector_once_and_compacts_its_output():
+    analysts = [FakeTask(f"report {n}") for n in range(4)]
+    crew = fake_crew(*analysts)
+    crew.tasks[0].answer = brief()
+
+    reports = run_crew_sequential(crew)
+
+    assert reports == {name: f"report {n}" for n, name in enumerate(AGENT_OUTPUT_NAMES)}
+    assert crew.tasks[0].contexts == [None]
+    for name, task in zip(AGENT_OUTPUT_NAMES, analysts):
+        assert task.contexts == [compact_context(brief(), name)]
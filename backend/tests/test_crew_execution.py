@@ -0,0 +1,155 @@
+"""
+Analyst fan-out: all four reports, partial results and errors
+"""
+
+import contextvars
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+import postdisaster_system
+from postdisaster_system import AGENT_OUTPUT_NAMES, run_crew_parallel, run_disaster_analysis
+from rate_limit import QuotaWait, TokenBucket, quota_wait
+
+
+class FakeTask:
+    """Stands in for a CrewAI task: waits for LLM quota, sleeps, then answers or raises"""
+
+    def __init__(self, answer="report", seconds=0.0, error=None, limiter=None, requests=0):
+        self.id = uuid.uuid4()
+        self.answer = answer
+        self.seconds = seconds
+        self.error = error
+        self.limiter = limiter
+        self.requests = requests
+        self.contexts = []
+
+    def execute_sync(self, context=None):
+        self.contexts.append(context)
+        for _ in range(self.requests):
+            self.limiter.check_or_wait()
+        time.sleep(self.seconds)
+        if self.error:
+            raise self.error
+        return SimpleNamespace(raw=self.answer)
+
+
+def fake_crew(*analyst_tasks):
+    return SimpleNamespace(tasks=[FakeTask("collected"), *analyst_tasks])
+
+
+def contexts():
+    return {name: f"facts for {name}" for name in AGENT_OUTPUT_NAMES}
+
+
+def test_analysts_run_concurrently_with_their_own_context():
+    tasks = [FakeTask(f"report {n}", seconds=0.2) for n in range(4)]
+
+    start = time.monotonic()
+    results = run_crew_parallel(fake_crew(*tasks), contexts=contexts())
+
+    assert time.monotonic() - start < 0.6
+    assert results == {name: f"report {n}" for n, name in enumerate(AGENT_OUTPUT_NAMES)}
+    assert [task.contexts for task in tasks] == [[f"facts for {name}"] for name in AGENT_OUTPUT_NAMES]
+
+
+def test_failed_analyst_is_left_out():
+    tasks = [FakeTask(), FakeTask(error=ValueError("bad answer")), FakeTask(), FakeTask()]
+
+    results = run_crew_parallel(fake_crew(*tasks), contexts=contexts())
+
+    assert list(results) == [name for name in AGENT_OUTPUT_NAMES if name != AGENT_OUTPUT_NAMES[1]]
+
+
+def test_every_analyst_failing_raises_the_error():
+    tasks = [FakeTask(error=ValueError("bad answer")) for _ in range(4)]
+
+    with pytest.raises(ValueError):
+        run_crew_parallel(fake_crew(*tasks), contexts=contexts())
+
+
+def test_slow_analyst_times_out_with_partial_results():
+    tasks = [FakeTask(), FakeTask(seconds=1.0), FakeTask(), FakeTask()]
+
+    start = time.monotonic()
+    results = run_crew_parallel(fake_crew(*tasks), task_timeout=0.2, contexts=contexts())
+
+    assert time.monotonic() - start < 0.8
+    assert AGENT_OUTPUT_NAMES[1] not in results
+    assert len(results) == 3
+
+
+def test_timeout_counts_from_the_start_on_the_pool(monkeypatch):
+    # One worker: each task waits for the one before it
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(postdisaster_system, "_analyst_pool", pool)
+    tasks = [FakeTask(f"report {n}", seconds=0.15) for n in range(4)]
+
+    results = run_crew_parallel(fake_crew(*tasks), task_timeout=0.3, contexts=contexts())
+    pool.shutdown()
+
+    assert results == {name: f"report {n}" for n, name in enumerate(AGENT_OUTPUT_NAMES)}
+
+
+def test_timeout_leaves_out_quota_waits():
+    # 20 requests a second after a burst of one: the last task waits about 0.35 s for quota
+    limiter = TokenBucket(1200, burst=1)
+    tasks = [FakeTask(f"report {n}", seconds=0.05, limiter=limiter, requests=2) for n in range(4)]
+
+    results = run_crew_parallel(fake_crew(*tasks), task_timeout=0.2, contexts=contexts())
+
+    assert limiter.stats()["waited_seconds"] > 0.2
+    assert results == {name: f"report {n}" for n, name in enumerate(AGENT_OUTPUT_NAMES)}
+
+
+def test_task_running_past_its_deadline_after_quota_waits_times_out():
+    limiter = TokenBucket(1200, burst=1)
+    tasks = [FakeTask(seconds=1.0, limiter=limiter, requests=2)] + [FakeTask(limiter=limiter, requests=2) for _ in range(3)]
+
+    start = time.monotonic()
+    results = run_crew_parallel(fake_crew(*tasks), task_timeout=0.3, contexts=contexts())
+
+    assert time.monotonic() - start < 0.9
+    assert list(results) == AGENT_OUTPUT_NAMES[1:]
+
+
+def test_token_bucket_counts_the_wait_of_the_current_task():
+    limiter = TokenBucket(600, burst=1)
+    counter = QuotaWait()
+
+    def requests():
+        quota_wait.set(counter)
+        for _ in range(3):
+            limiter.acquire()
+
+    start = time.monotonic()
+    contextvars.copy_context().run(requests)
+    elapsed = time.monotonic() - start
+
+    # The burst token is free, the next two are 0.1 s apart
+    assert 0.15 < counter.waited <= elapsed
+    assert counter.waiting_since is None
+    assert counter.total() == counter.waited
+
+    # Callers without a counter only add to the bucket's total
+    limiter.acquire()
+    assert limiter.stats()["waited_seconds"] > counter.waited
+
+
+def test_quota_wait_in_progress_counts_towards_the_total():
+    counter = QuotaWait()
+    counter.waited = 1.0
+    counter.waiting_since = 10.0
+
+    assert counter.total(now=12.5) == 3.5
+
+
+@pytest.mark.parametrize("mode", ["parallel", "sequential"])
+def test_city_analysis_returns_every_report(mode):
+    results = run_disaster_analysis(1, mode=mode)
+
+    assert list(results) == AGENT_OUTPUT_NAMES
+    assert all("Seabrook" in report for report in results.values())
@@ -0,0 +1,75 @@
+"""
+Content-hashed embedding index: embedder interface, persistence and per-city search
+"""
+
+import json
+import os
+
+import pytest
+
+from city_registry import CityRegistry
+from embedding_index import Embedder, HashingEmbedder, ShardedEmbeddingIndex
+
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__(dimensions=64)
+        self.documents = 0
+
+    def embed_documents(self, texts):
+        self.documents += len(texts)
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def registry(tmp_path):
+    (tmp_path / "shards").mkdir()
+    (tmp_path / "cities.json").write_text(json.dumps([{"name": "Alpha City"}, {"name": "Beta City"}]))
+    (tmp_path / "shards" / "1.txt").write_text("Alpha City has 5000 people.\nThe Alpha bridge collapsed.\n")
+    (tmp_path / "shards" / "2.txt").write_text("Beta City has 900 people.\nBeta needs drinking water.\n")
+    return CityRegistry.load(tmp_path)
+
+
+def test_incomplete_embedder_fails_when_created():
+    class QueryOnly(Embedder):
+        def embed_query(self, text):
+            return None
+
+    with pytest.raises(TypeError):
+        QueryOnly()
+
+
+def test_index_is_built_once_per_content(registry, tmp_path):
+    embedder = CountingEmbedder()
+    index_dir = tmp_path / "index"
+
+    first = ShardedEmbeddingIndex.load_or_build(registry, embedder=embedder, index_dir=index_dir)
+    built = embedder.documents
+    second = ShardedEmbeddingIndex.load_or_build(registry, embedder=embedder, index_dir=index_dir)
+
+    assert built > 0
+    assert embedder.documents == built
+    assert second.key == first.key
+
+
+def test_changed_shard_builds_a_new_index(registry, tmp_path):
+    index_dir = tmp_path / "index"
+    first = ShardedEmbeddingIndex.load_or_build(registry, embedder=CountingEmbedder(), index_dir=index_dir)
+
+    shard = registry.shards[2]
+    shard.write_text("Beta City has 1200 people after the evacuation.\n")
+    os.utime(shard, ns=(shard.stat().st_atime_ns, shard.stat().st_mtime_ns + 10 ** 9))
+    second = ShardedEmbeddingIndex.load_or_build(registry, embedder=CountingEmbedder(), index_dir=index_dir)
+
+    assert second.key != first.key
+    assert "1200" in second.search(2, "population")[0][1]
+
+
+def test_search_only_scores_the_selected_city(registry, tmp_path):
+    index = ShardedEmbeddingIndex.load_or_build(registry, embedder=CountingEmbedder(), index_dir=tmp_path / "index")
+
+    hits = index.search(1, "drinking water")
+
+    assert hits
+    assert all("Alpha" in chunk for _, chunk in hits)
+    assert index.search(99, "water") == []
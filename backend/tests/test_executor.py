@@ -0,0 +1,77 @@
+"""
+Per-endpoint admission control for blocking pipeline calls
+"""
+
+import asyncio
+import contextvars
+import sys
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from executor import EndpointLimiter, import_off_loop
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+def test_calls_beyond_the_limit_and_queue_are_rejected():
+    async def scenario():
+        limiter = EndpointLimiter("analyze_city", max_concurrent=1, max_waiting=1)
+        release = threading.Event()
+        running = asyncio.ensure_future(limiter.run(release.wait))
+        queued = asyncio.ensure_future(limiter.run(time.sleep, 0))
+        await asyncio.sleep(0.05)
+
+        with pytest.raises(HTTPException) as rejected:
+            await limiter.run(time.sleep, 0)
+
+        release.set()
+        await asyncio.gather(running, queued)
+        return limiter, rejected.value
+
+    limiter, rejected = asyncio.run(scenario())
+
+    assert rejected.status_code == 503
+    assert int(rejected.headers["Retry-After"]) > 0
+    assert limiter.stats()["rejected"] == 1
+    assert limiter.stats()["completed"] == 2
+
+
+def test_cancelled_request_keeps_its_slot_until_the_thread_finishes():
+    async def scenario():
+        limiter = EndpointLimiter("analyze_city", max_concurrent=1, max_waiting=0)
+        release = threading.Event()
+        request = asyncio.ensure_future(limiter.run(release.wait))
+        await asyncio.sleep(0.05)
+        request.cancel()
+        await asyncio.sleep(0.05)
+        active_after_cancel = limiter.active
+
+        release.set()
+        await asyncio.sleep(0.05)
+        return active_after_cancel, limiter.active
+
+    active_after_cancel, active_after_finish = asyncio.run(scenario())
+
+    assert active_after_cancel == 1
+    assert active_after_finish == 0
+
+
+def test_context_variables_reach_the_worker_thread():
+    async def scenario():
+        request_id.set("req-1")
+        return await EndpointLimiter("analyze_image", 1, 1).run(request_id.get)
+
+    assert asyncio.run(scenario()) == "req-1"
+
+
+def test_import_off_loop_returns_loaded_modules_directly():
+    async def scenario():
+        return await import_off_loop("json"), await import_off_loop("colorsys")
+
+    loaded, imported = asyncio.run(scenario())
+
+    assert loaded is sys.modules["json"]
+    assert imported is sys.modules["colorsys"]
@@ -0,0 +1,106 @@
+"""
+Perceptual hash index of detected cities: matching, eviction, sharing and catalogue namespaces
+"""
+
+import io
+import threading
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import image_hash
+from image_hash import ImageHashIndex
+
+
+def photo(seed, size=256):
+    rng = np.random.default_rng(seed)
+    coarse = rng.integers(0, 255, (16, 16, 3), dtype=np.uint8)
+    return Image.fromarray(coarse).resize((size, size), Image.BICUBIC)
+
+
+def recompressed(image, size):
+    buffer = io.BytesIO()
+    image.resize((size, size)).save(buffer, "JPEG", quality=70)
+    return Image.open(io.BytesIO(buffer.getvalue()))
+
+
+@pytest.fixture
+def index(tmp_path):
+    return ImageHashIndex(tmp_path / "hashes.sqlite3", catalogue="test")
+
+
+def test_resized_recompressed_upload_matches(index):
+    index.add(index.hash_image(photo(1)), 3, "Baytown City")
+
+    match = index.lookup(index.hash_image(recompressed(photo(1), 180)))
+
+    assert match[:2] == (3, "Baytown City")
+    assert match[2] <= index.max_distance
+
+
+def test_different_image_misses(index):
+    index.add(index.hash_image(photo(1)), 3, "Baytown City")
+
+    assert index.lookup(index.hash_image(photo(2))) is None
+    assert index.stats()["misses"] == 1
+
+
+def test_overflow_evicts_the_least_recently_used(tmp_path):
+    index = ImageHashIndex(tmp_path / "hashes.sqlite3", max_entries=10, max_distance=0, catalogue="test")
+    hashes = [index.hash_image(photo(seed)) for seed in range(11)]
+    for n, value in enumerate(hashes[:10]):
+        index.add(value, n, f"City {n}")
+    index.lookup(hashes[0])
+
+    index.add(hashes[10], 10, "City 10")
+
+    assert index.stats()["entries"] == 9
+    assert index.lookup(hashes[0]) is not None
+    assert index.lookup(hashes[10]) is not None
+    assert index.lookup(hashes[1]) is None
+
+
+def test_detections_are_shared_between_processes(tmp_path):
+    writer = ImageHashIndex(tmp_path / "hashes.sqlite3", catalogue="test")
+    reader = ImageHashIndex(tmp_path / "hashes.sqlite3", catalogue="test")
+
+    writer.add(writer.hash_image(photo(1)), 3, "Baytown City")
+
+    assert reader.lookup(reader.hash_image(photo(1)))[:2] == (3, "Baytown City")
+
+
+def test_detections_from_another_catalogue_are_dropped(tmp_path):
+    old = ImageHashIndex(tmp_path / "hashes.sqlite3", catalogue="old")
+    old.add(old.hash_image(photo(1)), 3, "Baytown City")
+
+    new = ImageHashIndex(tmp_path / "hashes.sqlite3", catalogue="new")
+
+    assert new.lookup(new.hash_image(photo(1))) is None
+    assert new.stats()["entries"] == 0
+
+
+def test_default_namespace_follows_the_city_catalogue(tmp_path):
+    from city_registry import get_city_registry
+
+    index = ImageHashIndex(tmp_path / "hashes.sqlite3")
+
+    assert index.namespace == f"phash:{get_city_registry().content_key()}"
+
+
+def test_process_wide_index_is_created_once(monkeypatch):
+    monkeypatch.setattr(image_hash, "_index", None)
+    start = threading.Barrier(8)
+    indexes = []
+
+    def first_request():
+        start.wait()
+        indexes.append(image_hash.get_image_hash_index())
+
+    threads = [threading.Thread(target=first_request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(index) for index in indexes}) == 1
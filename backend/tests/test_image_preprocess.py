@@ -0,0 +1,64 @@
+"""
+Upload preprocessing: the re-encoded payload is only sent when it is smaller
+than the upload, or when the upload cannot be sent as it is
+"""
+
+import io
+
+import numpy as np
+from PIL import Image
+
+from image_preprocess import preprocess_image
+
+
+def upload(image, image_format="PNG"):
+    buffer = io.BytesIO()
+    image.save(buffer, image_format)
+    buffer.seek(0)
+    return buffer
+
+
+def noise(size):
+    pixels = np.random.default_rng(0).integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)
+    return Image.fromarray(pixels)
+
+
+def test_small_upload_is_sent_as_it_is():
+    # A flat PNG compresses far better than any JPEG of it
+    source = upload(Image.new("RGB", (64, 64), "olive"))
+    original = source.getvalue()
+
+    prepared = preprocess_image(source, len(original), image_format="JPEG")
+
+    assert prepared.stats["kept_original"]
+    assert prepared.payload() == {"mime_type": "image/png", "data": original}
+    assert prepared.stats["bytes_saved"] == 0
+
+
+def test_upload_is_reencoded_when_that_is_smaller():
+    source = upload(noise((128, 128)))
+
+    prepared = preprocess_image(source, len(source.getvalue()), image_format="JPEG")
+
+    assert not prepared.stats["kept_original"]
+    assert prepared.payload()["mime_type"] == "image/jpeg"
+    assert prepared.stats["bytes_saved"] > 0
+
+
+def test_resized_upload_is_never_sent_as_it_is():
+    source = upload(Image.new("RGB", (256, 128), "teal"))
+
+    prepared = preprocess_image(source, len(source.getvalue()), max_dimension=64, image_format="JPEG")
+
+    assert not prepared.stats["kept_original"]
+    assert prepared.image.size == (64, 32)
+    assert prepared.payload()["mime_type"] == "image/jpeg"
+
+
+def test_unsupported_upload_format_is_reencoded():
+    source = upload(Image.new("RGB", (8, 8), "navy"), "GIF")
+
+    prepared = preprocess_image(source, len(source.getvalue()), image_format="JPEG")
+
+    assert not prepared.stats["kept_original"]
+    assert prepared.payload()["mime_type"] == "image/jpeg"
@@ -0,0 +1,205 @@
+"""
+Durable job queue: state transitions, admission and recovery
+"""
+
+import threading
+import time
+
+import pytest
+
+from jobs import JobQueue, JobStore, QueueFullError
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(tmp_path / "jobs.sqlite3")
+
+
+def wait_for(store, job_id, statuses=("completed", "failed"), timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = store.get(job_id)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} still {store.get(job_id)['status']}")
+
+
+def test_job_moves_from_queued_to_running_to_completed(store):
+    job_id = store.submit("city.png", b"png")
+    assert store.get(job_id)["status"] == "queued"
+
+    claimed = store.claim_next()
+    assert claimed == {"id": job_id, "filename": "city.png", "image": b"png"}
+    assert store.get(job_id)["status"] == "running"
+    assert store.claim_next() is None
+
+    store.complete(job_id, {"status": "success"})
+    job = store.get(job_id)
+    assert job["status"] == "completed"
+    assert job["result"] == {"status": "success"}
+    assert job["finished_at"] >= job["started_at"] >= job["created_at"]
+
+
+def test_jobs_are_claimed_oldest_first(store):
+    first = store.submit("a.png", b"a")
+    second = store.submit("b.png", b"b")
+
+    assert [store.claim_next()["id"], store.claim_next()["id"]] == [first, second]
+
+
+def test_interrupted_jobs_are_requeued(store):
+    job_id = store.submit("city.png", b"png")
+    store.claim_next()
+
+    assert store.requeue_running() == 1
+    assert store.get(job_id)["status"] == "queued"
+
+
+def test_full_queue_rejects_with_a_retry_hint(store):
+    queue = JobQueue(store, workers=1, max_queued=2, handler=lambda *args: {})
+    queue.submit("a.png", b"a")
+    queue.submit("b.png", b"b")
+
+    with pytest.raises(QueueFullError) as raised:
+        queue.submit("c.png", b"c")
+
+    assert raised.value.retry_after >= 1
+    assert store.count("queued") == 2
+
+
+def test_concurrent_submissions_never_overshoot_the_limit(tmp_path):
+    stores = [JobStore(tmp_path / "jobs.sqlite3") for _ in range(4)]
+    accepted = []
+
+    def submit(store):
+        for _ in range(10):
+            if store.submit("city.png", b"png", max_queued=5):
+                accepted.append(1)
+
+    threads = [threading.Thread(target=submit, args=(store,)) for store in stores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(accepted) == 5
+    assert stores[0].count("queued") == 5
+
+
+def test_workers_run_jobs_and_record_failures(store):
+    def handler(image, filename, size):
+        if filename == "bad.png":
+            raise ValueError("unreadable image")
+        return {"size": size}
+
+    queue = JobQueue(store, workers=2, handler=handler)
+    queue.start()
+    try:
+        good = queue.submit("good.png", b"12345")
+        bad = queue.submit("bad.png", b"x")
+        completed, failed = wait_for(store, good), wait_for(store, bad)
+    finally:
+        queue.stop()
+
+    assert completed["status"] == "completed"
+    assert completed["result"] == {"size": 5, "filename": "good.png"}
+    assert failed["status"] == "failed"
+    assert "unreadable image" in failed["error"]
+
+
+def test_job_of_a_crashed_worker_is_claimed_again_after_its_lease(store):
+    job_id = store.submit("city.png", b"png")
+    store.claim_next(lease_seconds=0.05)
+    assert store.claim_next() is None
+
+    time.sleep(0.1)
+
+    reclaimed = store.claim_next()
+    assert reclaimed["id"] == job_id
+    assert store.get(job_id)["status"] == "running"
+
+
+def test_renewed_lease_is_not_reclaimed(store):
+    job_id = store.submit("city.png", b"png")
+    store.claim_next(lease_seconds=0.05)
+
+    store.renew([job_id])
+    time.sleep(0.1)
+
+    assert store.claim_next() is None
+
+
+def test_workers_renew_the_leases_of_running_jobs(store):
+    release = threading.Event()
+    queue = JobQueue(store, workers=1, handler=lambda *args: release.wait(5) and {}, lease_seconds=0.06)
+    queue.start()
+    try:
+        job_id = queue.submit("slow.png", b"png")
+        wait_for(store, job_id, statuses=("running",))
+        time.sleep(0.2)
+        # Several lease lengths later the job is still leased to its worker
+        assert store.claim_next(lease_seconds=0.06) is None
+        release.set()
+        assert wait_for(store, job_id)["status"] == "completed"
+    finally:
+        queue.stop()
+
+
+def test_failed_jobs_keep_the_status_code_of_their_error(store):
+    from model_calls import ModelCallError
+    from satellite import CityNotDetectedError
+
+    def handler(image, filename, size):
+        if filename == "atlantis.png":
+            raise CityNotDetectedError("Atlantis")
+        raise ModelCallError("vision model", "The vision model failed")
+
+    queue = JobQueue(store, workers=1, handler=handler)
+    queue.start()
+    try:
+        undetected = wait_for(store, queue.submit("atlantis.png", b"x"))
+        unavailable = wait_for(store, queue.submit("city.png", b"x"))
+    finally:
+        queue.stop()
+
+    assert undetected["status_code"] == 422
+    assert unavailable["status_code"] == 503
+
+
+def test_job_tables_without_leases_are_upgraded(tmp_path):
+    import sqlite3
+
+    path = tmp_path / "jobs.sqlite3"
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, filename TEXT, image BLOB, result TEXT, "
+        "error TEXT, created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+    )
+    conn.commit()
+    conn.close()
+
+    store = JobStore(path)
+    job_id = store.submit("city.png", b"png")
+    store.claim_next()
+    store.fail(job_id, "boom", 503)
+
+    assert store.get(job_id)["status_code"] == 503
+
+
+@pytest.mark.parametrize("status_code, retry_after", [(422, False), (503, True), (500, False)])
+def test_job_result_endpoint_answers_with_the_stored_status(store, monkeypatch, status_code, retry_after):
+    from fastapi.testclient import TestClient
+
+    import main_api
+
+    # A queue without workers, so nothing else touches the job
+    monkeypatch.setattr(main_api, "get_job_queue", lambda: JobQueue(store))
+    job_id = store.submit("city.png", b"png")
+    store.fail(job_id, "Could not identify the city in the image", status_code)
+
+    response = TestClient(main_api.app).get(f"/jobs/{job_id}/result")
+
+    assert response.status_code == status_code
+    assert ("Retry-After" in response.headers) == retry_after
+    assert "Could not identify the city" in response.json()["detail"]
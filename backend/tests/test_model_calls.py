@@ -0,0 +1,236 @@
+"""
+Model call policy under injected stub faults: retries, deadline, backoff,
+circuit breaking, hedging, and how the API reports a failing model
+"""
+
+import io
+import time
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+import model_calls
+from llm_providers import StubServiceError, StubVisionModel
+from model_calls import CircuitBreaker, ModelCallError, ModelCaller, ModelUnavailableError
+
+PARTS = ["Which city?", {"mime_type": "image/png", "data": b"tile"}]
+
+
+def stub_model(faults="", latency="fixed:1"):
+    return StubVisionModel(latency=latency, responses={"vision": "Baytown City"}, faults=faults)
+
+
+def recovering(model, failures):
+    """generate_content that fails for the first `failures` calls, then recovers"""
+    def generate_content(parts):
+        if model.faults.injected_errors >= failures:
+            model.faults.error_rate = 0
+        return model.generate_content(parts)
+    return generate_content
+
+
+def caller(name="vision model", **kwargs):
+    kwargs.setdefault("base_delay", 0.001)
+    kwargs.setdefault("max_delay", 0.002)
+    kwargs.setdefault("breaker", CircuitBreaker(name, failure_threshold=100))
+    return ModelCaller(name, **kwargs)
+
+
+def test_transient_errors_are_retried():
+    model = stub_model("error:1")
+
+    response = caller(attempts=3).call(recovering(model, 2), PARTS)
+
+    assert response.text == "Baytown City"
+    assert model.faults.injected_errors == 2
+    assert model.stats.calls == 1
+
+
+def test_exhausted_attempts_raise_model_call_error():
+    model = stub_model("error:1")
+
+    with pytest.raises(ModelCallError) as raised:
+        caller(attempts=3).call(model.generate_content, PARTS)
+
+    assert not isinstance(raised.value, ModelUnavailableError)
+    assert isinstance(raised.value.__cause__, StubServiceError)
+    assert raised.value.status_code == 503
+    assert model.faults.injected_errors == 3
+
+
+def test_non_transient_errors_are_not_retried():
+    calls = []
+
+    def bad_request(parts):
+        calls.append(parts)
+        raise ValueError("invalid image")
+
+    policy = caller(attempts=3)
+    with pytest.raises(ValueError):
+        policy.call(bad_request, PARTS)
+
+    assert len(calls) == 1
+    assert policy.breaker.state == "closed"
+
+
+def test_no_retry_starts_after_the_deadline():
+    # Each attempt takes 30 ms, so a 50 ms budget leaves room for a second attempt but not a third
+    model = stub_model("error:1", latency="fixed:30")
+
+    start = time.monotonic()
+    with pytest.raises(ModelCallError):
+        caller(attempts=10, deadline=0.05).call(model.generate_content, PARTS)
+
+    assert model.faults.injected_errors == 2
+    assert time.monotonic() - start < 0.2
+
+
+def test_backoff_is_jittered_exponential_and_capped(monkeypatch):
+    # Record the backoff sleeps instead of waiting (the stub model's own latency sleep is untouched)
+    delays = []
+    monkeypatch.setattr(model_calls, "time", SimpleNamespace(monotonic=time.monotonic, sleep=delays.append))
+    model = stub_model("error:1")
+    policy = caller(attempts=6, base_delay=0.1, max_delay=0.3)
+
+    with pytest.raises(ModelCallError):
+        policy.call(model.generate_content, PARTS)
+
+    assert len(delays) == 5
+    for retry, delay in enumerate(delays, 1):
+        assert 0 <= delay <= min(0.3, 0.1 * 2 ** (retry - 1))
+
+
+def test_breaker_opens_fails_fast_and_closes_after_a_good_probe():
+    model = stub_model("error:1")
+    breaker = CircuitBreaker("vision model", failure_threshold=3, reset_seconds=0.1)
+    policy = caller(attempts=1, breaker=breaker)
+
+    for _ in range(3):
+        with pytest.raises(ModelCallError):
+            policy.call(model.generate_content, PARTS)
+    assert breaker.state == "open"
+
+    # While open, calls are rejected without reaching the model
+    with pytest.raises(ModelUnavailableError) as raised:
+        policy.call(model.generate_content, PARTS)
+    assert raised.value.retry_after >= 1
+    assert model.faults.injected_errors == 3
+    assert breaker.rejected == 1
+
+    # After the reset time one failing probe reopens the circuit straight away
+    time.sleep(0.1)
+    with pytest.raises(ModelCallError):
+        policy.call(model.generate_content, PARTS)
+    assert breaker.state == "open"
+    assert model.faults.injected_errors == 4
+
+    # A successful probe closes it again
+    model.faults.error_rate = 0
+    time.sleep(0.1)
+    assert policy.call(model.generate_content, PARTS).text == "Baytown City"
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+
+
+def test_half_open_breaker_lets_one_probe_through():
+    breaker = CircuitBreaker("vision model", failure_threshold=1, reset_seconds=0.05)
+    breaker.record_failure()
+    time.sleep(0.05)
+
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    with pytest.raises(ModelUnavailableError):
+        breaker.before_call()
+
+
+def test_hedge_wins_over_a_slow_primary():
+    slow = stub_model("slow:1:1000", latency="fixed:5")
+    fast = stub_model(latency="fixed:5")
+    calls = []
+
+    def generate_content(parts):
+        calls.append(parts)
+        return (slow if len(calls) == 1 else fast).generate_content(parts)
+
+    policy = caller(hedge=True)
+    for _ in range(model_calls.MODEL_HEDGE_MIN_SAMPLES):
+        policy.latencies.add(0.005)
+
+    start = time.monotonic()
+    response = policy.call(generate_content, PARTS)
+
+    assert response.text == "Baytown City"
+    assert time.monotonic() - start < 0.5
+    assert policy.hedged == 1
+    assert policy.hedge_wins == 1
+    assert len(calls) == 2
+
+
+def test_agent_tasks_are_never_hedged():
+    assert model_calls.get_model_caller("text").hedge is False
+
+
+def png(color):
+    image = io.BytesIO()
+    Image.new("RGB", (64, 64), color).save(image, "PNG")
+    return image.getvalue()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import main_api
+    from resources import get_registry
+
+    # Fresh breakers for every test, quick to open and with short backoff
+    monkeypatch.setattr(model_calls, "_callers", {
+        "vision": caller(attempts=2, breaker=CircuitBreaker("vision model", failure_threshold=2)),
+        "text": caller("agent LLM", attempts=2, hedge=False, breaker=CircuitBreaker("agent LLM", failure_threshold=2)),
+    })
+    registry = get_registry()
+    vision_model, llm = registry.vision_model, registry.llm
+    yield TestClient(main_api.app)
+    vision_model.responses.pop("vision", None)
+    vision_model.faults.error_rate = 0
+    llm.faults.error_rate = 0
+
+
+def test_unrecognised_city_is_rejected_instead_of_analysed(client):
+    from resources import get_registry
+
+    registry = get_registry()
+    registry.vision_model.responses["vision"] = "Atlantis"
+    llm_calls = registry.llm.stats.calls
+
+    response = client.post("/complete-analysis/", files={"file": ("atlantis.png", png("navy"), "image/png")})
+
+    assert response.status_code == 422
+    assert response.json()["detail"].startswith("Could not identify the city")
+    # No crew ran (the pipeline used to fall back to Seabrook City)
+    assert registry.llm.stats.calls == llm_calls
+
+
+def test_vision_outage_returns_503_with_retry_after(client):
+    from resources import get_registry
+
+    get_registry().vision_model.faults.error_rate = 1
+
+    response = client.post("/complete-analysis/", files={"file": ("city.png", png("olive"), "image/png")})
+
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+    assert "vision model" in response.json()["detail"]
+
+
+def test_agent_llm_outage_returns_503(client):
+    from resources import get_registry
+
+    registry = get_registry()
+    registry.llm.faults.error_rate = 1
+
+    response = client.post("/complete-analysis/", files={"file": ("city.png", png("teal"), "image/png")})
+
+    assert response.status_code == 503
+    assert "agent LLM" in response.json()["detail"]
@@ -0,0 +1,113 @@
+"""
+Bulk planner: the agent tools' formulas applied to city vectors and
+scenario grids, with inputs bounded so the int64 totals cannot overflow
+"""
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import planner
+from city_data import dispatch_figures, resource_figures
+from planner import plan, plan_cities
+
+
+def test_figures_match_the_tool_formulas():
+    figures = plan([1000, 250], [450, 99])
+
+    assert figures["apples"].tolist() == [resource_figures(1000)["apples"], resource_figures(250)["apples"]]
+    assert figures["oranges"].tolist() == [1000, 250]
+    for unit in ("helicopters", "police", "special_forces"):
+        assert figures[unit].tolist() == [dispatch_figures(450)[unit], dispatch_figures(99)[unit]]
+
+
+def test_fractional_counts_are_rounded_down():
+    assert plan([10.9], [199.9])["bananas"].tolist() == [20]
+    assert plan([10.9], [199.9])["helicopters"].tolist() == [1]
+
+
+def test_city_vector_broadcasts_against_a_scenario_grid():
+    figures = plan([100, 200], [[0, 100], [200, 400]])
+
+    assert figures["apples"].shape == (2, 2)
+    assert figures["helicopters"].tolist() == [[0, 1], [2, 4]]
+
+
+@pytest.mark.parametrize("values", [[-1], [float("nan")], [float("inf")], [[1, 2], [3]]])
+def test_invalid_counts_are_rejected(values):
+    with pytest.raises(ValueError):
+        plan(values, [0])
+
+
+def test_counts_that_could_overflow_the_totals_are_rejected():
+    with pytest.raises(ValueError, match="at most"):
+        plan([planner._MAX_COUNT + 1], [0])
+
+    # The largest accepted count still sums over a full grid exactly
+    largest = plan([planner._MAX_COUNT], [0])["apples"]
+    assert largest.dtype == np.int64 and int(largest[0]) == planner._MAX_COUNT * 3
+
+
+def test_grid_larger_than_the_cell_limit_is_rejected(monkeypatch):
+    monkeypatch.setattr(planner, "PLAN_MAX_CELLS", 3)
+
+    with pytest.raises(ValueError, match="Plan too large"):
+        plan([1, 2], [[1, 2], [3, 4]])
+
+
+def test_plan_cities_defaults_to_the_document_figures():
+    result = plan_cities(["Seabrook City", "Baytown City"])
+
+    assert result["scenarios"] is None
+    assert result["per_city"]["apples"] == [1200000 * 3, 600000 * 3]
+    assert result["totals"]["police"] == 4500 // 50 + 3800 // 50
+
+
+def test_plan_cities_scenarios_and_totals_only():
+    result = plan_cities(["Seabrook City", "Baytown City"], hurt=[[0, 0], [1000, 1000]], totals_only=True)
+
+    assert result["scenarios"] == 2
+    assert "per_city" not in result
+    assert result["totals"]["helicopters"] == [0, 20]
+
+
+def test_plan_cities_needs_one_value_per_city():
+    with pytest.raises(ValueError, match="one value per city"):
+        plan_cities(["Seabrook City", "Baytown City"], hurt=[1, 2, 3])
+
+
+def test_unknown_city_needs_explicit_inputs():
+    with pytest.raises(ValueError, match="No records for Atlantis"):
+        plan_cities(["Atlantis"])
+    assert plan_cities(["Atlantis"], hurt=[100], populations=[10])["totals"]["helicopters"] == 1
+
+
+@pytest.fixture
+def client():
+    import main_api
+    return TestClient(main_api.app)
+
+
+def test_plan_endpoint(client):
+    response = client.post("/plan/", json={"city_ids": [1, 3], "hurt": [[100, 200]]})
+
+    assert response.status_code == 200
+    assert response.json()["city_ids"] == [1, 3]
+    assert response.json()["totals"]["helicopters"] == [3]
+
+
+def test_plan_endpoint_rejects_out_of_range_counts(client):
+    import main_api
+
+    too_many = client.post("/plan/", json={"city_ids": [1], "populations": [main_api.PLAN_MAX_COUNT + 1]})
+    negative = client.post("/plan/", json={"city_ids": [1], "hurt": [[-5]]})
+
+    assert too_many.status_code == 422
+    assert negative.status_code == 422
+
+
+def test_plan_endpoint_rejects_unknown_cities(client):
+    response = client.post("/plan/", json={"city_ids": [1, 99]})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unknown city ids: [99]"
@@ -0,0 +1,63 @@
+"""
+Per-city crew pool: checkout, reuse, bounds and discarded crews
+"""
+
+import itertools
+
+import pytest
+
+from resources import ResourceRegistry
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = ResourceRegistry(max_idle_per_city=2, max_cities=2)
+    built = itertools.count()
+    monkeypatch.setattr(registry, "_build_crew", lambda city_id: (city_id, next(built)))
+    registry.started = True
+    return registry
+
+
+def test_released_crew_is_reused(registry):
+    with registry.bind_city(1) as first:
+        pass
+    with registry.bind_city(1) as second:
+        pass
+
+    assert second is first
+
+
+def test_concurrent_requests_get_their_own_crews(registry):
+    with registry.bind_city(1) as first, registry.bind_city(1) as second:
+        assert first is not second
+
+
+def test_idle_crews_per_city_are_bounded(registry):
+    with registry.bind_city(1), registry.bind_city(1), registry.bind_city(1):
+        pass
+
+    assert len(registry._idle_crews[1]) == 2
+
+
+def test_least_recently_used_city_is_dropped(registry):
+    for city_id in (1, 2, 3):
+        with registry.bind_city(city_id):
+            pass
+
+    assert list(registry._idle_crews) == [2, 3]
+
+
+def test_discarded_crew_is_not_returned_to_the_pool(registry):
+    with registry.bind_city(1) as crew:
+        registry.discard(crew)
+    with registry.bind_city(1) as next_crew:
+        pass
+
+    assert next_crew is not crew
+
+
+def test_crews_are_not_pooled_after_shutdown(registry):
+    with registry.bind_city(1):
+        registry.shutdown()
+
+    assert not any(registry._idle_crews.values())
@@ -0,0 +1,159 @@
+"""
+Analysis result cache: expiry, LRU eviction, the shared backends and single-flight misses
+"""
+
+import threading
+import time
+
+import pytest
+
+import result_cache
+from result_cache import MemoryBackend, RedisBackend, ResultCache, SQLiteBackend
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBackend(max_entries=2)
+    if request.param == "sqlite":
+        return SQLiteBackend(tmp_path / "cache.sqlite3", max_entries=2)
+    return RedisBackend(fakeredis.FakeRedis())
+
+
+def test_entries_expire_after_the_ttl(backend):
+    backend.set("seabrook", "reports", ttl=1)
+    assert backend.get("seabrook") == "reports"
+
+    time.sleep(1.1)
+    assert backend.get("seabrook") is None
+
+
+def test_zero_ttl_means_no_expiry(backend):
+    backend.set("seabrook", "reports", ttl=0)
+    time.sleep(0.05)
+
+    assert backend.get("seabrook") == "reports"
+
+
+def test_redis_entries_get_an_expiry_only_with_a_ttl():
+    client = fakeredis.FakeRedis()
+    backend = RedisBackend(client, prefix="test:")
+
+    backend.set("timed", "a", ttl=0.5)
+    backend.set("forever", "b", ttl=0)
+
+    assert client.ttl("test:timed") == 1
+    assert client.ttl("test:forever") == -1
+    backend.clear()
+    assert client.keys("test:*") == []
+
+
+@pytest.mark.parametrize("make_backend", [
+    lambda path: MemoryBackend(max_entries=2),
+    lambda path: SQLiteBackend(path / "cache.sqlite3", max_entries=2),
+])
+def test_least_recently_used_entry_is_evicted(make_backend, tmp_path):
+    backend = make_backend(tmp_path)
+    backend.set("a", "1", ttl=60)
+    time.sleep(0.01)
+    backend.set("b", "2", ttl=60)
+    time.sleep(0.01)
+    backend.get("a")
+    time.sleep(0.01)
+    backend.set("c", "3", ttl=60)
+
+    assert backend.get("b") is None
+    assert backend.get("a") == "1"
+    assert backend.get("c") == "3"
+
+
+def test_sqlite_entries_are_shared_between_connections(tmp_path):
+    writer = SQLiteBackend(tmp_path / "cache.sqlite3")
+    reader = SQLiteBackend(tmp_path / "cache.sqlite3")
+
+    writer.set("seabrook", "reports", ttl=60)
+
+    assert reader.get("seabrook") == "reports"
+
+
+def test_concurrent_misses_share_one_computation():
+    cache = ResultCache(MemoryBackend(), ttl=60)
+    calls = []
+    start = threading.Barrier(8)
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"report": "ok"}
+
+    def request():
+        start.wait()
+        results.append(cache.get_or_compute("seabrook", compute))
+
+    results = []
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [{"report": "ok"}] * 8
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["coalesced"] + stats["hits"] == 7
+
+
+def test_rejected_values_are_returned_but_not_stored():
+    cache = ResultCache(MemoryBackend(), ttl=60)
+
+    partial = cache.get_or_compute("seabrook", lambda: {"one": "report"}, should_cache=lambda value: len(value) == 4)
+
+    assert partial == {"one": "report"}
+    assert cache.backend.get("seabrook") is None
+
+
+def test_failed_computation_reaches_every_waiter_and_is_not_cached():
+    cache = ResultCache(MemoryBackend(), ttl=60)
+
+    def compute():
+        time.sleep(0.1)
+        raise RuntimeError("crew failed")
+
+    errors = []
+
+    def request():
+        try:
+            cache.get_or_compute("seabrook", compute)
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=request) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 3
+    assert cache.get_or_compute("seabrook", lambda: "recovered") == "recovered"
+
+
+def test_process_wide_cache_is_created_once(monkeypatch):
+    monkeypatch.setattr(result_cache, "_cache", None)
+    monkeypatch.setattr(result_cache, "RESULT_CACHE_BACKEND", "memory")
+    start = threading.Barrier(8)
+    caches = []
+
+    def first_request():
+        start.wait()
+        caches.append(result_cache.get_result_cache())
+
+    threads = [threading.Thread(target=first_request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(cache) for cache in caches}) == 1
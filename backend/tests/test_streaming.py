@@ -0,0 +1,98 @@
+"""
+Server-Sent Events: progress is forwarded as it is emitted, and the stream
+ends with the result or an error event carrying the status code
+"""
+
+import asyncio
+import json
+import threading
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import executor
+from streaming import sse_event, stream_pipeline
+
+
+@pytest.fixture(autouse=True)
+def fresh_limiters(monkeypatch):
+    monkeypatch.setattr(executor, "_limiters", {})
+
+
+def parse(messages):
+    events = []
+    for message in messages:
+        event, data = message.strip().split("\n")
+        events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+def collect(fn, *args):
+    async def scenario():
+        return [message async for message in stream_pipeline("stream_test", fn, *args)]
+    return parse(asyncio.run(scenario()))
+
+
+def test_sse_event_format():
+    assert sse_event("agent", {"agent": "triage"}) == 'event: agent\ndata: {"agent": "triage"}\n\n'
+
+
+def test_events_are_forwarded_before_the_call_returns():
+    forwarded = threading.Event()
+
+    def pipeline(city_id, emit):
+        emit("agent", {"agent": "first", "city_id": city_id})
+        # Only returns once the first event has reached the consumer
+        assert forwarded.wait(5)
+        emit("agent", {"agent": "second"})
+        return {"city_id": city_id}
+
+    async def scenario():
+        messages = []
+        async for message in stream_pipeline("stream_test", pipeline, 3):
+            messages.append(message)
+            forwarded.set()
+        return messages
+
+    events = parse(asyncio.run(scenario()))
+
+    assert events == [
+        ("agent", {"agent": "first", "city_id": 3}),
+        ("agent", {"agent": "second"}),
+        ("complete", {"city_id": 3}),
+    ]
+
+
+def test_failure_ends_the_stream_with_an_error_event():
+    def pipeline(emit):
+        emit("agent", {"agent": "first"})
+        raise HTTPException(status_code=422, detail="Could not identify the city")
+
+    events = collect(pipeline)
+
+    assert events[0] == ("agent", {"agent": "first"})
+    assert events[-1] == ("error", {"status_code": 422, "detail": "Could not identify the city"})
+
+
+def test_unexpected_failure_is_a_500_error_event():
+    def pipeline(emit):
+        raise RuntimeError("boom")
+
+    assert collect(pipeline) == [("error", {"status_code": 500, "detail": "boom"})]
+
+
+def test_city_stream_sends_city_agents_and_complete():
+    import main_api
+
+    with TestClient(main_api.app).stream("GET", "/analyze-city/1/stream") as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        body = "".join(response.iter_text())
+
+    events = parse(message for message in body.split("\n\n") if message.strip())
+    names = [event for event, _ in events]
+
+    assert names[0] == "city"
+    assert names[-1] == "complete"
+    assert "agent" in names
+    assert events[-1][1]["city_id"] == 1
@@ -0,0 +1,24 @@
+"""
+/test-analysis/ runs the whole pipeline on the sample image shipped with the repository
+"""
+
+import os
+
+from fastapi.testclient import TestClient
+
+import main_api
+from satellite import TEST_IMAGE
+
+
+def test_sample_image_is_in_the_repository():
+    assert os.path.isfile(TEST_IMAGE)
+
+
+def test_test_analysis_uses_the_sample_image():
+    response = TestClient(main_api.app).get("/test-analysis/")
+
+    assert response.status_code == 200
+    results = response.json()
+    assert results["test_mode"] is True
+    assert results["image_path"] == TEST_IMAGE
+    assert results["status"] == "success"
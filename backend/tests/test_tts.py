@@ -0,0 +1,117 @@
+"""
+Audio bulletins must never fail an analysis, even when a render process dies;
+the speech engine is probed once and the cache pruned only now and then
+"""
+
+import os
+from concurrent.futures.process import BrokenProcessPool
+from types import SimpleNamespace
+
+import pytest
+
+import tts
+
+
+@pytest.fixture
+def renderer(tmp_path):
+    renderer = tts.AudioRenderer(
+        cache=tts.AudioCache(tmp_path), workers=1,
+        settings={"engine": "stub", "voice": "", "rate": 160, "volume": 1.0},
+    )
+    yield renderer
+    renderer.shutdown()
+
+
+def test_killed_render_process_is_replaced(renderer):
+    key, status = renderer.submit("Seabrook City. Needs Analyst. Water for 5000 people.")
+    assert status == "rendering"
+    renderer.pending(key).result(timeout=60)
+
+    # A render process exiting breaks the whole pool
+    with pytest.raises(BrokenProcessPool):
+        renderer._get_pool().submit(os._exit, 1).result(timeout=60)
+
+    bulletins = renderer.bulletins("Seabrook City", {"Needs Analyst": "Food for 2000 people."})
+
+    assert [bulletin["status"] for bulletin in bulletins] == ["rendering"]
+    renderer.pending(bulletins[0]["audio_id"]).result(timeout=60)
+    assert renderer.cache.audio_path(bulletins[0]["audio_id"]).exists()
+
+
+def test_submit_errors_give_failed_bulletins(renderer, monkeypatch):
+    def broken(text):
+        raise RuntimeError("cannot start render process")
+
+    monkeypatch.setattr(renderer, "submit", broken)
+
+    bulletins = renderer.bulletins("Seabrook City", {"Needs Analyst": "Food for 2000 people."})
+
+    assert [bulletin["status"] for bulletin in bulletins] == ["failed"]
+    assert renderer.stats()["failed"] == 1
+
+
+def test_audio_bulletins_never_raise(monkeypatch):
+    def unavailable():
+        raise OSError("no speech engine")
+
+    monkeypatch.setattr(tts, "TTS_BULLETINS", True)
+    monkeypatch.setattr(tts, "get_audio_renderer", unavailable)
+
+    assert tts.audio_bulletins("Seabrook City", {"Needs Analyst": "Food for 2000 people."}) == []
+
+
+@pytest.fixture
+def probes(monkeypatch):
+    """Records the engine probes instead of starting processes; set `returncode` for their outcome"""
+    monkeypatch.setattr(tts, "_engine_probes", {})
+    probes = SimpleNamespace(commands=[], returncode=0)
+
+    def run(command, **kwargs):
+        probes.commands.append(command)
+        return tts.subprocess.CompletedProcess(command, probes.returncode)
+
+    monkeypatch.setattr(tts.subprocess, "run", run)
+    monkeypatch.setattr(tts.importlib.util, "find_spec", lambda name: object())
+    return probes
+
+
+def test_pyttsx3_engine_is_probed_once(probes):
+    assert tts.engine_available("pyttsx3") is True
+    assert tts.engine_available("pyttsx3") is True
+    assert len(probes.commands) == 1
+    assert "pyttsx3.init()" in probes.commands[0][-1]
+
+
+def test_pyttsx3_without_a_working_driver_is_unavailable(probes):
+    probes.returncode = 1
+
+    assert tts.engine_available("pyttsx3") is False
+    assert tts.engine_available("pyttsx3") is False
+    assert len(probes.commands) == 1
+
+
+def test_cache_is_pruned_after_enough_new_audio(tmp_path, monkeypatch):
+    cache = tts.AudioCache(tmp_path, max_mb=1, prune_mb=0.1)
+    prunes = []
+    monkeypatch.setattr(cache, "prune", lambda: prunes.append(1))
+    chunk = 40 * 1024
+
+    # The first render after a start prunes, then only every 100 KB of new audio
+    pruned = [cache.added(chunk) for _ in range(6)]
+
+    assert pruned == [True, False, False, True, False, False]
+    assert len(prunes) == 2
+
+
+def test_prune_removes_the_oldest_bulletins_above_the_limit(tmp_path):
+    cache = tts.AudioCache(tmp_path, max_mb=0.1)
+    keys = [f"{n:02d}" + "0" * 38 for n in range(4)]
+    for age, key in enumerate(keys):
+        path = cache.audio_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x" * 40 * 1024)
+        os.utime(path, (1000 + age, 1000 + age))
+
+    cache.prune()
+
+    assert [cache.audio_path(key).exists() for key in keys] == [False, False, True, True]
@@ -0,0 +1,85 @@
+"""
+Upload limits: 413 for oversized bodies, 400 for a malformed Content-Length,
+and in-memory spooling scoped to this app's routes
+"""
+
+import asyncio
+
+import pytest
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+from starlette.formparsers import MultiPartParser
+
+from uploads import UPLOAD_SPOOL_BYTES, UploadLimitMiddleware, UploadRoute
+
+LIMIT = 2 * 1024 * 1024
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.router.route_class = UploadRoute
+    app.add_middleware(UploadLimitMiddleware, max_bytes=LIMIT)
+
+    @app.post("/upload/")
+    async def upload(file: UploadFile = File(...)):
+        data = await file.read()
+        return {"size": len(data), "in_memory": not file.file._rolled}
+
+    return TestClient(app)
+
+
+def test_upload_within_the_limit_is_accepted(client):
+    response = client.post("/upload/", files={"file": ("city.png", b"x" * 1024, "image/png")})
+
+    assert response.status_code == 200
+    assert response.json()["size"] == 1024
+
+
+def test_announced_oversized_body_is_rejected(client):
+    response = client.post("/upload/", files={"file": ("city.png", b"x" * (LIMIT + 1), "image/png")})
+
+    assert response.status_code == 413
+    assert "limit is 2 MB" in response.json()["detail"]
+
+
+def test_chunked_oversized_body_is_cut_off(client):
+    # A streamed multipart body, sent without a Content-Length
+    def chunks():
+        yield b'--b\r\nContent-Disposition: form-data; name="file"; filename="city.png"\r\n\r\n'
+        for _ in range(3):
+            yield b"x" * (1024 * 1024)
+        yield b"\r\n--b--\r\n"
+
+    response = client.post("/upload/", content=chunks(), headers={"Content-Type": "multipart/form-data; boundary=b"})
+
+    assert response.status_code == 413
+
+
+def test_malformed_content_length_is_a_bad_request():
+    sent = []
+
+    async def app(scope, receive, send):
+        raise AssertionError("the app must not be called")
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/upload/", "headers": [(b"content-length", b"12abc")]}
+    asyncio.run(UploadLimitMiddleware(app, max_bytes=LIMIT)(scope, receive, send))
+
+    assert sent[0]["status"] == 400
+
+
+def test_uploads_spool_in_memory_without_changing_starlette_defaults(client):
+    # Larger than Starlette's 1 MB default spool size, below ours
+    size = 1024 * 1024 + 1
+    assert size < UPLOAD_SPOOL_BYTES
+
+    response = client.post("/upload/", files={"file": ("city.png", b"x" * size, "image/png")})
+
+    assert response.json() == {"size": size, "in_memory": True}
+    assert MultiPartParser.spool_max_size == 1024 * 1024
@@ -0,0 +1,414 @@
+"""
+Alert Audio for PostDisaster System
+Renders agent reports to spoken bulletins in background worker processes, cached by text and voice
+"""
+
+import hashlib
+import importlib.util
+import json
+import math
+import multiprocessing
+import os
+import pathlib
+import shutil
+import struct
+import subprocess
+import sys
+import threading
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from dotenv import load_dotenv
+
+from telemetry import STAGE_SECONDS
+
+load_dotenv()
+
+# Bulletins for every finished analysis (0: only rendered on request)
+TTS_BULLETINS = os.getenv("TTS_BULLETINS", "1") == "1"
+# Local speech engine: "pyttsx3" (espeak on Linux, SAPI5 on Windows, NSSS on macOS),
+# "espeak" (the espeak-ng/espeak command) or "stub" (a tone per word, for offline benchmarks)
+TTS_ENGINE = os.getenv("TTS_ENGINE", "pyttsx3")
+TTS_VOICE = os.getenv("TTS_VOICE", "")  # engine voice id or name; empty for the default voice
+TTS_RATE = int(os.getenv("TTS_RATE", "160"))  # words per minute
+TTS_VOLUME = float(os.getenv("TTS_VOLUME", "1.0"))  # 0.0 - 1.0
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "2"))  # render processes
+TTS_CACHE_DIR = pathlib.Path(os.getenv("TTS_CACHE_DIR", pathlib.Path(__file__).parent / ".audio_cache"))
+TTS_CACHE_MAX_MB = float(os.getenv("TTS_CACHE_MAX_MB", "512"))  # oldest bulletins are removed above this
+# Audio rendered between two prunes of the cache (it can exceed TTS_CACHE_MAX_MB by this much)
+TTS_CACHE_PRUNE_MB = float(os.getenv("TTS_CACHE_PRUNE_MB", str(TTS_CACHE_MAX_MB / 20)))
+TTS_WAIT_SECONDS = float(os.getenv("TTS_WAIT_SECONDS", "30"))  # how long /audio/ waits for a render in progress
+
+# Bump when the rendered audio changes for the same text and voice
+AUDIO_FORMAT_VERSION = 1
+
+
+def voice_settings():
+    """Everything besides the text that changes the rendered audio"""
+    return {"engine": TTS_ENGINE, "voice": TTS_VOICE, "rate": TTS_RATE, "volume": TTS_VOLUME}
+
+
+def audio_key(text, settings):
+    """Cache key (also the audio id in URLs) for a text spoken with the given voice settings"""
+    payload = json.dumps({"text": text, "voice": settings, "version": AUDIO_FORMAT_VERSION}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:40]
+
+
+def bulletin_text(city_name, agent, report):
+    """What is read out for one agent report"""
+    return f"{city_name}. {agent}. {report.strip()}"
+
+
+_engine_probes = {}
+_engine_probes_lock = threading.Lock()
+
+
+def engine_available(engine=TTS_ENGINE):
+    """
+    Whether the local speech engine can be used in this environment
+
+    pyttsx3 installs without the platform speech driver it needs (e.g.
+    espeak on Linux), so the first call starts an engine in a short-lived
+    process; its result is kept for the lifetime of this process.
+    """
+    if engine == "pyttsx3":
+        with _engine_probes_lock:
+            if engine not in _engine_probes:
+                _engine_probes[engine] = importlib.util.find_spec("pyttsx3") is not None and _probe_pyttsx3()
+            return _engine_probes[engine]
+    if engine == "espeak":
+        return _espeak_command() is not None
+    return engine == "stub"
+
+
+def _probe_pyttsx3():
+    # In a child process, so a driver that crashes or hangs cannot take the API down
+    try:
+        probe = subprocess.run([sys.executable, "-c", "import pyttsx3; pyttsx3.init()"], capture_output=True, timeout=30)
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+    return probe.returncode == 0
+
+
+def _espeak_command():
+    return shutil.which("espeak-ng") or shutil.which("espeak")
+
+
+# Worker process side ----------------------------------------------------------
+
+_engine = None
+
+
+def _render_pyttsx3(text, path, settings):
+    # One engine per worker process; pyttsx3 engines are not thread-safe
+    global _engine
+    import pyttsx3
+
+    if _engine is None:
+        _engine = pyttsx3.init()
+    _engine.setProperty("rate", settings["rate"])
+    _engine.setProperty("volume", settings["volume"])
+    if settings["voice"]:
+        _engine.setProperty("voice", settings["voice"])
+    _engine.save_to_file(text, str(path))
+    _engine.runAndWait()
+
+
+def _render_espeak(text, path, settings):
+    command = [_espeak_command(), "-w", str(path), "-s", str(settings["rate"]), "-a", str(int(settings["volume"] * 200)), "--stdin"]
+    if settings["voice"]:
+        command += ["-v", settings["voice"]]
+    subprocess.run(command, input=text.encode("utf-8"), check=True, capture_output=True, timeout=120)
+
+
+def _render_stub(text, path, settings, sample_rate=16000):
+    # A short tone per word at the speaking rate, so durations and file sizes are realistic
+    word_seconds = 60 / settings["rate"]
+    tone = [int(12000 * settings["volume"] * math.sin(2 * math.pi * 440 * n / sample_rate))
+            for n in range(int(sample_rate * word_seconds * 0.7))]
+    pause = [0] * int(sample_rate * word_seconds * 0.3)
+    word = struct.pack(f"<{len(tone) + len(pause)}h", *tone, *pause)
+    with wave.open(str(path), "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(sample_rate)
+        out.writeframes(word * len(text.split()))
+
+
+ENGINES = {
+    "pyttsx3": _render_pyttsx3,
+    "espeak": _render_espeak,
+    "stub": _render_stub,
+}
+
+
+def render_audio(text, path, settings):
+    """
+    Render `text` to a WAV file (runs in a worker process)
+
+    Written to a temporary file and renamed, so a half-written bulletin is
+    never served.
+
+    Returns:
+        float: Render time in seconds
+    """
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(f"{path.stem}.{os.getpid()}.partial.wav")
+    start = time.perf_counter()
+    try:
+        ENGINES[settings["engine"]](text, partial, settings)
+        os.replace(partial, path)
+    finally:
+        partial.unlink(missing_ok=True)
+    return time.perf_counter() - start
+
+
+# API process side -------------------------------------------------------------
+
+class AudioCache:
+    """
+    Rendered bulletins on disk: `<key>.wav` plus a `<key>.json` with the
+    render time, duration and size (shared by API worker processes)
+    """
+
+    def __init__(self, directory=TTS_CACHE_DIR, max_mb=TTS_CACHE_MAX_MB, prune_mb=TTS_CACHE_PRUNE_MB):
+        self.directory = pathlib.Path(directory)
+        self.max_bytes = max_mb * 1024 * 1024
+        self.prune_bytes = prune_mb * 1024 * 1024
+        # Starts full, so the first bulletin rendered after a restart prunes what earlier runs left
+        self._added_bytes = self.prune_bytes
+        self._lock = threading.Lock()
+
+    def audio_path(self, key):
+        return self.directory / key[:2] / f"{key}.wav"
+
+    def info(self, key):
+        """Metadata of a rendered bulletin, or None"""
+        meta = self.audio_path(key).with_suffix(".json")
+        if not meta.exists() or not self.audio_path(key).exists():
+            return None
+        return json.loads(meta.read_text(encoding="utf-8"))
+
+    def store_info(self, key, info):
+        meta = self.audio_path(key).with_suffix(".json")
+        partial = meta.with_name(f"{meta.stem}.{os.getpid()}.partial.json")
+        partial.write_text(json.dumps(info), encoding="utf-8")
+        os.replace(partial, meta)
+
+    def added(self, size):
+        """
+        Account for a newly rendered bulletin, pruning the cache once
+        `prune_bytes` of audio were rendered since the last prune
+
+        Returns:
+            bool: Whether the cache was pruned
+        """
+        with self._lock:
+            self._added_bytes += size
+            if self._added_bytes < self.prune_bytes:
+                return False
+            self._added_bytes = 0
+        self.prune()
+        return True
+
+    def prune(self):
+        """Remove the least recently rendered bulletins above the size limit"""
+        files = sorted(
+            (path for path in self.directory.glob("*/*.wav") if ".partial" not in path.name),
+            key=lambda path: path.stat().st_mtime,
+        )
+        total = sum(path.stat().st_size for path in files)
+        for path in files:
+            if total <= self.max_bytes:
+                break
+            total -= path.stat().st_size
+            path.unlink(missing_ok=True)
+            path.with_suffix(".json").unlink(missing_ok=True)
+
+
+def wav_duration(path):
+    """Seconds of audio, or None if the engine did not write a WAV (pyttsx3 on macOS writes AIFF)"""
+    try:
+        with wave.open(str(path), "rb") as audio:
+            return round(audio.getnframes() / audio.getframerate(), 2)
+    except (wave.Error, EOFError):
+        return None
+
+
+class AudioRenderer:
+    """
+    Renders bulletins on a process pool, off the request path
+
+    Each text is rendered once per voice settings: a cached bulletin is
+    returned as ready, and a bulletin already being rendered in this process
+    is not submitted again. If a render process dies the pool is broken for
+    good, so it is replaced with a new one.
+    """
+
+    def __init__(self, cache=None, workers=TTS_WORKERS, settings=None):
+        self.cache = cache or AudioCache()
+        self.workers = workers
+        self.settings = settings or voice_settings()
+        self.hits = 0
+        self.renders = 0
+        self.failures = 0
+        self.render_seconds = 0.0
+        self._pool = None
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        # Spawned, not forked: the API process runs threads that must not be copied mid-operation
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def _discard_pool(self, pool):
+        """Drop a broken pool so the next render starts a new one (call with the lock held)"""
+        if self._pool is pool:
+            print("Warning: a bulletin render process died, restarting the render pool")
+            self._pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, text):
+        """
+        Queue a bulletin for rendering unless it is cached or already queued
+
+        Returns:
+            tuple: (audio key, "ready" | "rendering")
+        """
+        key = audio_key(text, self.settings)
+        with self._lock:
+            if key in self._inflight:
+                return key, "rendering"
+            if self.cache.info(key) is not None:
+                self.hits += 1
+                return key, "ready"
+            pool = self._get_pool()
+            try:
+                future = pool.submit(render_audio, text, self.cache.audio_path(key), self.settings)
+            except BrokenProcessPool:
+                self._discard_pool(pool)
+                pool = self._get_pool()
+                future = pool.submit(render_audio, text, self.cache.audio_path(key), self.settings)
+            self._inflight[key] = future
+        future.add_done_callback(lambda done: self._finished(key, text, done, pool))
+        return key, "rendering"
+
+    def _finished(self, key, text, future, pool):
+        try:
+            seconds = future.result()
+            path = self.cache.audio_path(key)
+            size = path.stat().st_size
+            self.cache.store_info(key, {
+                "render_ms": round(seconds * 1000, 1),
+                "duration_s": wav_duration(path),
+                "bytes": size,
+                "characters": len(text),
+                "voice": self.settings,
+                "rendered_at": time.time(),
+            })
+            STAGE_SECONDS.observe(seconds, stage="tts_render")
+            print(f"Rendered bulletin {key[:12]} ({len(text)} characters) in {seconds * 1000:.0f} ms")
+            with self._lock:
+                self.renders += 1
+                self.render_seconds += seconds
+            self.cache.added(size)
+        except Exception as e:
+            with self._lock:
+                self.failures += 1
+                if isinstance(e, BrokenProcessPool):
+                    self._discard_pool(pool)
+            print(f"Warning: rendering bulletin {key[:12]} failed ({e})")
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def pending(self, key):
+        """The render future for a bulletin rendered by this process, or None"""
+        with self._lock:
+            return self._inflight.get(key)
+
+    def bulletins(self, city_name, reports):
+        """
+        Queue one bulletin per agent report
+
+        Args:
+            city_name (str): City the reports are about
+            reports (dict): Agent name -> report text
+
+        Returns:
+            list: {"agent", "audio_id", "status", "url"} per report; status is
+                "failed" when the bulletin could not be queued
+        """
+        bulletins = []
+        for agent, report in reports.items():
+            text = bulletin_text(city_name, agent, report)
+            try:
+                key, status = self.submit(text)
+            except Exception as e:
+                with self._lock:
+                    self.failures += 1
+                print(f"Warning: queueing the {agent} bulletin failed ({type(e).__name__}: {e})")
+                key, status = audio_key(text, self.settings), "failed"
+            bulletins.append({"agent": agent, "audio_id": key, "status": status, "url": f"/audio/{key}"})
+        return bulletins
+
+    def stats(self):
+        with self._lock:
+            return {
+                "engine": self.settings["engine"],
+                "available": engine_available(self.settings["engine"]),
+                "cache_hits": self.hits,
+                "rendered": self.renders,
+                "failed": self.failures,
+                "rendering": len(self._inflight),
+                "mean_render_ms": round(self.render_seconds / self.renders * 1000, 1) if self.renders else None,
+            }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+_warned = False
+
+
+def get_audio_renderer():
+    """Process-wide renderer, or None when the TTS engine is not available here"""
+    global _renderer, _warned
+    with _renderer_lock:
+        if _renderer is None and engine_available():
+            _renderer = AudioRenderer()
+        if _renderer is None and not _warned:
+            print(f"Warning: TTS engine '{TTS_ENGINE}' is not available, audio bulletins are disabled")
+            _warned = True
+        return _renderer
+
+
+def shutdown_audio_renderer():
+    """Stop the render processes (queued bulletins are dropped)"""
+    with _renderer_lock:
+        if _renderer is not None:
+            _renderer.shutdown()
+
+
+def audio_bulletins(city_name, reports):
+    """
+    Bulletins queued for a finished analysis, or [] when TTS_BULLETINS is off or no engine is available
+
+    Audio is an optional extra, so this never raises: the analysis is
+    returned with [] (or "failed" bulletins) instead.
+    """
+    try:
+        renderer = get_audio_renderer() if TTS_BULLETINS else None
+        return renderer.bulletins(city_name, reports) if renderer else []
+    except Exception as e:
+        print(f"Warning: audio bulletins unavailable ({type(e).__name__}: {e})")
+        return []
@@ -0,0 +1,144 @@
+"""
+Upload Handling for PostDisaster System
+Size-limited, spooled uploads that are decoded in memory instead of written to ../uploads
+"""
+
+import os
+from contextlib import aclosing
+
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+# Upload settings
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+BATCH_MAX_UPLOAD_BYTES = int(os.getenv("BATCH_MAX_UPLOAD_BYTES", str(200 * 1024 * 1024)))
+UPLOAD_SPOOL_BYTES = int(os.getenv("UPLOAD_SPOOL_BYTES", str(8 * 1024 * 1024)))  # kept in memory below this
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class SpooledUploadParser(MultiPartParser):
+    """
+    Multipart parser streaming uploaded files into a SpooledTemporaryFile
+    that stays in memory up to UPLOAD_SPOOL_BYTES, then spills to a unique
+    temp file (Starlette's own default of 1 MB is left alone)
+    """
+
+    spool_max_size = UPLOAD_SPOOL_BYTES
+
+
+class UploadRequest(Request):
+    """Request whose multipart form is parsed with SpooledUploadParser"""
+
+    async def _get_form(self, *, max_files=1000, max_fields=1000, max_part_size=1024 * 1024):
+        if self._form is None and self.headers.get("Content-Type", "").startswith("multipart/form-data"):
+            try:
+                async with aclosing(self.stream()) as stream:
+                    parser = SpooledUploadParser(
+                        self.headers, stream, max_files=max_files, max_fields=max_fields, max_part_size=max_part_size,
+                    )
+                    self._form = await parser.parse()
+            except MultiPartException as exc:
+                raise HTTPException(status_code=400, detail=exc.message)
+        return await super()._get_form(max_files=max_files, max_fields=max_fields, max_part_size=max_part_size)
+
+
+class UploadRoute(APIRoute):
+    """Route class handing endpoints an UploadRequest (set as the app's `router.route_class`)"""
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def upload_handler(request):
+            return await handler(UploadRequest(request.scope, request.receive))
+
+        return upload_handler
+
+
+class UploadLimitMiddleware:
+    """
+    Rejects request bodies larger than `max_bytes` with 413
+
+    Requests announcing a larger Content-Length are refused before any body
+    is read, and a Content-Length that is not a number gets a 400. Chunked
+    bodies are counted as they stream in and cut off as soon as they pass
+    the limit. `path_limits` overrides the limit for
+    specific paths (e.g. the batch endpoint).
+    """
+
+    def __init__(self, app, max_bytes=MAX_UPLOAD_BYTES, path_limits=None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_limits = path_limits or {}
+
+    def _too_large(self, max_bytes):
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"Upload too large, the limit is {max_bytes // (1024 * 1024)} MB"},
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT"):
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = self.path_limits.get(scope["path"], self.max_bytes)
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and not content_length.strip().isdigit():
+            await JSONResponse(status_code=400, content={"detail": "Invalid Content-Length header"})(scope, receive, send)
+            return
+        if content_length is not None and int(content_length) > max_bytes:
+            await self._too_large(max_bytes)(scope, receive, send)
+            return
+
+        received = 0
+        exceeded = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    exceeded = True
+                    raise UploadTooLarge()
+            return message
+
+        async def guarded_send(message):
+            # Drop whatever error response the app produced for the aborted body
+            if not exceeded:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+
+        if exceeded:
+            await self._too_large(max_bytes)(scope, receive, send)
+
+
+def upload_source(file, max_bytes=MAX_UPLOAD_BYTES):
+    """
+    Binary file object for an uploaded image, rewound and size-checked
+
+    Args:
+        file (UploadFile): Uploaded file
+        max_bytes (int): Size limit, the single-image limit by default
+
+    Returns:
+        tuple: (file object, size in bytes)
+    """
+    source = file.file
+    source.seek(0, os.SEEK_END)
+    size = source.tell()
+    source.seek(0)
+    if size > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Upload too large, the limit is {max_bytes // (1024 * 1024)} MB")
+    return source, size